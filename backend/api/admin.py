@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import City, Vegetable, PriceEntry, Prediction, UserFeedback
+from .models import City, Vegetable, VegetableAlias, PriceEntry, DailyPriceAggregate, SourceWatermark, Prediction, TrainingState, UserFeedback
 
 
 @admin.register(City)
@@ -9,11 +9,17 @@ class CityAdmin(admin.ModelAdmin):
     list_filter = ['state', 'created_at']
 
 
+class VegetableAliasInline(admin.TabularInline):
+    model = VegetableAlias
+    extra = 1
+
+
 @admin.register(Vegetable)
 class VegetableAdmin(admin.ModelAdmin):
     list_display = ['name', 'category', 'created_at']
-    search_fields = ['name']
+    search_fields = ['name', 'aliases__alias']
     list_filter = ['category', 'created_at']
+    inlines = [VegetableAliasInline]
 
 
 @admin.register(PriceEntry)
@@ -24,6 +30,28 @@ class PriceEntryAdmin(admin.ModelAdmin):
     date_hierarchy = 'timestamp'
 
 
+@admin.register(DailyPriceAggregate)
+class DailyPriceAggregateAdmin(admin.ModelAdmin):
+    list_display = ['vegetable', 'city', 'source', 'date', 'open_price', 'high_price', 'low_price', 'close_price', 'count']
+    search_fields = ['vegetable__name', 'city__name', 'source']
+    list_filter = ['source', 'city', 'date']
+    date_hierarchy = 'date'
+
+
+@admin.register(SourceWatermark)
+class SourceWatermarkAdmin(admin.ModelAdmin):
+    list_display = ['source', 'endpoint', 'last_success_at', 'etag', 'last_modified']
+    search_fields = ['source', 'endpoint']
+    list_filter = ['source']
+
+
+@admin.register(TrainingState)
+class TrainingStateAdmin(admin.ModelAdmin):
+    list_display = ['vegetable', 'city', 'model_type', 'row_count', 'last_date', 'trained_at']
+    list_filter = ['model_type', 'city']
+    search_fields = ['vegetable__name', 'city__name']
+
+
 @admin.register(Prediction)
 class PredictionAdmin(admin.ModelAdmin):
     list_display = ['vegetable', 'city', 'predicted_price', 'prediction_date', 'model_used', 'confidence']
@@ -5,3 +5,7 @@ class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
     verbose_name = 'Food Price API'
+
+    def ready(self):
+        # Connect the signals that keep the vegetable name index fresh
+        from . import name_resolution  # noqa: F401
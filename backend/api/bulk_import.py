@@ -0,0 +1,303 @@
+import csv
+import datetime
+import json
+import logging
+import multiprocessing
+import os
+import time
+from collections import Counter, deque
+from io import StringIO
+
+import pandas as pd
+from django.db import connection, connections, transaction
+from django.utils import timezone
+
+from scraper.clean_data import RAW_COLUMNS, clean_price_frame
+from .caching import bump_data_version
+from .ingest import observation_key, resolve_cities, resolve_vegetables
+from .models import PriceEntry
+from .rollups import merge_date_ranges, rebuild_aggregate_ranges
+
+logger = logging.getLogger(__name__)
+
+IMPORT_COLUMNS = RAW_COLUMNS + ['timestamp']
+
+INSERT_COLUMNS = [
+    'vegetable_id', 'city_id', 'price_per_kg', 'source', 'location',
+    'quality_rating', 'timestamp', 'observation_key',
+]
+
+
+def iter_file_chunks(path, chunk_size):
+    """
+    Stream a CSV or Parquet file as DataFrames of at most chunk_size rows
+    with the IMPORT_COLUMNS columns. Parquet needs the optional pyarrow.
+    """
+    if str(path).lower().endswith('.parquet'):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError('Importing Parquet files requires pyarrow (pip install pyarrow)')
+        chunks = (batch.to_pandas() for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size))
+    else:
+        chunks = pd.read_csv(path, chunksize=chunk_size, dtype=str)
+
+    for frame in chunks:
+        yield frame.reindex(columns=IMPORT_COLUMNS)
+
+
+def parse_timestamps(column):
+    """
+    Parse a timestamp column to aware UTC datetimes; NaT where unparseable.
+    Values without an offset are read in the current time zone.
+    """
+    parsed = pd.to_datetime(column, errors='coerce')
+    if not pd.api.types.is_datetime64_any_dtype(parsed):
+        # Mixed offsets; normalize each value through UTC
+        return pd.to_datetime(column, errors='coerce', utc=True)
+    if parsed.dt.tz is None:
+        return parsed.dt.tz_localize(
+            timezone.get_current_timezone_name(), ambiguous='NaT', nonexistent='NaT'
+        ).dt.tz_convert('UTC')
+    return parsed.dt.tz_convert('UTC')
+
+
+def import_chunk(index, frame, default_source=None):
+    """
+    Clean, resolve and insert one chunk in a single transaction.
+    Rows keep their own timestamps and are keyed by observation_key, so
+    re-importing a chunk inserts nothing twice.
+    Returns (index, inserted, rejections, ranges) where `ranges` maps each
+    (vegetable_id, city_id, source) series of a chunk that inserted rows
+    to the (first, last) dates of its rows.
+    """
+    rejections = Counter()
+    if default_source:
+        frame['source'] = frame['source'].fillna(default_source)
+
+    timestamps = parse_timestamps(frame['timestamp'])
+    missing = timestamps.isna()
+    if missing.any():
+        rejections['unparseable_timestamp'] += int(missing.sum())
+        frame, timestamps = frame[~missing], timestamps[~missing]
+
+    cleaned = clean_price_frame(frame, rejections)
+    if not len(cleaned):
+        return index, 0, rejections, {}
+    cleaned['timestamp'] = timestamps[cleaned.index]
+    cleaned['date'] = cleaned['timestamp'].dt.tz_convert(timezone.get_current_timezone_name()).dt.date
+
+    with transaction.atomic():
+        vegetables, _ = resolve_vegetables(names=cleaned['vegetable_name'].unique())
+        cities, _ = resolve_cities(names=cleaned['city_name'].unique())
+
+        rows = {}
+        dates = {}
+        for vegetable_name, city_name, price, source, location, rating, timestamp, date in cleaned.itertuples(index=False):
+            vegetable_id = vegetables[vegetable_name].pk
+            city_id = cities[city_name].pk
+            key = observation_key(vegetable_id, city_id, source, location, date)
+            # The last row of an observation within the chunk wins
+            rows[key] = (vegetable_id, city_id, price, source, location, rating, timestamp.to_pydatetime(), key)
+            dates[key] = date
+
+        if connection.vendor == 'postgresql':
+            inserted = _copy_insert(list(rows.values()))
+        else:
+            existing = PriceEntry.objects.filter(observation_key__in=list(rows)).count()
+            PriceEntry.objects.bulk_create(
+                [PriceEntry(**dict(zip(INSERT_COLUMNS, row))) for row in rows.values()],
+                ignore_conflicts=True
+            )
+            inserted = len(rows) - existing
+
+    ranges = {}
+    if inserted:
+        for key, row in rows.items():
+            series, date = (row[0], row[1], row[3]), dates[key]
+            first, last = ranges.get(series, (date, date))
+            ranges[series] = (min(first, date), max(last, date))
+    return index, inserted, rejections, ranges
+
+
+def _copy_insert(rows):
+    """
+    Load rows with COPY into a temporary table and move them into
+    PriceEntry with ON CONFLICT DO NOTHING. Returns rows inserted.
+
+    CSV COPY reads unquoted empty fields as NULL; FORCE_NOT_NULL keeps
+    blank locations (and sources) empty strings for the NOT NULL columns.
+    """
+    buffer = StringIO()
+    csv.writer(buffer).writerows(rows)
+    buffer.seek(0)
+
+    table = connection.ops.quote_name(PriceEntry._meta.db_table)
+    columns = ', '.join(INSERT_COLUMNS)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'CREATE TEMPORARY TABLE import_prices_stage ON COMMIT DROP AS '
+            f'SELECT {columns} FROM {table} WITH NO DATA'
+        )
+        cursor.cursor.copy_expert(f'COPY import_prices_stage ({columns}) FROM STDIN WITH (FORMAT csv, FORCE_NOT_NULL (location, source))', buffer)
+        cursor.execute(
+            f'INSERT INTO {table} ({columns}) SELECT {columns} FROM import_prices_stage '
+            f'ON CONFLICT (observation_key) DO NOTHING'
+        )
+        return cursor.rowcount
+
+
+class ImportCheckpoint:
+    """
+    JSON record of the chunks of one file that were already imported.
+
+    Progress is kept as an offset (every chunk before it is done) plus the
+    few chunks beyond it that parallel workers finished early, and the
+    rows added as one date range per series, so the record stays small
+    however long the file is.
+
+    The checkpoint is tied to the file's path, size, mtime and the chunk
+    size; a checkpoint for anything else is refused rather than applied.
+    It is rewritten atomically after every chunk.
+    """
+
+    def __init__(self, path, source_path, chunk_size):
+        stat = os.stat(source_path)
+        self.path = path
+        self.identity = {
+            'file': os.path.abspath(source_path),
+            'size': stat.st_size,
+            'mtime': stat.st_mtime,
+            'chunk_size': chunk_size,
+        }
+        self.offset = 0
+        self.completed = set()
+        self.inserted = 0
+        self.rejections = Counter()
+        # (first, last) dates the import added rows to, per series
+        self.ranges = {}
+
+    def load(self):
+        """Load progress from disk; returns whether there was any"""
+        if not os.path.exists(self.path):
+            return False
+
+        with open(self.path) as f:
+            state = json.load(f)
+        if state.get('identity') != self.identity:
+            raise ValueError(f'Checkpoint {self.path} belongs to a different file or chunk size')
+
+        self.offset = state.get('offset', 0)
+        self.completed = set(state['completed'])
+        self.inserted = state['inserted']
+        self.rejections = Counter(state['rejections'])
+        self.ranges = {
+            (vegetable_id, city_id, source): (datetime.date.fromisoformat(first), datetime.date.fromisoformat(last))
+            for vegetable_id, city_id, source, first, last in state.get('ranges', [])
+        }
+        return True
+
+    @property
+    def chunks(self):
+        return self.offset + len(self.completed)
+
+    def is_done(self, index):
+        return index < self.offset or index in self.completed
+
+    def mark(self, index, inserted, rejections, ranges=None):
+        self.completed.add(index)
+        while self.offset in self.completed:
+            self.completed.remove(self.offset)
+            self.offset += 1
+        self.inserted += inserted
+        self.rejections.update(rejections)
+        merge_date_ranges(self.ranges, ranges or {})
+        self.save()
+
+    def save(self):
+        state = {
+            'identity': self.identity,
+            'offset': self.offset,
+            'completed': sorted(self.completed),
+            'inserted': self.inserted,
+            'rejections': dict(self.rejections),
+            'ranges': [
+                [int(vegetable_id), int(city_id), source, first.isoformat(), last.isoformat()]
+                for (vegetable_id, city_id, source), (first, last) in self.ranges.items()
+            ],
+        }
+        tmp_path = f'{self.path}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.path)
+
+    def clear(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def import_prices(path, chunk_size=5000, workers=1, checkpoint_path=None, restart=False,
+                  default_source=None, rebuild_rollups=True, progress=None):
+    """
+    Import historical prices from a CSV or Parquet file.
+
+    Chunks are streamed from the file and imported by `workers` forked
+    processes (in-process with one worker), with at most two chunks per
+    worker in flight. Completed chunks are checkpointed, so rerunning an
+    interrupted import skips them; `restart` discards the checkpoint.
+    The daily rollups are rebuilt once at the end, over the date range
+    each series received rows in.
+    """
+    started = time.perf_counter()
+    checkpoint = ImportCheckpoint(checkpoint_path or f'{path}.checkpoint.json', path, chunk_size)
+    if restart:
+        checkpoint.clear()
+    elif checkpoint.load():
+        logger.info(f"Resuming import of {path}: {checkpoint.chunks} chunks already done")
+
+    if workers > 1 and connection.vendor == 'sqlite':
+        logger.warning("SQLite allows a single writer; importing with one worker")
+        workers = 1
+    if workers > 1 and 'fork' not in multiprocessing.get_all_start_methods():
+        logger.warning("Worker processes need the fork start method; importing with one worker")
+        workers = 1
+
+    def finish(result):
+        index, inserted, rejections, ranges = result
+        checkpoint.mark(index, inserted, rejections, ranges)
+        if progress:
+            progress(index, inserted, checkpoint.inserted)
+
+    chunks = (
+        (index, frame) for index, frame in enumerate(iter_file_chunks(path, chunk_size))
+        if not checkpoint.is_done(index)
+    )
+
+    if workers > 1:
+        # Children must not share the parent's database connections
+        connections.close_all()
+        with multiprocessing.get_context('fork').Pool(workers) as pool:
+            pending = deque()
+            for index, frame in chunks:
+                pending.append(pool.apply_async(import_chunk, (index, frame, default_source)))
+                while len(pending) >= workers * 2:
+                    finish(pending.popleft().get())
+            while pending:
+                finish(pending.popleft().get())
+    else:
+        for index, frame in chunks:
+            finish(import_chunk(index, frame, default_source))
+
+    if rebuild_rollups and checkpoint.ranges:
+        rebuild_aggregate_ranges(checkpoint.ranges)
+    bump_data_version()
+
+    summary = {
+        'inserted': checkpoint.inserted,
+        'chunks': checkpoint.chunks,
+        'rejections': dict(checkpoint.rejections),
+        'seconds': round(time.perf_counter() - started, 3),
+    }
+    checkpoint.clear()
+    logger.info(f"Imported {path}: {summary}")
+    return summary
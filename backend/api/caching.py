@@ -0,0 +1,211 @@
+import hashlib
+import logging
+import time
+from functools import wraps
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import OuterRef, Subquery
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+from rest_framework.response import Response
+
+from .models import City, PriceEntry, Prediction
+
+logger = logging.getLogger(__name__)
+
+GLOBAL_VERSION_KEY = 'data-version'
+CITY_VERSION_KEY = 'data-version:{city}'
+
+
+def _city_key(city_name):
+    return CITY_VERSION_KEY.format(city=str(city_name).strip().lower())
+
+
+def _changed_at_key(version_key):
+    return f'{version_key}:changed-at'
+
+
+def get_data_versions(city_name):
+    """
+    Get the (global, city) data versions used to namespace cached responses.
+    Missing counters are seeded from the clock so a flushed cache never
+    reuses an old version number.
+    """
+    keys = [GLOBAL_VERSION_KEY, _city_key(city_name)]
+    versions = cache.get_many(keys)
+
+    for key in keys:
+        if key not in versions:
+            now = time.time()
+            cache.add(key, int(now * 1000), timeout=None)
+            cache.add(_changed_at_key(key), now, timeout=None)
+            versions[key] = cache.get(key)
+
+    return versions[keys[0]], versions[keys[1]]
+
+
+def data_changed_at(city_name):
+    """
+    When the global or city data version last changed (epoch seconds), or
+    None if unknown; rewritten data can change responses without moving
+    any row timestamp
+    """
+    changed = cache.get_many([_changed_at_key(GLOBAL_VERSION_KEY), _changed_at_key(_city_key(city_name))])
+    return max(changed.values()) if changed else None
+
+
+def bump_data_version(*city_names):
+    """
+    Invalidate cached responses for the given cities in O(1) per city.
+    With no cities, bumps the global version and invalidates everything.
+    """
+    keys = [_city_key(name) for name in set(city_names) if name] or [GLOBAL_VERSION_KEY]
+
+    now = time.time()
+    for key in keys:
+        try:
+            cache.incr(key)
+        except ValueError:
+            # Counter not seeded yet; nothing cached under it can be stale
+            cache.add(key, int(now * 1000), timeout=None)
+    cache.set_many({_changed_at_key(key): now for key in keys}, timeout=None)
+
+
+def _params_digest(query_params):
+    params = sorted(
+        (key, value.strip())
+        for key in query_params
+        for value in query_params.getlist(key)
+    )
+    return hashlib.sha1(urlencode(params).encode()).hexdigest()
+
+
+def response_cache_key(endpoint, query_params):
+    """
+    Build the cache key for a read endpoint from its normalized query
+    params and the current data versions of the requested city
+    """
+    digest = _params_digest(query_params)
+    global_version, city_version = get_data_versions(query_params.get('city', ''))
+
+    # Results depend on "today" (tomorrow's prediction, current month)
+    today = timezone.localdate().isoformat()
+    return f'api:{endpoint}:{global_version}:{city_version}:{today}:{digest}'
+
+
+def cached_response(endpoint):
+    """
+    Cache successful responses of an APIView `get` handler.
+
+    Entries are namespaced by data version, so writers invalidate them with
+    bump_data_version() instead of deleting keys.
+    """
+    def decorator(handler):
+        @wraps(handler)
+        def wrapper(self, request, *args, **kwargs):
+            if not request.query_params.get('city'):
+                return handler(self, request, *args, **kwargs)
+
+            key = response_cache_key(endpoint, request.query_params)
+            data = cache.get(key)
+            if data is not None:
+                return Response(data)
+
+            response = handler(self, request, *args, **kwargs)
+            if response.status_code == 200:
+                cache.set(key, response.data, settings.API_RESPONSE_CACHE_TIMEOUT)
+            return response
+
+        return wrapper
+
+    return decorator
+
+
+def city_last_modified(city_name):
+    """
+    Get the latest PriceEntry.timestamp and Prediction.created_at for a city
+    in one query. Memoized under the city's data version, so repeat
+    validations cost no database work until a writer bumps the version.
+    Returns None for an unknown city.
+    """
+    global_version, city_version = get_data_versions(city_name)
+    key = f'validators:{global_version}:{city_version}:{str(city_name).strip().lower()}'
+    validators = cache.get(key)
+    if validators is not None:
+        return validators
+
+    row = (
+        City.objects.filter(name=city_name)
+        .annotate(
+            latest_price=Subquery(
+                PriceEntry.objects.filter(city=OuterRef('pk'))
+                .order_by('-timestamp').values('timestamp')[:1]
+            ),
+            latest_prediction=Subquery(
+                Prediction.objects.filter(city=OuterRef('pk'))
+                .order_by('-created_at').values('created_at')[:1]
+            ),
+        )
+        .values_list('latest_price', 'latest_prediction')
+        .first()
+    )
+    if row is None:
+        return None
+
+    cache.set(key, row, settings.API_RESPONSE_CACHE_TIMEOUT)
+    return row
+
+
+def conditional_response(endpoint):
+    """
+    Add a strong ETag and Last-Modified to an APIView `get` handler and
+    answer If-None-Match / If-Modified-Since with 304 before the handler runs.
+
+    Validators come from the latest price and prediction writes and the
+    data versions of the requested city (and when they last changed),
+    plus the query params and today's date.
+    """
+    def decorator(handler):
+        @wraps(handler)
+        def wrapper(self, request, *args, **kwargs):
+            city_name = request.query_params.get('city')
+            validators = city_last_modified(city_name) if city_name else None
+            if validators is None:
+                return handler(self, request, *args, **kwargs)
+
+            # A version bump counts as a modification too, so clients
+            # revalidating with If-Modified-Since alone see rewritten data
+            modified = [ts.timestamp() for ts in validators if ts is not None]
+            changed_at = data_changed_at(city_name)
+            if changed_at is not None:
+                modified.append(changed_at)
+            last_modified = int(max(modified)) if modified else None
+            # Data versions catch writes that move neither timestamp
+            # (regenerated predictions, backfilled history)
+            etag = '"%s"' % hashlib.sha1(':'.join([
+                endpoint,
+                _params_digest(request.query_params),
+                timezone.localdate().isoformat(),
+                *[str(version) for version in get_data_versions(city_name)],
+                *[ts.isoformat() if ts else '' for ts in validators],
+            ]).encode()).hexdigest()
+
+            response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+            if response is None:
+                response = handler(self, request, *args, **kwargs)
+                if response.status_code != 200:
+                    return response
+
+            response['ETag'] = etag
+            if last_modified is not None:
+                response['Last-Modified'] = http_date(last_modified)
+            # Let clients store the response but always revalidate it
+            patch_cache_control(response, no_cache=True)
+            return response
+
+        return wrapper
+
+    return decorator
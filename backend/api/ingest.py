@@ -0,0 +1,291 @@
+import hashlib
+import logging
+import time
+from collections import Counter
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .caching import bump_data_version
+from .models import City, PriceEntry, Vegetable
+from .name_resolution import get_vegetable_index, invalidate_vegetable_index
+from .rollups import rebuild_daily_aggregates, update_daily_aggregates
+
+logger = logging.getLogger(__name__)
+
+
+def resolve_by_name(model, names=(), ids=(), defaults=None):
+    """
+    Map names and ids to model instances with one lookup query.
+
+    Names that do not exist yet are created in bulk with `defaults`;
+    unknown ids are left out of the returned maps. Returns
+    (by_name, by_id) dicts.
+    """
+    names = {name for name in names if name}
+    ids = {int(pk) for pk in ids if pk}
+
+    by_name, by_id = {}, {}
+    if names or ids:
+        for obj in model.objects.filter(Q(name__in=names) | Q(pk__in=ids)):
+            by_name[obj.name] = obj
+            by_id[obj.pk] = obj
+
+    missing = names - by_name.keys()
+    if missing:
+        model.objects.bulk_create(
+            [model(name=name, **(defaults or {})) for name in missing],
+            ignore_conflicts=True
+        )
+        # ignore_conflicts leaves pks unset, and a concurrent writer may have won
+        for obj in model.objects.filter(name__in=missing):
+            by_name[obj.name] = obj
+            by_id[obj.pk] = obj
+        logger.info(f"Created {len(missing)} new {model._meta.verbose_name_plural}")
+
+    return by_name, by_id
+
+
+def resolve_vegetables(names=(), ids=()):
+    """
+    Resolve vegetable names/ids, creating unknown names as 'other'.
+
+    Raw names go through the vegetable name index first, so aliases and
+    misspellings map to the existing vegetable; the returned by_name dict
+    is keyed by the raw names as given.
+    """
+    index = get_vegetable_index()
+    canonical = {name: index.resolve(name) or name for name in names if name}
+
+    by_name, by_id = resolve_by_name(Vegetable, set(canonical.values()), ids, defaults={'category': 'other'})
+    for raw, name in canonical.items():
+        by_name[raw] = by_name[name]
+
+    if any(name not in index for name in canonical.values()):
+        # New vegetables were created in bulk, without save signals
+        invalidate_vegetable_index()
+
+    return by_name, by_id
+
+
+def resolve_cities(names=(), ids=()):
+    """Resolve city names/ids, creating unknown names with a blank state"""
+    return resolve_by_name(City, names, ids, defaults={'state': ''})
+
+
+def store_price_submissions(rows):
+    """
+    Store validated price submissions (PriceSubmissionSerializer data, with
+    an optional `timestamp`) in one transaction.
+
+    Vegetables and cities are resolved with one lookup each, entries are
+    inserted with one bulk_create and folded into the daily rollups.
+    Returns (entries, missing) where `missing` lists the positions of rows
+    whose vegetable or city id does not exist.
+    """
+    with transaction.atomic():
+        vegetables_by_name, vegetables_by_id = resolve_vegetables(
+            names=[row.get('vegetable_name') for row in rows if not row.get('vegetable')],
+            ids=[row.get('vegetable') for row in rows]
+        )
+        cities_by_name, cities_by_id = resolve_cities(
+            names=[row.get('city_name') for row in rows if not row.get('city')],
+            ids=[row.get('city') for row in rows]
+        )
+
+        entries = []
+        missing = []
+        for position, row in enumerate(rows):
+            if row.get('vegetable'):
+                vegetable = vegetables_by_id.get(row['vegetable'])
+            else:
+                vegetable = vegetables_by_name.get(row['vegetable_name'])
+            if row.get('city'):
+                city = cities_by_id.get(row['city'])
+            else:
+                city = cities_by_name.get(row['city_name'])
+
+            if vegetable is None or city is None:
+                missing.append(position)
+                continue
+
+            entries.append(PriceEntry(
+                vegetable=vegetable,
+                city=city,
+                price_per_kg=row['price_per_kg'],
+                source=row['source'],
+                location=row['location'],
+                quality_rating=row['quality_rating'],
+                timestamp=row.get('timestamp') or timezone.now()
+            ))
+
+        PriceEntry.objects.bulk_create(entries)
+        update_daily_aggregates(entries)
+
+    if entries:
+        bump_data_version(*{entry.city.name for entry in entries})
+
+    return entries, missing
+
+
+def observation_key(vegetable_id, city_id, source, location, date):
+    """
+    Deterministic key of a scraped observation: one price per vegetable,
+    city, source and location per day
+    """
+    raw = f"{vegetable_id}|{city_id}|{source}|{(location or '').strip().lower()}|{date.isoformat()}"
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def _existing_prices(keys, chunk_size):
+    """Map already stored observation keys to their price"""
+    keys = list(keys)
+    existing = {}
+    for start in range(0, len(keys), chunk_size):
+        existing.update(
+            PriceEntry.objects.filter(observation_key__in=keys[start:start + chunk_size])
+            .values_list('observation_key', 'price_per_kg')
+        )
+    return existing
+
+
+SOURCES = {source for source, _ in PriceEntry.SOURCE_CHOICES}
+MAX_PRICE = Decimal('999999.99')
+
+
+def _validated_row(row):
+    """
+    A price row checked against the PriceEntry columns and normalized
+    (stripped names, Decimal price); raises ValueError with the rejection
+    reason for a row that cannot be stored
+    """
+    try:
+        vegetable_name = (row.get('vegetable_name') or '').strip()
+        city_name = (row.get('city_name') or '').strip()
+        location = (row.get('location') or '').strip()
+        price = Decimal(str(row['price_per_kg'])).quantize(Decimal('0.01'))
+        quality_rating = int(row.get('quality_rating', 5))
+    except (KeyError, TypeError, ArithmeticError, AttributeError, ValueError):
+        raise ValueError('malformed_row')
+
+    if not vegetable_name or not city_name:
+        raise ValueError('missing_name')
+    if len(vegetable_name) > 100 or len(city_name) > 100:
+        raise ValueError('overlong_name')
+    if not Decimal('0') < price <= MAX_PRICE:
+        raise ValueError('price_out_of_range')
+    if row.get('source') not in SOURCES:
+        raise ValueError('unknown_source')
+    if len(location) > 200:
+        raise ValueError('overlong_location')
+    if not 1 <= quality_rating <= 5:
+        raise ValueError('quality_rating_out_of_range')
+
+    return {
+        'vegetable_name': vegetable_name,
+        'city_name': city_name,
+        'price_per_kg': price,
+        'source': row['source'],
+        'location': location,
+        'quality_rating': quality_rating,
+    }
+
+
+def ingest_prices(rows, chunk_size=1000, observed_at=None):
+    """
+    Store cleaned price rows (as produced by scraper.clean_data) in bulk.
+
+    Ingestion is idempotent: every row is keyed by observation_key and
+    upserted, so re-running a fetch adds no rows. Rows repeating a stored
+    observation at the same price are skipped; a changed price replaces
+    the stored one. All distinct names are resolved up front and the
+    daily rollups and cached responses are updated once for the batch.
+    `observed_at` dates the rows (default now), e.g. when replaying
+    archived responses.
+
+    Rows that cannot be stored (missing names, bad prices, unknown
+    sources) are skipped before the transaction rather than failing the
+    whole batch; their positions are returned as `rejected` and the
+    count per reason as `rejections`, logged in one summary line.
+    """
+    started = time.perf_counter()
+    rows = list(rows)
+    valid, rejected = [], []
+    rejections = Counter()
+    for position, row in enumerate(rows):
+        try:
+            valid.append(_validated_row(row))
+        except ValueError as e:
+            rejected.append(position)
+            rejections[str(e)] += 1
+    if rejections:
+        logger.warning(f"Skipping {len(rejected)} price rows: {dict(rejections)}")
+    observed_at = observed_at or timezone.now()
+    today = timezone.localdate(observed_at)
+
+    with transaction.atomic():
+        vegetables, _ = resolve_vegetables(names={row['vegetable_name'] for row in valid})
+        cities, _ = resolve_cities(names={row['city_name'] for row in valid})
+
+        # The last row of an observation within the batch wins
+        entries = {}
+        for row in valid:
+            entry = PriceEntry(
+                vegetable=vegetables[row['vegetable_name']],
+                city=cities[row['city_name']],
+                price_per_kg=row['price_per_kg'],
+                source=row['source'],
+                location=row['location'],
+                quality_rating=row['quality_rating'],
+                timestamp=observed_at
+            )
+            entry.observation_key = observation_key(
+                entry.vegetable_id, entry.city_id, entry.source, entry.location, today
+            )
+            entries[entry.observation_key] = entry
+
+        existing = _existing_prices(entries, chunk_size)
+        created = [entry for key, entry in entries.items() if key not in existing]
+        updated = [
+            entry for key, entry in entries.items()
+            if key in existing and entry.price_per_kg != existing[key]
+        ]
+
+        PriceEntry.objects.bulk_create(
+            created + updated,
+            batch_size=chunk_size,
+            update_conflicts=True,
+            unique_fields=['observation_key'],
+            update_fields=['price_per_kg', 'quality_rating', 'timestamp']
+        )
+        update_daily_aggregates(created)
+        if updated:
+            # A replaced price cannot be folded out; rebuild its days instead
+            rebuild_daily_aggregates(
+                PriceEntry.objects.filter(observation_key__in=[entry.observation_key for entry in updated])
+            )
+
+    written = created + updated
+    if written:
+        bump_data_version(*{entry.city.name for entry in written})
+
+    elapsed = time.perf_counter() - started
+    rows_per_second = len(rows) / elapsed if elapsed > 0 else 0.0
+    logger.info(
+        f"Ingested {len(rows)} price rows in {elapsed:.2f}s ({rows_per_second:.0f} rows/s): "
+        f"{len(created)} created, {len(updated)} updated, {len(entries) - len(written)} unchanged, "
+        f"{len(rejected)} rejected"
+    )
+
+    return {
+        'count': len(written),
+        'created': len(created),
+        'updated': len(updated),
+        'unchanged': len(entries) - len(written),
+        'rejected': rejected,
+        'rejections': dict(rejections),
+        'seconds': round(elapsed, 3),
+        'rows_per_second': round(rows_per_second, 1),
+    }
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+from scraper.html_parsing import HTML_PARSER, STORE_PARSERS, FIXTURES_DIR, benchmark_parser, load_fixture_pages
+
+
+class Command(BaseCommand):
+    help = 'Measure pages/second of each store listing parser on saved fixture pages.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--store', action='append', dest='stores', choices=sorted(STORE_PARSERS), help='Only benchmark this store (repeatable)')
+        parser.add_argument('--fixtures', default=str(FIXTURES_DIR), help='Directory of <store>*.html pages')
+        parser.add_argument('--repeat', type=int, default=5, help='Passes over the pages per measurement')
+        parser.add_argument('--compare-full-tree', action='store_true', help='Also measure parsing the whole document tree')
+
+    def handle(self, *args, **options):
+        self.stdout.write(f'Parser backend: {HTML_PARSER}')
+        for source in options['stores'] or sorted(STORE_PARSERS):
+            pages = load_fixture_pages(source, options['fixtures'])
+            if not pages:
+                raise CommandError(f"No {source} fixture pages in {options['fixtures']}")
+
+            parser = STORE_PARSERS[source]
+            result = benchmark_parser(parser, pages, repeat=options['repeat'])
+            line = (
+                f"{source}: {result['pages_per_second']:.1f} pages/s "
+                f"({result['rows_per_page']:.0f} rows/page, {len(pages)} pages)"
+            )
+            if options['compare_full_tree']:
+                full = benchmark_parser(parser, pages, repeat=options['repeat'], full_tree=True)
+                line += f", full tree {full['pages_per_second']:.1f} pages/s"
+            self.stdout.write(line)
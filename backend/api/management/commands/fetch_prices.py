@@ -7,13 +7,15 @@ class Command(BaseCommand):
 
     def add_arguments(self, parser):
         parser.add_argument('--async', action='store_true', dest='use_async', help='Enqueue the fetch task to Celery instead of running synchronously')
+        parser.add_argument('--full', action='store_true', help='Ignore source watermarks and re-download every source')
 
     def handle(self, *args, **options):
         use_async = options.get('use_async', False)
+        full = options.get('full', False)
         if use_async:
-            result = fetch_and_store_prices.delay()
+            result = fetch_and_store_prices.delay(full=full)
             self.stdout.write(self.style.SUCCESS(f'Enqueued fetch task: {result.id}'))
         else:
             self.stdout.write('Running fetch task synchronously...')
-            result = fetch_and_store_prices()
+            result = fetch_and_store_prices(full=full)
             self.stdout.write(self.style.SUCCESS(f'Done: {result}'))
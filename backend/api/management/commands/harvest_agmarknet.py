@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from api.tasks import harvest_agmarknet_prices
+
+
+class Command(BaseCommand):
+    help = 'Harvest every configured Agmarknet commodity/state/district page. Use --async to enqueue as a Celery task.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--async', action='store_true', dest='use_async', help='Enqueue the harvest task to Celery instead of running synchronously')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows cleaned and stored per batch')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        if options.get('use_async', False):
+            result = harvest_agmarknet_prices.delay(batch_size=batch_size)
+            self.stdout.write(self.style.SUCCESS(f'Enqueued harvest task: {result.id}'))
+        else:
+            self.stdout.write('Running Agmarknet harvest synchronously...')
+            result = harvest_agmarknet_prices(batch_size=batch_size)
+            self.stdout.write(self.style.SUCCESS(f'Done: {result}'))
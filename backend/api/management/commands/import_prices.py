@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+from api.bulk_import import import_prices
+
+
+class Command(BaseCommand):
+    help = (
+        'Import historical prices from a CSV or Parquet file, keeping the original timestamps. '
+        'Interrupted imports resume from their checkpoint.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV or .parquet file with vegetable_name, city_name, price_per_kg, timestamp and optional source, location, quality_rating columns')
+        parser.add_argument('--chunk-size', type=int, default=5000, help='Rows read, cleaned and inserted per chunk')
+        parser.add_argument('--workers', type=int, default=1, help='Worker processes importing chunks in parallel (PostgreSQL only)')
+        parser.add_argument('--checkpoint', help='Checkpoint file (default: <path>.checkpoint.json)')
+        parser.add_argument('--restart', action='store_true', help='Ignore an existing checkpoint and import from the start')
+        parser.add_argument('--source', help='Source for rows without one (e.g. government)')
+        parser.add_argument('--skip-rollups', action='store_true', help='Do not rebuild daily rollups afterwards (run rebuild_price_aggregates later)')
+
+    def handle(self, *args, **options):
+        def progress(index, inserted, total):
+            self.stdout.write(f'Chunk {index}: {inserted} inserted ({total} total)')
+
+        self.stdout.write(f"Importing {options['path']}...")
+        try:
+            summary = import_prices(
+                options['path'],
+                chunk_size=options['chunk_size'],
+                workers=options['workers'],
+                checkpoint_path=options.get('checkpoint'),
+                restart=options['restart'],
+                default_source=options.get('source'),
+                rebuild_rollups=not options['skip_rollups'],
+                progress=progress,
+            )
+        except (OSError, ImportError, ValueError) as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(self.style.SUCCESS(f'Done: {summary}'))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from api.models import PriceEntry
+from api.rollups import rebuild_daily_aggregates
+from api.caching import bump_data_version
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the daily OHLC price rollups from raw price entries. Use --city to limit the rebuild to one city.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--city', help='Only rebuild rollups for this city name')
+        parser.add_argument('--batch-size', type=int, default=2000, help='Rows fetched and rollups written per batch')
+
+    def handle(self, *args, **options):
+        entries = None
+        if options.get('city'):
+            entries = PriceEntry.objects.filter(city__name=options['city'])
+
+        self.stdout.write('Rebuilding daily price aggregates...')
+        created = rebuild_daily_aggregates(entries, batch_size=options['batch_size'])
+        bump_data_version(*filter(None, [options.get('city')]))
+        self.stdout.write(self.style.SUCCESS(f'Done: {created} daily aggregates written'))
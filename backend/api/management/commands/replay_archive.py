@@ -0,0 +1,61 @@
+import time
+from collections import Counter
+from itertools import groupby
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from api.ingest import ingest_prices
+from scraper import RESPONSE_PARSERS
+from scraper.archive import ResponseArchive, replay_responses
+from scraper.clean_data import iter_clean_price_batches
+
+
+class Command(BaseCommand):
+    help = 'Re-parse archived scraper responses without network access and store the prices they contain.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', default=None, help='Archive directory (defaults to SCRAPER_ARCHIVE_DIR)')
+        parser.add_argument('--source', action='append', dest='sources', help='Only replay this source (repeatable)')
+        parser.add_argument('--dry-run', action='store_true', help='Parse and clean only; report throughput without storing')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows cleaned and stored per batch')
+
+    def handle(self, *args, **options):
+        path = options['path'] or settings.SCRAPER_ARCHIVE_DIR
+        if not path:
+            raise CommandError('No archive directory given and SCRAPER_ARCHIVE_DIR is not set')
+
+        archive = ResponseArchive(path)
+        started = time.perf_counter()
+        responses = parsed = stored = 0
+        rejections = Counter()
+
+        # Rows are dated by their fetch, so responses of the same day are
+        # stored together as observations of that day
+        replayed = (
+            (parse_datetime(entry['fetched_at']), rows)
+            for entry, rows in replay_responses(archive, RESPONSE_PARSERS, options['sources'])
+        )
+        for day, group in groupby(replayed, key=lambda item: timezone.localdate(item[0])):
+            raw_rows = []
+            for fetched_at, rows in group:
+                responses += 1
+                raw_rows.extend(rows)
+
+            for batch in iter_clean_price_batches(raw_rows, chunk_size=options['batch_size'], rejections=rejections):
+                parsed += len(batch)
+                if not options['dry_run']:
+                    stored += ingest_prices(batch, observed_at=fetched_at)['count']
+
+        elapsed = time.perf_counter() - started
+        rate = parsed / elapsed if elapsed > 0 else 0.0
+        self.stdout.write(
+            f'Replayed {responses} responses: {parsed} clean rows in {elapsed:.2f}s ({rate:.0f} rows/s), '
+            f'rejected {dict(rejections)}'
+        )
+        if options['dry_run']:
+            self.stdout.write(self.style.SUCCESS('Dry run: nothing stored'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Stored {stored} price entries'))
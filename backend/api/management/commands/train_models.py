@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+from api.tasks import train_prediction_models
+
+
+class Command(BaseCommand):
+    help = 'Train forecasting models for every series whose data changed since it was last trained. Use --async to enqueue as a Celery task.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--async', action='store_true', dest='use_async', help='Enqueue the training task to Celery instead of running synchronously')
+        parser.add_argument('--force', action='store_true', help='Retrain every series, even when its data is unchanged')
+        parser.add_argument('--workers', type=int, help='Worker processes (default: TRAINING_WORKERS)')
+        parser.add_argument('--timeout', type=float, help='Seconds allowed per series (default: TRAINING_SERIES_TIMEOUT)')
+
+    def handle(self, *args, **options):
+        kwargs = {'workers': options['workers'], 'timeout': options['timeout'], 'force': options['force']}
+        if options.get('use_async', False):
+            result = train_prediction_models.delay(**kwargs)
+            self.stdout.write(self.style.SUCCESS(f'Enqueued training task: {result.id}'))
+            return
+
+        self.stdout.write('Training models synchronously...')
+        result = train_prediction_models(**kwargs)
+        if result['status'] != 'success':
+            self.stderr.write(self.style.ERROR(f"Training failed: {result['message']}"))
+            return
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Trained {result['trained']} of {result['series']} series in {result['seconds']:.1f}s "
+            f"({result['skipped']} unchanged, {result['failed']} failed, {result['timeout']} timed out)"
+        ))
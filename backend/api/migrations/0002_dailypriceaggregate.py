@@ -0,0 +1,150 @@
+# Generated by Django 4.2.7 on 2026-10-17 23:02
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyPriceAggregate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(choices=[('bigbasket', 'BigBasket'), ('jiomart', 'JioMart'), ('blinkit', 'Blinkit'), ('local_market', 'Local Market'), ('government', 'Government'), ('other', 'Other')], max_length=50)),
+                ('date', models.DateField()),
+                ('open_price', models.DecimalField(decimal_places=2, max_digits=8)),
+                ('high_price', models.DecimalField(decimal_places=2, max_digits=8)),
+                ('low_price', models.DecimalField(decimal_places=2, max_digits=8)),
+                ('close_price', models.DecimalField(decimal_places=2, max_digits=8)),
+                ('mean_price', models.DecimalField(decimal_places=2, max_digits=8)),
+                ('total_price', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('first_timestamp', models.DateTimeField()),
+                ('last_timestamp', models.DateTimeField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['-date'],
+            },
+        ),
+        migrations.AlterModelOptions(
+            name='prediction',
+            options={'ordering': ['prediction_date']},
+        ),
+        migrations.RemoveIndex(
+            model_name='priceentry',
+            name='api_price_vegetable_city_timestamp_idx',
+        ),
+        migrations.RenameIndex(
+            model_name='prediction',
+            new_name='api_predict_vegetab_758652_idx',
+            old_name='api_prediction_vegetable_city_date_idx',
+        ),
+        migrations.AlterField(
+            model_name='prediction',
+            name='city',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='predictions', to='api.city'),
+        ),
+        migrations.AlterField(
+            model_name='prediction',
+            name='lower_bound',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=8, null=True),
+        ),
+        migrations.AlterField(
+            model_name='prediction',
+            name='model_used',
+            field=models.CharField(choices=[('prophet', 'Prophet'), ('arima', 'ARIMA'), ('lstm', 'LSTM'), ('ensemble', 'Ensemble')], max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='prediction',
+            name='predicted_price',
+            field=models.DecimalField(decimal_places=2, max_digits=8),
+        ),
+        migrations.AlterField(
+            model_name='prediction',
+            name='upper_bound',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=8, null=True),
+        ),
+        migrations.AlterField(
+            model_name='prediction',
+            name='vegetable',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='predictions', to='api.vegetable'),
+        ),
+        migrations.AlterField(
+            model_name='priceentry',
+            name='city',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='price_entries', to='api.city'),
+        ),
+        migrations.AlterField(
+            model_name='priceentry',
+            name='location',
+            field=models.CharField(blank=True, max_length=200),
+        ),
+        migrations.AlterField(
+            model_name='priceentry',
+            name='price_per_kg',
+            field=models.DecimalField(decimal_places=2, max_digits=8),
+        ),
+        migrations.AlterField(
+            model_name='priceentry',
+            name='quality_rating',
+            field=models.IntegerField(choices=[(1, '1'), (2, '2'), (3, '3'), (4, '4'), (5, '5')], default=5),
+        ),
+        migrations.AlterField(
+            model_name='priceentry',
+            name='source',
+            field=models.CharField(choices=[('bigbasket', 'BigBasket'), ('jiomart', 'JioMart'), ('blinkit', 'Blinkit'), ('local_market', 'Local Market'), ('government', 'Government'), ('other', 'Other')], max_length=50),
+        ),
+        migrations.AlterField(
+            model_name='priceentry',
+            name='vegetable',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='price_entries', to='api.vegetable'),
+        ),
+        migrations.AlterField(
+            model_name='userfeedback',
+            name='city',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='api.city'),
+        ),
+        migrations.AlterField(
+            model_name='userfeedback',
+            name='comment',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AlterField(
+            model_name='userfeedback',
+            name='feedback_type',
+            field=models.CharField(choices=[('recommendation_useful', 'Recommendation was useful'), ('recommendation_not_useful', 'Recommendation was not useful'), ('price_accurate', 'Price was accurate'), ('price_inaccurate', 'Price was inaccurate')], max_length=50),
+        ),
+        migrations.AlterField(
+            model_name='userfeedback',
+            name='vegetable',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='api.vegetable'),
+        ),
+        migrations.AddIndex(
+            model_name='priceentry',
+            index=models.Index(fields=['vegetable', 'city', '-timestamp'], name='api_priceen_vegetab_9e2a05_idx'),
+        ),
+        migrations.AddField(
+            model_name='dailypriceaggregate',
+            name='city',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_aggregates', to='api.city'),
+        ),
+        migrations.AddField(
+            model_name='dailypriceaggregate',
+            name='vegetable',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_aggregates', to='api.vegetable'),
+        ),
+        migrations.AddIndex(
+            model_name='dailypriceaggregate',
+            index=models.Index(fields=['city', 'date'], name='api_dailypr_city_id_2688b8_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='dailypriceaggregate',
+            unique_together={('vegetable', 'city', 'source', 'date')},
+        ),
+    ]
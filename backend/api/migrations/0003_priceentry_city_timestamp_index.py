@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-17 23:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_dailypriceaggregate'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='priceentry',
+            index=models.Index(fields=['city', '-timestamp'], name='api_priceen_city_id_b22903_idx'),
+        ),
+    ]
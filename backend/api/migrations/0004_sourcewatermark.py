@@ -0,0 +1,29 @@
+# Generated by Django 4.2.7 on 2026-10-17 23:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_priceentry_city_timestamp_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SourceWatermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(max_length=50)),
+                ('endpoint', models.CharField(blank=True, max_length=500)),
+                ('last_success_at', models.DateTimeField(blank=True, null=True)),
+                ('etag', models.CharField(blank=True, max_length=255)),
+                ('last_modified', models.CharField(blank=True, max_length=64)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['source', 'endpoint'],
+                'unique_together': {('source', 'endpoint')},
+            },
+        ),
+    ]
@@ -0,0 +1,91 @@
+# Generated by Django 4.2.7 on 2026-10-17 23:12
+
+import hashlib
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.utils import timezone
+
+SCRAPED_SOURCES = ['government', 'bigbasket', 'jiomart', 'blinkit']
+
+
+def _observation_key(vegetable_id, city_id, source, location, date):
+    # Frozen copy of api.ingest.observation_key
+    raw = f"{vegetable_id}|{city_id}|{source}|{(location or '').strip().lower()}|{date.isoformat()}"
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def backfill_observation_keys(apps, schema_editor):
+    """
+    Key existing scraped rows, keeping the latest row of each observation
+    and deleting the older duplicates, then recompute the daily rollups
+    of every day that lost rows.
+    """
+    PriceEntry = apps.get_model('api', 'PriceEntry')
+    DailyPriceAggregate = apps.get_model('api', 'DailyPriceAggregate')
+
+    rows = (
+        PriceEntry.objects.filter(source__in=SCRAPED_SOURCES)
+        .order_by('-timestamp', '-id')
+        .values_list('id', 'vegetable_id', 'city_id', 'source', 'location', 'timestamp')
+    )
+
+    seen = set()
+    keep = []
+    duplicates = []
+    touched_days = set()
+    for pk, vegetable_id, city_id, source, location, timestamp in rows.iterator(chunk_size=2000):
+        date = timezone.localtime(timestamp).date()
+        key = _observation_key(vegetable_id, city_id, source, location, date)
+        if key in seen:
+            duplicates.append(pk)
+            touched_days.add((vegetable_id, city_id, source, date))
+        else:
+            seen.add(key)
+            keep.append(PriceEntry(id=pk, observation_key=key))
+
+    for start in range(0, len(duplicates), 500):
+        PriceEntry.objects.filter(id__in=duplicates[start:start + 500]).delete()
+    PriceEntry.objects.bulk_update(keep, ['observation_key'], batch_size=500)
+
+    for vegetable_id, city_id, source, date in touched_days:
+        aggregate = DailyPriceAggregate.objects.filter(
+            vegetable_id=vegetable_id, city_id=city_id, source=source, date=date
+        ).first()
+        if aggregate is None:
+            continue
+
+        day = list(
+            PriceEntry.objects.filter(
+                vegetable_id=vegetable_id, city_id=city_id, source=source, timestamp__date=date
+            ).order_by('timestamp').values_list('price_per_kg', 'timestamp')
+        )
+        if not day:
+            aggregate.delete()
+            continue
+
+        prices = [price for price, _ in day]
+        aggregate.open_price, aggregate.first_timestamp = day[0]
+        aggregate.close_price, aggregate.last_timestamp = day[-1]
+        aggregate.high_price = max(prices)
+        aggregate.low_price = min(prices)
+        aggregate.total_price = sum(prices, Decimal('0'))
+        aggregate.count = len(prices)
+        aggregate.mean_price = (aggregate.total_price / aggregate.count).quantize(Decimal('0.01'))
+        aggregate.save()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_sourcewatermark'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='priceentry',
+            name='observation_key',
+            field=models.CharField(blank=True, editable=False, max_length=64, null=True, unique=True),
+        ),
+        migrations.RunPython(backfill_observation_keys, migrations.RunPython.noop),
+    ]
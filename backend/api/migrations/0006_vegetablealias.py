@@ -0,0 +1,26 @@
+# Generated by Django 4.2.7 on 2026-10-17 23:15
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_priceentry_observation_key'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VegetableAlias',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('alias', models.CharField(max_length=100, unique=True)),
+                ('vegetable', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='aliases', to='api.vegetable')),
+            ],
+            options={
+                'verbose_name_plural': 'vegetable aliases',
+                'ordering': ['alias'],
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.7 on 2026-10-17 23:37
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_priceentry_timestamp_default'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrainingState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model_type', models.CharField(choices=[('prophet', 'Prophet'), ('arima', 'ARIMA')], max_length=20)),
+                ('row_count', models.IntegerField()),
+                ('last_date', models.DateField()),
+                ('checksum', models.CharField(max_length=64)),
+                ('trained_at', models.DateTimeField()),
+                ('city', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='training_states', to='api.city')),
+                ('vegetable', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='training_states', to='api.vegetable')),
+            ],
+            options={
+                'ordering': ['vegetable', 'city', 'model_type'],
+                'unique_together': {('vegetable', 'city', 'model_type')},
+            },
+        ),
+    ]
@@ -0,0 +1,70 @@
+from decimal import Decimal
+
+from django.db import migrations
+from django.utils import timezone
+
+
+def _aggregate(DailyPriceAggregate, key, day):
+    # Frozen copy of the api.rollups fold over one day's (price, timestamp) rows
+    vegetable_id, city_id, source, date = key
+    prices = [price for price, _ in day]
+    total = sum(prices, Decimal('0'))
+    return DailyPriceAggregate(
+        vegetable_id=vegetable_id,
+        city_id=city_id,
+        source=source,
+        date=date,
+        open_price=day[0][0],
+        high_price=max(prices),
+        low_price=min(prices),
+        close_price=day[-1][0],
+        mean_price=(total / len(prices)).quantize(Decimal('0.01')),
+        total_price=total,
+        count=len(prices),
+        first_timestamp=day[0][1],
+        last_timestamp=day[-1][1],
+    )
+
+
+def backfill_daily_aggregates(apps, schema_editor):
+    """
+    Build the daily rollups InsightsView reads for every existing price,
+    streaming rows in series order so one day is held in memory at a time
+    """
+    PriceEntry = apps.get_model('api', 'PriceEntry')
+    DailyPriceAggregate = apps.get_model('api', 'DailyPriceAggregate')
+
+    rows = (
+        PriceEntry.objects.order_by('vegetable_id', 'city_id', 'source', 'timestamp')
+        .values_list('vegetable_id', 'city_id', 'source', 'timestamp', 'price_per_kg')
+    )
+
+    DailyPriceAggregate.objects.all().delete()
+    batch = []
+    key, day = None, []
+    for vegetable_id, city_id, source, timestamp, price in rows.iterator(chunk_size=2000):
+        row_key = (vegetable_id, city_id, source, timezone.localtime(timestamp).date())
+        if row_key != key and day:
+            batch.append(_aggregate(DailyPriceAggregate, key, day))
+            day = []
+        key = row_key
+        day.append((price, timestamp))
+
+        if len(batch) >= 2000:
+            DailyPriceAggregate.objects.bulk_create(batch)
+            batch = []
+
+    if day:
+        batch.append(_aggregate(DailyPriceAggregate, key, day))
+    DailyPriceAggregate.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_trainingstate'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_daily_aggregates, migrations.RunPython.noop),
+    ]
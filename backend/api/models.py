@@ -42,6 +42,22 @@ class Vegetable(models.Model):
         return self.name
 
 
+class VegetableAlias(models.Model):
+    """
+    Alternative spelling of a vegetable name seen in scraped data.
+    Resolved to the vegetable by api.name_resolution at ingest time.
+    """
+    vegetable = models.ForeignKey(Vegetable, on_delete=models.CASCADE, related_name='aliases')
+    alias = models.CharField(max_length=100, unique=True)
+
+    class Meta:
+        ordering = ['alias']
+        verbose_name_plural = 'vegetable aliases'
+
+    def __str__(self):
+        return f"{self.alias} -> {self.vegetable.name}"
+
+
 # ========== PRICE ENTRY MODEL ==========
 class PriceEntry(models.Model):
     SOURCE_CHOICES = [
@@ -58,19 +74,78 @@ class PriceEntry(models.Model):
     price_per_kg = models.DecimalField(max_digits=8, decimal_places=2)
     source = models.CharField(max_length=50, choices=SOURCE_CHOICES)
     location = models.CharField(max_length=200, blank=True)
-    timestamp = models.DateTimeField(auto_now_add=True)
+    timestamp = models.DateTimeField(default=timezone.now)  # Observation time; imports keep the original
     quality_rating = models.IntegerField(default=5, choices=[(i, str(i)) for i in range(1, 6)])
+    # Deterministic key of a scraped observation (see api.ingest.observation_key);
+    # null for user submissions, which may legitimately repeat
+    observation_key = models.CharField(max_length=64, unique=True, null=True, blank=True, editable=False)
 
     class Meta:
         ordering = ['-timestamp']
         indexes = [
             models.Index(fields=['vegetable', 'city', '-timestamp']),
+            models.Index(fields=['city', '-timestamp']),
         ]
 
     def __str__(self):
         return f"{self.vegetable.name} - {self.city.name} (₹{self.price_per_kg})"
 
 
+# ========== DAILY PRICE AGGREGATE MODEL ==========
+class DailyPriceAggregate(models.Model):
+    """
+    Daily OHLC rollup of PriceEntry rows per vegetable, city and source.
+    Maintained at write time by api.rollups; rebuild with
+    `manage.py rebuild_price_aggregates`.
+    """
+    vegetable = models.ForeignKey(Vegetable, on_delete=models.CASCADE, related_name='daily_aggregates')
+    city = models.ForeignKey(City, on_delete=models.CASCADE, related_name='daily_aggregates')
+    source = models.CharField(max_length=50, choices=PriceEntry.SOURCE_CHOICES)
+    date = models.DateField()
+    open_price = models.DecimalField(max_digits=8, decimal_places=2)
+    high_price = models.DecimalField(max_digits=8, decimal_places=2)
+    low_price = models.DecimalField(max_digits=8, decimal_places=2)
+    close_price = models.DecimalField(max_digits=8, decimal_places=2)
+    mean_price = models.DecimalField(max_digits=8, decimal_places=2)
+    total_price = models.DecimalField(max_digits=14, decimal_places=2)  # Running sum for the mean
+    count = models.PositiveIntegerField(default=0)
+    first_timestamp = models.DateTimeField()
+    last_timestamp = models.DateTimeField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-date']
+        unique_together = ['vegetable', 'city', 'source', 'date']
+        indexes = [
+            models.Index(fields=['city', 'date']),
+        ]
+
+    def __str__(self):
+        return f"{self.vegetable.name} - {self.city.name} ({self.source}, {self.date})"
+
+
+# ========== SOURCE WATERMARK MODEL ==========
+class SourceWatermark(models.Model):
+    """
+    Last successful fetch of a scraper source endpoint, with the HTTP
+    validators it returned. Used by api.watermarks to send conditional,
+    incremental requests on the next run.
+    """
+    source = models.CharField(max_length=50)
+    endpoint = models.CharField(max_length=500, blank=True)  # Blank for the source as a whole
+    last_success_at = models.DateTimeField(null=True, blank=True)
+    etag = models.CharField(max_length=255, blank=True)
+    last_modified = models.CharField(max_length=64, blank=True)  # Raw HTTP date
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['source', 'endpoint']
+        unique_together = ['source', 'endpoint']
+
+    def __str__(self):
+        return f"{self.source} {self.endpoint or '*'} ({self.last_success_at})"
+
+
 # ========== PREDICTION MODEL ==========
 class Prediction(models.Model):
     MODEL_CHOICES = [
@@ -100,6 +175,33 @@ class Prediction(models.Model):
         return f"{self.vegetable.name} - {self.city.name} ({self.prediction_date})"
 
 
+class TrainingState(models.Model):
+    """
+    Fingerprint of the data a forecasting model of one series was last
+    trained on. The nightly trainer skips a series whose daily prices
+    still match it (see ml.orchestrator).
+    """
+    MODEL_CHOICES = [
+        ('prophet', 'Prophet'),
+        ('arima', 'ARIMA'),
+    ]
+
+    vegetable = models.ForeignKey(Vegetable, on_delete=models.CASCADE, related_name='training_states')
+    city = models.ForeignKey(City, on_delete=models.CASCADE, related_name='training_states')
+    model_type = models.CharField(max_length=20, choices=MODEL_CHOICES)
+    row_count = models.IntegerField()  # Days in the training series
+    last_date = models.DateField()  # Last day of the training series
+    checksum = models.CharField(max_length=64)  # sha256 of the series' dates and prices
+    trained_at = models.DateTimeField()
+
+    class Meta:
+        ordering = ['vegetable', 'city', 'model_type']
+        unique_together = ['vegetable', 'city', 'model_type']
+
+    def __str__(self):
+        return f"{self.model_type} {self.vegetable.name} - {self.city.name} ({self.last_date})"
+
+
 # ========== USER INTERACTION MODEL ==========
 class UserFeedback(models.Model):
     FEEDBACK_TYPE = [
@@ -0,0 +1,214 @@
+import logging
+import re
+import time
+from collections import Counter, defaultdict
+
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from scraper.clean_data import VEGETABLE_NAME_ALIASES
+from .models import Vegetable, VegetableAlias
+
+logger = logging.getLogger(__name__)
+
+INDEX_VERSION_KEY = 'vegetable-names-version'
+
+# Fuzzy results are memoized per raw string; cleared when this many pile up
+MEMO_LIMIT = 100000
+
+_WHITESPACE = re.compile(r'\s+')
+_DIGITS = re.compile(r'\d+')
+
+
+def normalize_name(name):
+    """Lookup key of a raw commodity string: casefolded, single-spaced, no edge punctuation"""
+    return _WHITESPACE.sub(' ', str(name)).strip(' .,;:-').casefold()
+
+
+def max_edit_distance(key):
+    """Typos tolerated for a key: none for very short names, more for long ones"""
+    if len(key) < 4:
+        return 0
+    return 1 if len(key) < 8 else 2
+
+
+def levenshtein(a, b, limit=None):
+    """
+    Edit distance between two strings. With a limit, stops early and
+    returns limit + 1 as soon as the distance is known to exceed it.
+    """
+    if limit is not None and abs(len(a) - len(b)) > limit:
+        return limit + 1
+
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b)))
+        if limit is not None and min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+def bigrams(key):
+    """Bigram multiset of a key, padded so its first and last letters count twice"""
+    padded = f' {key} '
+    return Counter(padded[i:i + 2] for i in range(len(padded) - 1))
+
+
+class NgramIndex:
+    """
+    Bigram inverted index for edit-distance range queries.
+
+    By the q-gram lemma, a word within k edits of a query shares at least
+    len(query) + 1 - 2k bigrams with it, so only words passing that count
+    (and the length bound) are verified with a capped Levenshtein.
+    """
+
+    def __init__(self, words=()):
+        self.words = []
+        self.postings = defaultdict(list)
+        self.by_length = defaultdict(list)
+        for word in words:
+            self.add(word)
+
+    def add(self, word):
+        position = len(self.words)
+        self.words.append(word)
+        self.by_length[len(word)].append(position)
+        for gram, count in bigrams(word).items():
+            self.postings[gram].append((position, count))
+
+    def search(self, word, max_distance):
+        """(distance, word) pairs within max_distance of word, closest first"""
+        grams = bigrams(word)
+        threshold = len(word) + 1 - 2 * max_distance
+
+        if threshold > 0:
+            shared = defaultdict(int)
+            for gram, count in grams.items():
+                for position, word_count in self.postings.get(gram, ()):
+                    shared[position] += min(count, word_count)
+            candidates = [position for position, overlap in shared.items() if overlap >= threshold]
+        else:
+            # Too short for the bigram filter; fall back to the length bound
+            candidates = [
+                position
+                for length in range(len(word) - max_distance, len(word) + max_distance + 1)
+                for position in self.by_length.get(length, ())
+            ]
+
+        results = []
+        for position in candidates:
+            distance = levenshtein(word, self.words[position], limit=max_distance)
+            if distance <= max_distance:
+                results.append((distance, self.words[position]))
+        return sorted(results)
+
+
+class NameIndex:
+    """
+    Maps raw commodity strings to canonical vegetable names.
+
+    Exact lookups (after normalize_name) are a dict hit; anything else
+    falls back to a bigram index search over names and aliases. A fuzzy match
+    must be unambiguous and keep the same numbers, so 'Tomatoe' resolves
+    to 'Tomato' but 'Grade 2' never becomes 'Grade 1'.
+    """
+
+    def __init__(self, names, aliases=None, version=None):
+        self.version = version
+        self._exact = {}
+        for alias, name in (aliases or {}).items():
+            self._exact[normalize_name(alias)] = name
+        # Real names win over aliases that normalize to the same key
+        for name in names:
+            self._exact[normalize_name(name)] = name
+        self._ngrams = NgramIndex(self._exact)
+        self._memo = {}
+
+    def __contains__(self, name):
+        return normalize_name(name) in self._exact
+
+    def resolve(self, raw_name):
+        """Canonical name for a raw string, or None when nothing is close enough"""
+        key = normalize_name(raw_name)
+        name = self._exact.get(key)
+        if name is not None:
+            return name
+
+        if key not in self._memo:
+            if len(self._memo) >= MEMO_LIMIT:
+                self._memo.clear()
+            self._memo[key] = self._fuzzy(key)
+        return self._memo[key]
+
+    def _fuzzy(self, key):
+        max_distance = max_edit_distance(key)
+        if not max_distance:
+            return None
+
+        digits = _DIGITS.findall(key)
+        matches = [
+            (distance, word) for distance, word in self._ngrams.search(key, max_distance)
+            if _DIGITS.findall(word) == digits
+        ]
+        if not matches:
+            return None
+
+        best = matches[0][0]
+        names = {self._exact[word] for distance, word in matches if distance == best}
+        return names.pop() if len(names) == 1 else None
+
+
+_index = None
+
+
+def _index_version():
+    version = cache.get(INDEX_VERSION_KEY)
+    if version is None:
+        cache.add(INDEX_VERSION_KEY, int(time.time() * 1000), timeout=None)
+        version = cache.get(INDEX_VERSION_KEY)
+    return version
+
+
+def build_vegetable_index(version=None):
+    """Build a NameIndex from every Vegetable and VegetableAlias in one query"""
+    names = set()
+    aliases = dict(VEGETABLE_NAME_ALIASES)
+    for name, alias in Vegetable.objects.values_list('name', 'aliases__alias'):
+        names.add(name)
+        if alias:
+            aliases[alias] = name
+
+    logger.info(f"Built vegetable name index: {len(names)} names, {len(aliases)} aliases")
+    return NameIndex(names, aliases, version)
+
+
+def get_vegetable_index():
+    """
+    Get the process-wide vegetable NameIndex, rebuilding it only when the
+    shared index version changed (any process edited vegetables or aliases)
+    """
+    global _index
+    version = _index_version()
+    index = _index
+    if index is None or index.version != version:
+        index = _index = build_vegetable_index(version)
+    return index
+
+
+def invalidate_vegetable_index():
+    """Make every process rebuild its index on next use"""
+    try:
+        cache.incr(INDEX_VERSION_KEY)
+    except ValueError:
+        cache.add(INDEX_VERSION_KEY, int(time.time() * 1000), timeout=None)
+
+
+@receiver([post_save, post_delete], sender=Vegetable)
+@receiver([post_save, post_delete], sender=VegetableAlias)
+def _vegetables_changed(sender, **kwargs):
+    invalidate_vegetable_index()
@@ -0,0 +1,32 @@
+import csv
+import io
+
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+
+
+class CSVParser(BaseParser):
+    """
+    Parse a CSV request body into a list of row dicts keyed by the header row
+    """
+    media_type = 'text/csv'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', 'utf-8')
+
+        try:
+            text = stream.read().decode(encoding)
+        except UnicodeDecodeError as e:
+            raise ParseError(f'CSV parse error - {e}')
+
+        return read_csv_rows(text)
+
+
+def read_csv_rows(text):
+    """Read CSV text into a list of dicts, dropping empty cells"""
+    reader = csv.DictReader(io.StringIO(text))
+    return [
+        {key.strip(): value.strip() for key, value in row.items() if key and value not in (None, '')}
+        for row in reader
+    ]
@@ -0,0 +1,145 @@
+import calendar
+from datetime import datetime, timedelta
+
+from django.db.models import F, Max, Min, Q, Sum, Window
+from django.db.models.functions import Lead, RowNumber
+from django.utils import timezone
+
+from .models import DailyPriceAggregate, PriceEntry, Prediction
+
+
+def latest_prices_for_city(city):
+    """
+    Get the latest PriceEntry per vegetable in a city, in one query.
+
+    Each entry is annotated with `previous_price`, the price of the entry
+    recorded just before it for the same vegetable (None if there is none).
+    """
+    partition = {
+        'partition_by': [F('vegetable_id')],
+        'order_by': [F('timestamp').desc(), F('id').desc()],
+    }
+
+    return list(
+        PriceEntry.objects.filter(city=city)
+        .select_related('vegetable')
+        .annotate(
+            row_number=Window(RowNumber(), **partition),
+            previous_price=Window(Lead('price_per_kg'), **partition),
+        )
+        .filter(row_number=1)
+        .order_by('vegetable__name')
+    )
+
+
+def calculate_price_change(current_price, previous_price):
+    """
+    Calculate the percentage change between two prices
+    """
+    if previous_price is None:
+        return 0
+
+    prev_price = float(previous_price)
+    curr_price = float(current_price)
+    return ((curr_price - prev_price) / prev_price * 100) if prev_price != 0 else 0
+
+
+def predictions_for_city(city, prediction_date):
+    """
+    Get predictions for every vegetable in a city on a given date, in one query.
+    Returns a dict keyed by vegetable id.
+    """
+    predictions = Prediction.objects.filter(city=city, prediction_date=prediction_date)
+    return {prediction.vegetable_id: prediction for prediction in predictions}
+
+
+def month_period(month, year=None):
+    """
+    Resolve a month name ('January', 'jan') or number ('1') to a
+    [start, end) datetime range.
+
+    Without a year, the most recent occurrence of the month is used, so
+    'December' in June means last December. Raises ValueError for an
+    unknown month or year.
+    """
+    month = str(month).strip().lower()
+    names = {name.lower(): i for i, name in enumerate(calendar.month_name) if name}
+    abbrs = {name.lower(): i for i, name in enumerate(calendar.month_abbr) if name}
+
+    if month.isdigit() and 1 <= int(month) <= 12:
+        month_number = int(month)
+    elif month in names:
+        month_number = names[month]
+    elif month in abbrs:
+        month_number = abbrs[month]
+    else:
+        raise ValueError(f'Unknown month: {month}')
+
+    today = timezone.localdate()
+    if year is None:
+        year = today.year if month_number <= today.month else today.year - 1
+    year = int(year)
+
+    tz = timezone.get_current_timezone()
+    start = timezone.make_aware(datetime(year, month_number, 1), tz)
+    next_month = (start.replace(tzinfo=None) + timedelta(days=32)).replace(day=1)
+    end = timezone.make_aware(next_month, tz)
+    return start, end
+
+
+def price_insights_for_city(city, start, end):
+    """
+    Get avg/min/max and first-half/second-half averages per vegetable for a
+    city over [start, end), in one grouped query over the daily rollups.
+
+    The halves are split at the date midpoint of the period, capped at now
+    so the current month is split over the days that have data.
+    """
+    first_day = start.date()
+    last_day = min(end, timezone.now()).date()
+    days = max((last_day - first_day).days + 1, 1)
+    midpoint = first_day + timedelta(days=days // 2)
+
+    rows = (
+        DailyPriceAggregate.objects.filter(city=city, date__gte=first_day, date__lt=end.date())
+        .values('vegetable__name')
+        .annotate(
+            total=Sum('total_price'),
+            entries=Sum('count'),
+            min_price=Min('low_price'),
+            max_price=Max('high_price'),
+            first_total=Sum('total_price', filter=Q(date__lt=midpoint)),
+            first_count=Sum('count', filter=Q(date__lt=midpoint)),
+            second_total=Sum('total_price', filter=Q(date__gte=midpoint)),
+            second_count=Sum('count', filter=Q(date__gte=midpoint)),
+        )
+        .order_by('vegetable__name')
+    )
+
+    return [
+        {
+            'vegetable__name': row['vegetable__name'],
+            'avg_price': _mean(row['total'], row['entries']),
+            'min_price': row['min_price'],
+            'max_price': row['max_price'],
+            'first_avg': _mean(row['first_total'], row['first_count']),
+            'second_avg': _mean(row['second_total'], row['second_count']),
+        }
+        for row in rows
+    ]
+
+
+def _mean(total, count):
+    return float(total) / count if count else None
+
+
+def calculate_trend(first_avg, second_avg):
+    """
+    Calculate the relative change between two period averages,
+    normalized to -1 to 1 (0 when either half has no data)
+    """
+    if not first_avg or second_avg is None:
+        return 0
+
+    trend = (float(second_avg) - float(first_avg)) / float(first_avg)
+    return min(1, max(-1, trend))
@@ -0,0 +1,239 @@
+import datetime
+import logging
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Max, Min
+from django.utils import timezone
+
+from .models import DailyPriceAggregate, PriceEntry
+
+logger = logging.getLogger(__name__)
+
+CENTS = Decimal('0.01')
+
+
+def aggregate_key(vegetable_id, city_id, source, timestamp):
+    """Rollup key of a price observation: (vegetable, city, source, date)"""
+    return (vegetable_id, city_id, source, timezone.localtime(timestamp).date())
+
+
+def _new_aggregate(key, price, timestamp):
+    vegetable_id, city_id, source, date = key
+    return DailyPriceAggregate(
+        vegetable_id=vegetable_id,
+        city_id=city_id,
+        source=source,
+        date=date,
+        open_price=price,
+        high_price=price,
+        low_price=price,
+        close_price=price,
+        mean_price=price,
+        total_price=Decimal('0'),
+        count=0,
+        first_timestamp=timestamp,
+        last_timestamp=timestamp,
+    )
+
+
+def _fold(aggregate, price, timestamp):
+    """Fold one observation into an aggregate in place"""
+    price = Decimal(str(price))
+
+    if timestamp < aggregate.first_timestamp:
+        aggregate.open_price = price
+        aggregate.first_timestamp = timestamp
+    if timestamp >= aggregate.last_timestamp:
+        aggregate.close_price = price
+        aggregate.last_timestamp = timestamp
+
+    aggregate.high_price = max(aggregate.high_price, price)
+    aggregate.low_price = min(aggregate.low_price, price)
+    aggregate.total_price += price
+    aggregate.count += 1
+    aggregate.mean_price = (aggregate.total_price / aggregate.count).quantize(CENTS)
+
+
+# A concurrent writer can create an aggregate this one saw as missing
+CREATE_RETRIES = 3
+
+
+def _locked_aggregates(keys):
+    """Existing aggregates of the given keys, locked until the transaction ends"""
+    existing = DailyPriceAggregate.objects.select_for_update().filter(
+        vegetable_id__in={k[0] for k in keys},
+        city_id__in={k[1] for k in keys},
+        source__in={k[2] for k in keys},
+        date__in={k[3] for k in keys},
+    )
+    # The filter above matches a superset of the keys; keep exact matches
+    return {
+        (a.vegetable_id, a.city_id, a.source, a.date): a
+        for a in existing
+        if (a.vegetable_id, a.city_id, a.source, a.date) in keys
+    }
+
+
+def update_daily_aggregates(entries):
+    """
+    Fold newly written PriceEntry rows into their daily aggregates.
+    Loads the affected aggregates in one query and writes them back in bulk.
+
+    select_for_update() cannot lock aggregates that do not exist yet, so
+    when a concurrent writer creates one first the fold is retried on
+    the aggregates as they now are.
+    """
+    observations = [
+        (aggregate_key(e.vegetable_id, e.city_id, e.source, e.timestamp), e.price_per_kg, e.timestamp)
+        for e in entries
+    ]
+    if not observations:
+        return 0
+
+    keys = {key for key, _, _ in observations}
+
+    for attempt in range(CREATE_RETRIES):
+        try:
+            with transaction.atomic():
+                _fold_observations(observations, keys)
+            break
+        except IntegrityError:
+            if attempt == CREATE_RETRIES - 1:
+                raise
+            logger.info("Daily aggregate created concurrently; retrying the fold")
+
+    return len(observations)
+
+
+def _fold_observations(observations, keys):
+    aggregates = _locked_aggregates(keys)
+    to_update = list(aggregates.values())
+    to_create = []
+
+    for key, price, timestamp in observations:
+        if key not in aggregates:
+            aggregates[key] = _new_aggregate(key, Decimal(str(price)), timestamp)
+            to_create.append(aggregates[key])
+        _fold(aggregates[key], price, timestamp)
+
+    DailyPriceAggregate.objects.bulk_create(to_create)
+    now = timezone.now()
+    for aggregate in to_update:
+        aggregate.updated_at = now
+    DailyPriceAggregate.objects.bulk_update(
+        to_update,
+        ['open_price', 'high_price', 'low_price', 'close_price', 'mean_price',
+         'total_price', 'count', 'first_timestamp', 'last_timestamp', 'updated_at']
+    )
+
+
+def rebuild_daily_aggregates(entries=None, batch_size=2000):
+    """
+    Rebuild daily aggregates from raw PriceEntry rows.
+
+    `entries` is an optional PriceEntry queryset limiting the rebuild; in
+    each series it touches, the aggregates from its first to its last day
+    are replaced. Rows are streamed in series order so only one aggregate
+    is held in memory at a time.
+    """
+    if entries is None:
+        entries = PriceEntry.objects.all()
+
+    if entries.query.where:
+        # One GROUP BY finds the date range each series spans
+        scope = (
+            entries.order_by().values('vegetable_id', 'city_id', 'source')
+            .annotate(first=Min('timestamp'), last=Max('timestamp'))
+        )
+        return rebuild_aggregate_ranges({
+            (row['vegetable_id'], row['city_id'], row['source']):
+                (timezone.localtime(row['first']).date(), timezone.localtime(row['last']).date())
+            for row in scope
+        }, batch_size)
+
+    with transaction.atomic():
+        DailyPriceAggregate.objects.all().delete()
+        rows = (
+            entries.order_by('vegetable_id', 'city_id', 'source', 'timestamp')
+            .values_list('vegetable_id', 'city_id', 'source', 'timestamp', 'price_per_kg')
+            .iterator(chunk_size=batch_size)
+        )
+        created = _create_aggregates(rows, batch_size)
+
+    logger.info(f"Rebuilt {created} daily price aggregates")
+    return created
+
+
+def rebuild_aggregate_ranges(ranges, batch_size=2000):
+    """
+    Replace the aggregates of each series' date range with ones rebuilt
+    from that range's PriceEntry rows.
+
+    `ranges` maps (vegetable_id, city_id, source) to (first, last) dates,
+    as built by merge_date_ranges. Each series costs one DELETE and one
+    ordered range scan, however many days its range spans.
+    """
+    with transaction.atomic():
+        for (vegetable_id, city_id, source), (first, last) in ranges.items():
+            DailyPriceAggregate.objects.filter(
+                vegetable_id=vegetable_id, city_id=city_id, source=source, date__range=(first, last)
+            ).delete()
+        # Re-read whole days so aggregates are not built from a partial day
+        created = _create_aggregates(_range_rows(ranges, batch_size), batch_size)
+
+    logger.info(f"Rebuilt {created} daily price aggregates")
+    return created
+
+
+def merge_date_ranges(ranges, other):
+    """Widen `ranges` in place to cover `other`; both map a series key to (first, last) dates"""
+    for series, (first, last) in other.items():
+        if series in ranges:
+            first, last = min(first, ranges[series][0]), max(last, ranges[series][1])
+        ranges[series] = (first, last)
+    return ranges
+
+
+def _create_aggregates(rows, batch_size):
+    """Fold (vegetable_id, city_id, source, timestamp, price) rows in series order into new aggregates"""
+    batch = []
+    current = None
+    created = 0
+
+    for vegetable_id, city_id, source, timestamp, price in rows:
+        key = aggregate_key(vegetable_id, city_id, source, timestamp)
+        if current is None or key != (current.vegetable_id, current.city_id, current.source, current.date):
+            current = _new_aggregate(key, price, timestamp)
+            batch.append(current)
+        _fold(current, price, timestamp)
+
+        if len(batch) > batch_size:
+            # Keep the aggregate still being folded for the next flush
+            DailyPriceAggregate.objects.bulk_create(batch[:-1])
+            created += len(batch) - 1
+            batch = batch[-1:]
+
+    DailyPriceAggregate.objects.bulk_create(batch)
+    return created + len(batch)
+
+
+def _range_rows(ranges, batch_size):
+    """Stream every PriceEntry row of the given series date ranges in series order"""
+    for series in sorted(ranges):
+        vegetable_id, city_id, source = series
+        first, last = ranges[series]
+        rows = (
+            PriceEntry.objects.filter(
+                vegetable_id=vegetable_id, city_id=city_id, source=source,
+                timestamp__gte=_local_midnight(first),
+                timestamp__lt=_local_midnight(last + datetime.timedelta(days=1)),
+            )
+            .order_by('timestamp')
+            .values_list('vegetable_id', 'city_id', 'source', 'timestamp', 'price_per_kg')
+        )
+        yield from rows.iterator(chunk_size=batch_size)
+
+
+def _local_midnight(date):
+    return timezone.make_aware(datetime.datetime.combine(date, datetime.time.min))
@@ -1,3 +1,4 @@
+from decimal import Decimal
 from rest_framework import serializers
 from .models import City, Vegetable, PriceEntry, Prediction, UserFeedback
 
@@ -105,3 +106,22 @@ class SavingsSummarySerializer(serializers.Serializer):
     total_savings = serializers.DecimalField(max_digits=10, decimal_places=2)
     items_saved = serializers.IntegerField()
     recommendations_followed = serializers.IntegerField()
+
+
+class PriceSubmissionSerializer(serializers.Serializer):
+    """Validate one row of a bulk price submission"""
+    vegetable = serializers.IntegerField(required=False, allow_null=True)
+    vegetable_name = serializers.CharField(required=False, allow_blank=True, max_length=100)
+    city = serializers.IntegerField(required=False, allow_null=True)
+    city_name = serializers.CharField(required=False, allow_blank=True, max_length=100)
+    price_per_kg = serializers.DecimalField(max_digits=8, decimal_places=2, min_value=Decimal('0.01'))
+    source = serializers.ChoiceField(choices=PriceEntry.SOURCE_CHOICES, default='local_market')
+    location = serializers.CharField(required=False, allow_blank=True, max_length=200, default='')
+    quality_rating = serializers.IntegerField(min_value=1, max_value=5, default=3)
+
+    def validate(self, attrs):
+        if not attrs.get('vegetable') and not attrs.get('vegetable_name'):
+            raise serializers.ValidationError('vegetable or vegetable_name required')
+        if not attrs.get('city') and not attrs.get('city_name'):
+            raise serializers.ValidationError('city or city_name required')
+        return attrs
@@ -0,0 +1,142 @@
+import json
+import logging
+import threading
+import uuid
+from collections import deque
+from itertools import islice
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+BUFFER_KEY = 'price-submissions'
+FLUSH_LOCK_KEY = 'price-submissions:flush-lock'
+DEAD_LETTER_KEY = 'price-submissions:dead'
+
+# Only the flusher holding the lock (its token) may renew or release it
+_RENEW_LOCK = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('expire', KEYS[1], ARGV[2])
+end
+return 0
+"""
+_RELEASE_LOCK = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+class LocalSubmissionBuffer:
+    """
+    In-process submission buffer for tests and single-process development.
+    Same interface as RedisSubmissionBuffer.
+    """
+
+    def __init__(self):
+        self._items = deque()
+        self.dead = []
+        self._lock = threading.Lock()
+        self._flush_token = None
+
+    def push(self, item):
+        """Append a submission; returns the new depth"""
+        with self._lock:
+            self._items.append(json.dumps(item))
+            return len(self._items)
+
+    def depth(self):
+        return len(self._items)
+
+    def peek(self, count):
+        """Read up to `count` of the oldest submissions without removing them"""
+        with self._lock:
+            return [json.loads(item) for item in islice(self._items, count)]
+
+    def ack(self, count):
+        """Remove the `count` oldest submissions once they are stored"""
+        with self._lock:
+            for _ in range(min(count, len(self._items))):
+                self._items.popleft()
+
+    def dead_letter(self, items):
+        """Set aside submissions that cannot be stored"""
+        with self._lock:
+            self.dead.extend(json.dumps(item) for item in items)
+
+    def acquire_flush_lock(self, timeout):
+        with self._lock:
+            if self._flush_token is not None:
+                return None
+            self._flush_token = uuid.uuid4().hex
+            return self._flush_token
+
+    def renew_flush_lock(self, token, timeout):
+        return self._flush_token == token
+
+    def release_flush_lock(self, token):
+        with self._lock:
+            if self._flush_token == token:
+                self._flush_token = None
+
+
+class RedisSubmissionBuffer:
+    """
+    Submission buffer on a Redis list shared by every web and worker process.
+
+    Flushers peek a batch, store it, then trim it off the list, so a
+    flusher crashing mid-batch loses nothing; a lock keeps a single
+    flusher at a time so a batch is never stored twice. The lock holds a
+    per-flusher token and is renewed before every batch, so a flusher
+    whose lock expired stops instead of racing the next one, and never
+    releases a lock it no longer holds.
+    """
+
+    def __init__(self, url):
+        import redis
+        self.client = redis.Redis.from_url(url)
+        self._renew_lock = self.client.register_script(_RENEW_LOCK)
+        self._release_lock = self.client.register_script(_RELEASE_LOCK)
+
+    def push(self, item):
+        return self.client.rpush(BUFFER_KEY, json.dumps(item))
+
+    def depth(self):
+        return self.client.llen(BUFFER_KEY)
+
+    def peek(self, count):
+        return [json.loads(item) for item in self.client.lrange(BUFFER_KEY, 0, count - 1)]
+
+    def ack(self, count):
+        self.client.ltrim(BUFFER_KEY, count, -1)
+
+    def dead_letter(self, items):
+        if items:
+            self.client.rpush(DEAD_LETTER_KEY, *[json.dumps(item) for item in items])
+
+    def acquire_flush_lock(self, timeout):
+        """The lock's token, or None when another flusher holds it"""
+        token = uuid.uuid4().hex
+        return token if self.client.set(FLUSH_LOCK_KEY, token, nx=True, ex=timeout) else None
+
+    def renew_flush_lock(self, token, timeout):
+        """Extend the lock by `timeout` seconds; False when it was lost"""
+        return bool(self._renew_lock(keys=[FLUSH_LOCK_KEY], args=[token, timeout]))
+
+    def release_flush_lock(self, token):
+        self._release_lock(keys=[FLUSH_LOCK_KEY], args=[token])
+
+
+_buffers = {}
+
+
+def get_submission_buffer():
+    """
+    Get the buffer for PRICE_BUFFER_URL: a Redis list when it is set,
+    an in-process queue otherwise
+    """
+    url = settings.PRICE_BUFFER_URL
+    if url not in _buffers:
+        _buffers[url] = RedisSubmissionBuffer(url) if url else LocalSubmissionBuffer()
+    return _buffers[url]
@@ -1,67 +1,101 @@
-from celery import shared_task
+from celery import chord, shared_task
+from django.conf import settings
+from django.core.cache import cache
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from datetime import timedelta
+from decimal import Decimal
 import logging
+import multiprocessing
+import time
 
 from .models import City, Vegetable, PriceEntry, Prediction
-from scraper.gov_api_fetch import fetch_government_prices
-from scraper.online_store_scraper import fetch_online_store_prices
-from scraper.clean_data import clean_price_data
-from ml.predict_price import generate_predictions
+from .ingest import ingest_prices, store_price_submissions
+from .submission_buffer import get_submission_buffer
+from .watermarks import WatermarkStore
+from scraper import PRICE_SOURCES
+from scraper.agmarknet import harvest_government_prices, iter_targets
+from scraper.archive import open_archive
+from scraper.health import SourceHealthRegistry
+from scraper.clean_data import clean_price_data, iter_clean_price_batches
+from scraper.runner import run_fetchers
+from ml.predict_price import generate_predictions as generate_price_predictions
 
 logger = logging.getLogger(__name__)
 
+SOURCE_HEALTH_KEY = 'scraper-source-health:{source}'
+
+
+def _load_source_health():
+    """Source circuits and concurrency limits as left by the previous run in any worker"""
+    keys = {SOURCE_HEALTH_KEY.format(source=name): name for name in PRICE_SOURCES}
+    stored = {keys[key]: value for key, value in cache.get_many(list(keys)).items()}
+    return SourceHealthRegistry.from_stored(
+        stored,
+        target_latency=settings.SCRAPER_TARGET_LATENCY,
+        window=settings.SCRAPER_CIRCUIT_WINDOW,
+        min_calls=settings.SCRAPER_CIRCUIT_MIN_CALLS,
+        failure_rate=settings.SCRAPER_CIRCUIT_FAILURE_RATE,
+        consecutive_failures=settings.SCRAPER_CIRCUIT_CONSECUTIVE_FAILURES,
+        cooldown=settings.SCRAPER_CIRCUIT_COOLDOWN,
+        max_cooldown=settings.SCRAPER_CIRCUIT_MAX_COOLDOWN,
+    )
+
+
+def _save_source_health(health, lock_timeout=10):
+    """
+    Store the state of each source the run called under its own key.
+    Tasks sharing a source (both fetch 'government') merge into what the
+    other stored meanwhile, one at a time under a cache lock.
+    """
+    for name in health.recorded_sources():
+        key = SOURCE_HEALTH_KEY.format(source=name)
+        deadline = time.monotonic() + lock_timeout
+        while not cache.add(f'{key}:lock', 1, timeout=lock_timeout) and time.monotonic() < deadline:
+            time.sleep(0.05)
+        try:
+            cache.set(key, health.source_state(name, cache.get(key)), timeout=None)
+        finally:
+            cache.delete(f'{key}:lock')
+
 
 @shared_task
-def fetch_and_store_prices():
+def fetch_and_store_prices(full=False):
     """
     Celery task to fetch prices from multiple sources and store in database.
     Runs daily via beat schedule.
+
+    Sources are fetched incrementally from their watermarks; pass
+    full=True to ignore them and re-download everything.
     """
     try:
         logger.info("Starting price fetch task...")
+        watermarks = WatermarkStore(load=not full)
+        health = _load_source_health()
+
+        # Fetch from all sources concurrently; slow sources and sources
+        # with an open circuit are skipped
+        fetched = run_fetchers(
+            PRICE_SOURCES,
+            timeouts=settings.SCRAPER_SOURCE_TIMEOUTS,
+            default_timeout=settings.SCRAPER_SOURCE_TIMEOUT,
+            watermarks=watermarks,
+            archive=open_archive(settings.SCRAPER_ARCHIVE_DIR),
+            health=health
+        )
+        _save_source_health(health)
+        for source, stats in fetched['sources'].items():
+            logger.info(f"Source {source}: {stats['status']}, {stats['count']} prices in {stats['latency']:.2f}s")
 
-        # Fetch from government API
-        gov_prices = fetch_government_prices()
-        logger.info(f"Fetched {len(gov_prices)} prices from government API")
-
-        # Fetch from online stores
-        online_prices = fetch_online_store_prices()
-        logger.info(f"Fetched {len(online_prices)} prices from online stores")
-
-        # Combine and clean data
-        all_prices = gov_prices + online_prices
-        cleaned_prices = clean_price_data(all_prices)
-
-        # Store in database
-        count = 0
-        for price_data in cleaned_prices:
-            try:
-                vegetable, _ = Vegetable.objects.get_or_create(
-                    name=price_data['vegetable_name'],
-                    defaults={'category': 'other'}
-                )
-
-                city, _ = City.objects.get_or_create(
-                    name=price_data['city_name'],
-                    defaults={'state': ''}
-                )
-
-                PriceEntry.objects.create(
-                    vegetable=vegetable,
-                    city=city,
-                    price_per_kg=price_data['price_per_kg'],
-                    source=price_data['source'],
-                    location=price_data.get('location', ''),
-                    quality_rating=price_data.get('quality_rating', 5)
-                )
-                count += 1
-            except Exception as e:
-                logger.error(f"Error storing price: {e}")
-                continue
-
-        logger.info(f"Stored {count} price entries successfully")
-        return {'status': 'success', 'count': count}
+        # Clean data
+        cleaned_prices = clean_price_data(fetched['prices'])
+
+        # Store in database in bulk, then advance the watermarks
+        result = ingest_prices(cleaned_prices)
+        watermarks.commit()
+
+        logger.info(f"Stored {result['count']} price entries successfully")
+        return {'status': 'success', **result, 'sources': fetched['sources'], 'health': health.stats()}
 
     except Exception as e:
         logger.error(f"Error in fetch_and_store_prices: {e}")
@@ -69,53 +103,183 @@ def fetch_and_store_prices():
 
 
 @shared_task
-def train_prediction_models():
+def harvest_agmarknet_prices(batch_size=1000):
+    """
+    Celery task to harvest every Agmarknet commodity/state/district page.
+    Rows are cleaned and stored in batches as pages arrive.
+    """
+    try:
+        logger.info("Starting Agmarknet harvest...")
+        health = _load_source_health()
+
+        rows = harvest_government_prices(
+            iter_targets(settings.AGMARKNET_COMMODITY_IDS, settings.AGMARKNET_STATE_DISTRICTS),
+            base_url=settings.AGMARKNET_API_URL,
+            rate_limit=settings.AGMARKNET_RATE_LIMIT,
+            concurrency=settings.AGMARKNET_CONCURRENCY,
+            page_size=settings.AGMARKNET_PAGE_SIZE,
+            archive=open_archive(settings.SCRAPER_ARCHIVE_DIR),
+            health=health
+        )
+
+        stored = 0
+        try:
+            for batch in iter_clean_price_batches(rows, chunk_size=batch_size):
+                stored += ingest_prices(batch)['count']
+        finally:
+            _save_source_health(health)
+
+        logger.info(f"Stored {stored} Agmarknet price entries")
+        return {'status': 'success', 'count': stored}
+
+    except Exception as e:
+        logger.error(f"Error in harvest_agmarknet_prices: {e}")
+        return {'status': 'error', 'message': str(e)}
+
+
+FLUSH_LOCK_TIMEOUT = 300
+
+
+def _decode_submission(item):
+    row = dict(item)
+    row['price_per_kg'] = Decimal(row['price_per_kg'])
+    row['timestamp'] = parse_datetime(row['timestamp'])
+    return row
+
+
+def _store_buffered_batch(buffer, items):
+    """
+    Store one batch of buffered submissions; returns (stored, missing, failed).
+
+    When the batch as a whole fails, its submissions are stored one by
+    one and those that still fail are dead-lettered, so a bad submission
+    cannot block the buffer.
+    """
+    try:
+        entries, missing = store_price_submissions([_decode_submission(item) for item in items])
+        return len(entries), len(missing), 0
+    except Exception as e:
+        logger.warning(f"Storing {len(items)} buffered submissions failed ({e}); storing them one by one")
+
+    stored = missing = 0
+    dead = []
+    for item in items:
+        try:
+            entries, unknown = store_price_submissions([_decode_submission(item)])
+            stored += len(entries)
+            missing += len(unknown)
+        except Exception as e:
+            logger.error(f"Dead-lettering buffered submission {item}: {e}")
+            dead.append(item)
+    buffer.dead_letter(dead)
+    return stored, missing, len(dead)
+
+
+@shared_task
+def flush_price_submissions(batch_size=None, max_batches=50):
+    """
+    Celery task to store buffered price submissions in batched transactions.
+    Runs every PRICE_BUFFER_FLUSH_INTERVAL seconds via beat schedule.
+    """
+    batch_size = batch_size or settings.PRICE_BUFFER_FLUSH_BATCH
+    buffer = get_submission_buffer()
+    token = buffer.acquire_flush_lock(timeout=FLUSH_LOCK_TIMEOUT)
+    if not token:
+        return {'status': 'skipped', 'message': 'Another flush is running'}
+
+    try:
+        stored = failed = 0
+        for _ in range(max_batches):
+            # Each batch gets the full lock timeout; a lost lock means
+            # another flusher may already be reading these rows
+            if not buffer.renew_flush_lock(token, FLUSH_LOCK_TIMEOUT):
+                logger.warning("Lost the flush lock; stopping this flush")
+                break
+
+            items = buffer.peek(batch_size)
+            if not items:
+                break
+
+            batch_stored, missing, batch_failed = _store_buffered_batch(buffer, items)
+            buffer.ack(len(items))
+
+            stored += batch_stored
+            failed += batch_failed
+            if missing:
+                logger.warning(f"Dropped {missing} buffered submissions with unknown vegetable or city ids")
+
+        pending = buffer.depth()
+        logger.info(f"Flushed {stored} buffered price submissions, {failed} dead-lettered, {pending} pending")
+        return {'status': 'success', 'count': stored, 'failed': failed, 'pending': pending}
+
+    except Exception as e:
+        logger.error(f"Error in flush_price_submissions: {e}")
+        return {'status': 'error', 'message': str(e)}
+
+    finally:
+        buffer.release_flush_lock(token)
+
+
+@shared_task
+def train_prediction_models(workers=None, timeout=None, force=False):
     """
     Celery task to train ML models.
     Runs daily via beat schedule.
+
+    Every vegetable/city series with enough data is trained in parallel,
+    each series limited to TRAINING_SERIES_TIMEOUT seconds; failures are
+    isolated per series. Called directly (manage.py train_models) the
+    series are spread over TRAINING_WORKERS forked processes. A Celery
+    prefork worker is daemonic and cannot fork, so there the series are
+    fanned out as train_series_task subtasks to all workers instead, and
+    record_training_run summarizes them. Series whose data did not
+    change since their last training are skipped unless `force` is set.
     """
     try:
         logger.info("Starting model training task...")
+        from ml.orchestrator import stale_models, train_many
+        from ml.train_model import MIN_TRAINING_ROWS
+        from ml.training_data import load_daily_series
 
-        # Get all vegetables and cities
-        vegetables = Vegetable.objects.all()
-        cities = City.objects.all()
+        workers = workers or settings.TRAINING_WORKERS
+        timeout = timeout or settings.TRAINING_SERIES_TIMEOUT
 
-        for vegetable in vegetables:
-            for city in cities:
-                try:
-                    # Get historical prices
-                    prices = PriceEntry.objects.filter(
-                        vegetable=vegetable,
-                        city=city
-                    ).order_by('timestamp')
-
-                    if prices.count() < 30:
-                        logger.warning(
-                            f"Insufficient data for {vegetable.name} in {city.name}"
-                        )
-                        continue
+        if workers > 1 and multiprocessing.current_process().daemon:
+            daily = load_daily_series(min_rows=MIN_TRAINING_ROWS)
+            stale = stale_models(daily, force=force)
+            skipped = len(daily) - len(stale)
+            if stale:
+                chord([
+                    train_series_task.s(vegetable_id, city_id, list(models), timeout)
+                    for (vegetable_id, city_id), (models, _) in stale.items()
+                ])(record_training_run.s(len(daily), skipped, time.time()))
+            logger.info(f"Dispatched {len(stale)} series for training ({skipped} unchanged)")
+            return {'status': 'dispatched', 'series': len(daily), 'queued': len(stale), 'skipped': skipped}
 
-                    logger.info(
-                        f"Training model for {vegetable.name} in {city.name}"
-                    )
-                    # Training happens in ml module
-                    # This is a placeholder for the actual training logic
-
-                except Exception as e:
-                    logger.error(
-                        f"Error training model for {vegetable.name}: {e}"
-                    )
-                    continue
+        run = train_many(workers=workers, timeout=timeout, force=force)
 
         logger.info("Model training completed")
-        return {'status': 'success'}
+        return {'status': 'success', **run}
 
     except Exception as e:
         logger.error(f"Error in train_prediction_models: {e}")
         return {'status': 'error', 'message': str(e)}
 
 
+@shared_task
+def train_series_task(vegetable_id, city_id, models, timeout=None):
+    """Celery subtask of train_prediction_models training one series"""
+    from ml.orchestrator import train_planned_series
+    return train_planned_series(vegetable_id, city_id, tuple(models), timeout)
+
+
+@shared_task
+def record_training_run(results, series, skipped, started):
+    """Chord callback of train_prediction_models summarizing its subtasks"""
+    from ml.orchestrator import summarize_run
+    return {'status': 'success', **summarize_run(results, series, skipped, 'celery', time.time() - started)}
+
+
 @shared_task
 def generate_predictions():
     """
@@ -131,7 +295,7 @@ def generate_predictions():
         for vegetable in vegetables:
             for city in cities:
                 try:
-                    predictions = generate_predictions(
+                    predictions = generate_price_predictions(
                         vegetable_id=vegetable.id,
                         city_id=city.id,
                         days=30
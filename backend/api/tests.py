@@ -1,7 +1,64 @@
 from rest_framework.test import APITestCase
 from rest_framework import status
-from .models import City, Vegetable, PriceEntry
+from django.apps import apps as django_apps
+from django.core.cache import cache
+from django.db import connection
+from django.test import SimpleTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from .models import City, Vegetable, VegetableAlias, PriceEntry, Prediction, DailyPriceAggregate, SourceWatermark, TrainingState
+from .rollups import rebuild_daily_aggregates, update_daily_aggregates
+from . import rollups
+from .caching import bump_data_version
+from .ingest import ingest_prices
+from .watermarks import WatermarkStore
+from .name_resolution import NameIndex, get_vegetable_index
+from .ingest import resolve_vegetables
+from .bulk_import import ImportCheckpoint, _copy_insert, import_prices
+from .submission_buffer import get_submission_buffer
+from .tasks import _load_source_health, _save_source_health, flush_price_submissions, train_prediction_models
+from . import submission_buffer
 from django.utils import timezone
+from datetime import timedelta
+from decimal import Decimal
+from recommendation.score_model import ScoreBasedEngine
+from scraper.clean_data import clean_price_data, iter_clean_price_batches
+from scraper.gov_api_fetch import fetch_government_prices
+from scraper.agmarknet import RateLimiter, harvest_government_prices, iter_targets
+from scraper.runner import run_fetchers
+from scraper.health import AIMDLimiter, SourceHealth, SourceHealthRegistry
+from unittest import mock
+from ml.orchestrator import train_many, train_planned_series, train_series
+from ml.training_data import build_daily_series, load_daily_series, load_price_frame, split_series
+from ml.train_model import (
+    _update_arima_model, arima_meta_path, needs_full_refit, new_observations, preprocess_price_data, train_arima_model
+)
+from scraper.archive import ResponseArchive
+from scraper.html_parsing import STORE_PARSERS, load_fixture_pages, parse_pack_kg, parse_price
+from scraper import PRICE_SOURCES, RESPONSE_PARSERS
+from django.core.management import call_command
+from io import StringIO
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+from collections import Counter
+import importlib
+import json
+import requests
+import numpy as np
+import pandas as pd
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class CachedAPITestCase(APITestCase):
+    """Test case for cached read endpoints; starts every test with an empty cache"""
+
+    def setUp(self):
+        cache.clear()
 
 
 class CityAPITestCase(APITestCase):
@@ -26,8 +83,9 @@ class VegetableAPITestCase(APITestCase):
         self.assertEqual(response.data[0]['name'], 'Tomato')
 
 
-class CurrentPricesAPITestCase(APITestCase):
+class CurrentPricesAPITestCase(CachedAPITestCase):
     def setUp(self):
+        super().setUp()
         self.city = City.objects.create(name='Delhi', state='Delhi')
         self.vegetable = Vegetable.objects.create(name='Tomato', category='tomato')
         self.price = PriceEntry.objects.create(
@@ -45,3 +103,1508 @@ class CurrentPricesAPITestCase(APITestCase):
     def test_current_prices_no_city(self):
         response = self.client.get('/api/current-prices/')
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_current_prices_price_change(self):
+        PriceEntry.objects.create(
+            vegetable=self.vegetable,
+            city=self.city,
+            price_per_kg=50.05,
+            source='bigbasket'
+        )
+        response = self.client.get('/api/current-prices/?city=Delhi')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 1)
+        self.assertEqual(response.data[0]['price_per_kg'], 50.05)
+        self.assertAlmostEqual(response.data[0]['price_change'], 10.0)
+
+    def test_current_prices_query_count_is_constant(self):
+        for name in ['Onion', 'Potato', 'Carrot', 'Spinach']:
+            vegetable = Vegetable.objects.create(name=name, category='other')
+            for price in (20, 25):
+                PriceEntry.objects.create(
+                    vegetable=vegetable,
+                    city=self.city,
+                    price_per_kg=price,
+                    source='government'
+                )
+
+        # Validators, city, latest prices
+        with self.assertNumQueries(3):
+            response = self.client.get('/api/current-prices/?city=Delhi')
+        self.assertEqual(len(response.data), 5)
+
+
+class RecommendationAPITestCase(CachedAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.city = City.objects.create(name='Delhi', state='Delhi')
+        tomorrow = timezone.now().date() + timedelta(days=1)
+        for name, current, predicted in [('Tomato', 50, 30), ('Onion', 40, 44), ('Potato', 25, 25)]:
+            vegetable = Vegetable.objects.create(name=name, category='other')
+            PriceEntry.objects.create(
+                vegetable=vegetable,
+                city=self.city,
+                price_per_kg=current,
+                source='government'
+            )
+            Prediction.objects.create(
+                vegetable=vegetable,
+                city=self.city,
+                predicted_price=predicted,
+                prediction_date=tomorrow,
+                model_used='prophet',
+                confidence=0.9
+            )
+
+    def test_recommendations(self):
+        # Validators, city, latest prices, predictions
+        with self.assertNumQueries(4):
+            response = self.client.get('/api/recommendation/?city=Delhi')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        actions = {rec['vegetable_name']: rec['action'] for rec in response.data}
+        self.assertEqual(actions, {'Onion': 'Buy Now', 'Potato': 'Buy Now', 'Tomato': 'Wait'})
+
+    def test_batch_scoring_matches_single(self):
+        engine = ScoreBasedEngine()
+        args = [(50, 30, 0.2, 0.9, 'Tomato'), (40, 44, -0.5, 0.4, 'Onion'), (0, 10, 0, 0.7, 'Potato')]
+        batch = engine.generate_recommendations(
+            current_prices=[a[0] for a in args],
+            predicted_prices=[a[1] for a in args],
+            trends=[a[2] for a in args],
+            confidences=[a[3] for a in args],
+            vegetable_names=[a[4] for a in args],
+            month=6
+        )
+
+        for (current, predicted, trend, confidence, name), result in zip(args, batch):
+            single = engine.generate_recommendation(current, predicted, trend, confidence, name, 6)
+            self.assertEqual(result['action'], single['action'])
+            self.assertEqual(result['reason'], single['reason'])
+            self.assertAlmostEqual(result['score'], single['score'])
+            self.assertAlmostEqual(result['potential_savings'], single['potential_savings'])
+
+
+class InsightsAPITestCase(CachedAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.city = City.objects.create(name='Delhi', state='Delhi')
+        for name, early, late in [('Tomato', 40, 60), ('Onion', 30, 30)]:
+            vegetable = Vegetable.objects.create(name=name, category='other')
+            for day, price in [(3, early), (5, early), (20, late), (25, late)]:
+                entry = PriceEntry.objects.create(
+                    vegetable=vegetable,
+                    city=self.city,
+                    price_per_kg=price,
+                    source='government'
+                )
+                PriceEntry.objects.filter(pk=entry.pk).update(
+                    timestamp=timezone.make_aware(timezone.datetime(2025, 3, day, 12))
+                )
+        rebuild_daily_aggregates()
+
+    def test_insights_for_requested_month(self):
+        # Validators, city, grouped rollups
+        with self.assertNumQueries(3):
+            response = self.client.get('/api/insights/?city=Delhi&month=March&year=2025')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        insights = {insight['item_name']: insight for insight in response.data}
+        self.assertEqual(insights['Tomato']['avg_price'], 50.0)
+        self.assertEqual(insights['Tomato']['min_price'], 40.0)
+        self.assertEqual(insights['Tomato']['max_price'], 60.0)
+        self.assertEqual(insights['Tomato']['trend'], 0.5)
+        self.assertEqual(insights['Onion']['trend'], 0)
+
+    def test_insights_other_month_is_empty(self):
+        response = self.client.get('/api/insights/?city=Delhi&month=April&year=2025')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, [])
+
+    def test_insights_invalid_month(self):
+        response = self.client.get('/api/insights/?city=Delhi&month=Smarch')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class DailyPriceAggregateTestCase(CachedAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.city = City.objects.create(name='Delhi', state='Delhi')
+        self.vegetable = Vegetable.objects.create(name='Tomato', category='tomato')
+
+    def submit(self, price):
+        return self.client.post('/api/submit-price/', {
+            'vegetable': self.vegetable.id,
+            'city': self.city.id,
+            'price_per_kg': price,
+            'source': 'local_market'
+        }, format='json')
+
+    def test_submit_updates_rollup(self):
+        for price in ['40.00', '55.00', '35.00', '45.00']:
+            self.assertEqual(self.submit(price).status_code, status.HTTP_201_CREATED)
+
+        aggregate = DailyPriceAggregate.objects.get()
+        self.assertEqual(aggregate.count, 4)
+        self.assertEqual(float(aggregate.open_price), 40.0)
+        self.assertEqual(float(aggregate.high_price), 55.0)
+        self.assertEqual(float(aggregate.low_price), 35.0)
+        self.assertEqual(float(aggregate.close_price), 45.0)
+        self.assertEqual(float(aggregate.mean_price), 43.75)
+
+    def test_rebuild_matches_incremental(self):
+        for price in ['40.00', '55.00', '35.00']:
+            self.submit(price)
+        incremental = DailyPriceAggregate.objects.values(
+            'open_price', 'high_price', 'low_price', 'close_price', 'mean_price', 'count'
+        ).get()
+
+        rebuild_daily_aggregates()
+        rebuilt = DailyPriceAggregate.objects.values(
+            'open_price', 'high_price', 'low_price', 'close_price', 'mean_price', 'count'
+        ).get()
+        self.assertEqual(incremental, rebuilt)
+
+    def test_backfill_migration_matches_rebuild(self):
+        for price in ['40.00', '55.00', '35.00']:
+            self.submit(price)
+        fields = ('open_price', 'high_price', 'low_price', 'close_price', 'mean_price', 'count')
+        rebuild_daily_aggregates()
+        rebuilt = list(DailyPriceAggregate.objects.values(*fields))
+
+        migration = importlib.import_module('api.migrations.0009_backfill_daily_aggregates')
+        migration.backfill_daily_aggregates(django_apps, None)
+
+        self.assertEqual(list(DailyPriceAggregate.objects.values(*fields)), rebuilt)
+
+    def test_concurrently_created_aggregate_is_retried(self):
+        first = PriceEntry.objects.create(vegetable=self.vegetable, city=self.city, price_per_kg=40, source='local_market')
+        second = PriceEntry.objects.create(vegetable=self.vegetable, city=self.city, price_per_kg=50, source='local_market')
+        locked_aggregates = rollups._locked_aggregates
+        calls = []
+
+        def racing(keys):
+            # The first look misses the aggregate another writer is creating
+            calls.append(keys)
+            return {} if len(calls) == 1 else locked_aggregates(keys)
+
+        update_daily_aggregates([first])
+        with mock.patch('api.rollups._locked_aggregates', side_effect=racing):
+            update_daily_aggregates([second])
+
+        aggregate = DailyPriceAggregate.objects.get()
+        self.assertEqual(aggregate.count, 2)
+        self.assertEqual(float(aggregate.high_price), 50.0)
+
+    def test_daily_comparison(self):
+        for price in ['40.00', '50.00']:
+            self.submit(price)
+        response = self.client.get('/api/comparison/?city=Delhi&item=Tomato&granularity=daily')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 1)
+        self.assertEqual(response.data[0]['close'], 50.0)
+        self.assertEqual(response.data[0]['count'], 2)
+
+
+class ResponseCacheTestCase(CachedAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.city = City.objects.create(name='Delhi', state='Delhi')
+        self.vegetable = Vegetable.objects.create(name='Tomato', category='tomato')
+        PriceEntry.objects.create(
+            vegetable=self.vegetable,
+            city=self.city,
+            price_per_kg=40,
+            source='government'
+        )
+
+    def test_repeat_request_is_served_from_cache(self):
+        self.client.get('/api/current-prices/?city=Delhi')
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/current-prices/?city=Delhi')
+        self.assertEqual(response.data[0]['price_per_kg'], 40.0)
+
+    def test_submit_invalidates_city(self):
+        self.client.get('/api/current-prices/?city=Delhi')
+        self.client.post('/api/submit-price/', {
+            'vegetable': self.vegetable.id,
+            'city': self.city.id,
+            'price_per_kg': '50.00',
+            'source': 'local_market'
+        }, format='json')
+
+        response = self.client.get('/api/current-prices/?city=Delhi')
+        self.assertEqual(response.data[0]['price_per_kg'], 50.0)
+
+    def test_other_city_is_not_invalidated(self):
+        self.client.get('/api/current-prices/?city=Delhi')
+        bump_data_version('Mumbai')
+        with self.assertNumQueries(0):
+            self.client.get('/api/current-prices/?city=Delhi')
+
+
+class ConditionalGetTestCase(CachedAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.city = City.objects.create(name='Delhi', state='Delhi')
+        self.vegetable = Vegetable.objects.create(name='Tomato', category='tomato')
+        PriceEntry.objects.create(
+            vegetable=self.vegetable,
+            city=self.city,
+            price_per_kg=40,
+            source='government'
+        )
+
+    def test_matching_etag_returns_not_modified(self):
+        response = self.client.get('/api/current-prices/?city=Delhi')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('ETag', response)
+        self.assertIn('Last-Modified', response)
+
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/current-prices/?city=Delhi', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_etag_changes_after_write(self):
+        etag = self.client.get('/api/current-prices/?city=Delhi')['ETag']
+        self.client.post('/api/submit-price/', {
+            'vegetable': self.vegetable.id,
+            'city': self.city.id,
+            'price_per_kg': '50.00',
+            'source': 'local_market'
+        }, format='json')
+
+        response = self.client.get('/api/current-prices/?city=Delhi', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_etag_changes_after_predictions_are_regenerated(self):
+        tomorrow = timezone.localdate() + timedelta(days=1)
+        Prediction.objects.create(vegetable=self.vegetable, city=self.city, prediction_date=tomorrow,
+                                  predicted_price=42, model_used='arima')
+        url = '/api/prediction/?city=Delhi&item=Tomato'
+        etag = self.client.get(url)['ETag']
+
+        # As ml.predict_price does: created_at stays, the version moves
+        Prediction.objects.update_or_create(
+            vegetable=self.vegetable, city=self.city, prediction_date=tomorrow,
+            defaults={'predicted_price': 48, 'model_used': 'ensemble'}
+        )
+        bump_data_version(self.city.name)
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.data[0]['predicted_price'], 48.0)
+
+    def test_version_bump_moves_last_modified(self):
+        last_modified = self.client.get('/api/current-prices/?city=Delhi')['Last-Modified']
+        response = self.client.get('/api/current-prices/?city=Delhi', HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        # A rewrite (e.g. a rollup rebuild) that moves no row timestamp
+        with mock.patch('api.caching.time.time', return_value=time.time() + 10):
+            bump_data_version(self.city.name)
+
+        response = self.client.get('/api/current-prices/?city=Delhi', HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['Last-Modified'], last_modified)
+
+    def test_etag_depends_on_params(self):
+        first = self.client.get('/api/insights/?city=Delhi&month=March')['ETag']
+        second = self.client.get('/api/insights/?city=Delhi&month=April')['ETag']
+        self.assertNotEqual(first, second)
+
+
+class DashboardAPITestCase(CachedAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.city = City.objects.create(name='Delhi', state='Delhi')
+        tomorrow = timezone.now().date() + timedelta(days=1)
+        for name in ['Tomato', 'Onion', 'Potato']:
+            vegetable = Vegetable.objects.create(name=name, category='other')
+            entry = PriceEntry.objects.create(
+                vegetable=vegetable,
+                city=self.city,
+                price_per_kg=50,
+                source='government'
+            )
+            update_daily_aggregates([entry])
+            Prediction.objects.create(
+                vegetable=vegetable,
+                city=self.city,
+                predicted_price=30,
+                prediction_date=tomorrow,
+                model_used='prophet',
+                confidence=0.9
+            )
+
+    def test_dashboard_bundle(self):
+        # Validators, city, latest prices, predictions, grouped rollups
+        with self.assertNumQueries(5):
+            response = self.client.get('/api/dashboard/?city=Delhi')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['current_prices']), 3)
+        self.assertEqual(len(response.data['recommendations']), 3)
+        self.assertEqual(len(response.data['insights']), 3)
+        self.assertEqual(response.data['savings']['items_saved'], 3)
+        self.assertEqual(response.data['savings']['total_savings'], 60.0)
+
+    def test_dashboard_matches_individual_endpoints(self):
+        dashboard = self.client.get('/api/dashboard/?city=Delhi').data
+        self.assertEqual(dashboard['current_prices'], self.client.get('/api/current-prices/?city=Delhi').data)
+        self.assertEqual(dashboard['recommendations'], self.client.get('/api/recommendation/?city=Delhi').data)
+        self.assertEqual(dashboard['insights'], self.client.get('/api/insights/?city=Delhi').data)
+
+    def test_dashboard_insights_for_requested_year(self):
+        last_year = timezone.localdate().year - 1
+        month = timezone.localdate().strftime('%B')
+        current = self.client.get(f'/api/dashboard/?city=Delhi&month={month}')
+        previous = self.client.get(f'/api/dashboard/?city=Delhi&month={month}&year={last_year}')
+        self.assertEqual(len(current.data['insights']), 3)
+        self.assertEqual(previous.status_code, status.HTTP_200_OK)
+        self.assertEqual(previous.data['insights'], [])
+
+        response = self.client.get('/api/dashboard/?city=Delhi&year=abc')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class BulkSubmitPriceAPITestCase(CachedAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.city = City.objects.create(name='Delhi', state='Delhi')
+        self.vegetable = Vegetable.objects.create(name='Tomato', category='tomato')
+
+    def test_bulk_json_with_invalid_rows(self):
+        response = self.client.post('/api/submit-price/bulk/', [
+            {'vegetable': self.vegetable.id, 'city_name': 'Delhi', 'price_per_kg': '40.00', 'source': 'local_market'},
+            {'vegetable_name': 'Okra', 'city_name': 'Pune', 'price_per_kg': '60.00'},
+            {'vegetable_name': 'Onion', 'city_name': 'Delhi', 'price_per_kg': '-1'},
+            {'vegetable': 9999, 'city': self.city.id, 'price_per_kg': '30.00'},
+        ], format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['created'], 2)
+        self.assertEqual([error['row'] for error in response.data['errors']], [2, 3])
+        self.assertTrue(Vegetable.objects.filter(name='Okra').exists())
+        self.assertFalse(Vegetable.objects.filter(name='Onion').exists())
+        self.assertEqual(DailyPriceAggregate.objects.count(), 2)
+
+    def test_bulk_query_count_is_constant(self):
+        rows = [
+            {'vegetable_name': f'Vegetable {i}', 'city_name': 'Delhi', 'price_per_kg': '10.00'}
+            for i in range(50)
+        ]
+        # Same count for any batch size: name index build, name lookups, one
+        # price insert, one rollup lookup/insert, plus transaction savepoints
+        with self.assertNumQueries(12):
+            response = self.client.post('/api/submit-price/bulk/', rows, format='json')
+        self.assertEqual(response.data['created'], 50)
+
+    def test_bulk_csv(self):
+        body = (
+            'vegetable_name,city_name,price_per_kg,source,quality_rating\n'
+            'Tomato,Delhi,42.50,bigbasket,4\n'
+            'Tomato,Delhi,abc,bigbasket,4\n'
+        )
+        response = self.client.post('/api/submit-price/bulk/', body, content_type='text/csv')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['created'], 1)
+        self.assertEqual(response.data['errors'][0]['row'], 1)
+        self.assertEqual(float(PriceEntry.objects.get().price_per_kg), 42.5)
+
+
+class IngestPricesTestCase(CachedAPITestCase):
+    def rows(self, count, start=0):
+        return [
+            {
+                'vegetable_name': f'Vegetable {i % 7}',
+                'city_name': f'City {i % 3}',
+                'price_per_kg': Decimal('20.00') + i,
+                'source': 'government',
+                'location': f'Market {i}',
+                'quality_rating': 5
+            }
+            for i in range(start, start + count)
+        ]
+
+    def test_ingest_creates_entries_names_and_rollups(self):
+        result = ingest_prices(self.rows(30))
+        self.assertEqual(result['count'], 30)
+        self.assertIn('rows_per_second', result)
+        self.assertEqual(PriceEntry.objects.count(), 30)
+        self.assertEqual(Vegetable.objects.count(), 7)
+        self.assertEqual(City.objects.count(), 3)
+        self.assertEqual(sum(DailyPriceAggregate.objects.values_list('count', flat=True)), 30)
+
+    def test_ingest_query_count_does_not_grow_with_rows(self):
+        ingest_prices(self.rows(10))
+        with CaptureQueriesContext(connection) as small:
+            ingest_prices(self.rows(10, start=10))
+        with CaptureQueriesContext(connection) as large:
+            ingest_prices(self.rows(200, start=20))
+        # Only extra insert chunks, never per-row queries
+        self.assertLess(len(large), len(small) + 5)
+
+    def test_reingesting_adds_no_rows(self):
+        ingest_prices(self.rows(30))
+        result = ingest_prices(self.rows(30))
+
+        self.assertEqual(result['count'], 0)
+        self.assertEqual(result['unchanged'], 30)
+        self.assertEqual(PriceEntry.objects.count(), 30)
+        self.assertEqual(sum(DailyPriceAggregate.objects.values_list('count', flat=True)), 30)
+
+    def test_changed_price_replaces_observation(self):
+        rows = self.rows(3)
+        ingest_prices(rows)
+        rows[0]['price_per_kg'] = Decimal('99.00')
+        result = ingest_prices(rows + [rows[0]])
+
+        self.assertEqual(result['updated'], 1)
+        self.assertEqual(PriceEntry.objects.count(), 3)
+        self.assertTrue(PriceEntry.objects.filter(price_per_kg=Decimal('99.00')).exists())
+        aggregate = DailyPriceAggregate.objects.get(vegetable__name='Vegetable 0')
+        self.assertEqual(aggregate.count, 1)
+        self.assertEqual(aggregate.close_price, Decimal('99.00'))
+
+
+    def test_bad_rows_are_rejected_without_failing_the_batch(self):
+        rows = self.rows(4)
+        rows[1]['price_per_kg'] = 'n/a'
+        rows[2]['city_name'] = None
+        rows[3]['source'] = 'unknown'
+        result = ingest_prices(rows)
+
+        self.assertEqual(result['count'], 1)
+        self.assertEqual(result['rejected'], [1, 2, 3])
+        self.assertEqual(
+            result['rejections'],
+            {'malformed_row': 1, 'missing_name': 1, 'unknown_source': 1}
+        )
+        self.assertEqual(PriceEntry.objects.count(), 1)
+
+    def test_rejections_are_logged_once_per_batch(self):
+        rows = self.rows(5)
+        for row in rows[1:]:
+            row['source'] = 'unknown'
+        with self.assertLogs('api.ingest', level='WARNING') as logs:
+            ingest_prices(rows)
+
+        self.assertEqual(logs.output, [
+            "WARNING:api.ingest:Skipping 4 price rows: {'unknown_source': 4}"
+        ])
+
+class ScraperRunnerTestCase(SimpleTestCase):
+    def test_fetchers_run_concurrently(self):
+        def slow(session=None):
+            time.sleep(0.3)
+            return [{'source': 'slow'}]
+
+        started = time.perf_counter()
+        result = run_fetchers({'a': slow, 'b': slow, 'c': slow}, default_timeout=5)
+
+        self.assertLess(time.perf_counter() - started, 0.8)
+        self.assertEqual(len(result['prices']), 3)
+        for stats in result['sources'].values():
+            self.assertEqual(stats['status'], 'ok')
+            self.assertGreaterEqual(stats['latency'], 0.3)
+
+    def test_slow_source_times_out_with_partial_results(self):
+        def fast(session=None):
+            return [{'source': 'fast'}]
+
+        def hanging(session=None):
+            time.sleep(2)
+            return [{'source': 'hanging'}]
+
+        def broken(session=None):
+            raise ValueError('bad payload')
+
+        started = time.perf_counter()
+        result = run_fetchers(
+            {'fast': fast, 'hanging': hanging, 'broken': broken},
+            timeouts={'hanging': 0.2}, default_timeout=5
+        )
+
+        self.assertLess(time.perf_counter() - started, 1)
+        self.assertEqual(result['prices'], [{'source': 'fast'}])
+        self.assertEqual(result['sources']['fast']['status'], 'ok')
+        self.assertEqual(result['sources']['hanging']['status'], 'timeout')
+        self.assertEqual(result['sources']['broken']['status'], 'error')
+
+
+class SourceHealthTestCase(SimpleTestCase):
+    def test_circuit_opens_then_probes_after_cooldown(self):
+        health = SourceHealth('store', min_calls=3, failure_rate=0.5, cooldown=60)
+        for _ in range(3):
+            self.assertTrue(health.allow())
+            health.record(False, 0.1)
+        self.assertEqual(health.stats()['status'], 'open')
+        self.assertFalse(health.allow())
+
+        with mock.patch('scraper.health.time.time', return_value=time.time() + 61):
+            # A single probe; a failing probe doubles the cooldown
+            self.assertTrue(health.allow())
+            self.assertFalse(health.allow())
+            health.record(False, 0.1)
+            self.assertEqual(health.cooldown, 120)
+            self.assertFalse(health.allow())
+
+        with mock.patch('scraper.health.time.time', return_value=time.time() + 200):
+            self.assertTrue(health.allow())
+            health.record(True, 0.1)
+        self.assertEqual(health.stats()['status'], 'closed')
+        self.assertEqual(health.cooldown, 60)
+
+    def test_failure_streak_trips_a_healthy_source(self):
+        health = SourceHealth('store', window=20, min_calls=3, failure_rate=0.5, consecutive_failures=3)
+        for _ in range(20):
+            health.record(True, 0.1)
+        for _ in range(2):
+            health.record(False, 15)
+        self.assertEqual(health.status, 'closed')
+
+        health.record(False, 15)
+        self.assertEqual(health.status, 'open')
+
+    def test_tasks_sharing_a_source_merge_its_state(self):
+        cache.clear()
+        fetch, harvest = _load_source_health(), _load_source_health()
+        fetch.get('government').record(False, 15)
+        fetch.get('bigbasket').record(True, 0.5)
+        harvest.get('government').record(False, 2)
+        harvest.limiter('government', initial=2)
+
+        _save_source_health(fetch)
+        _save_source_health(harvest)
+
+        restored = _load_source_health()
+        self.assertEqual(restored.get('government').stats()['calls'], 2)
+        self.assertEqual(restored.get('government').failure_streak, 2)
+        self.assertEqual(restored.get('bigbasket').stats()['calls'], 1)
+        self.assertEqual(restored.limiter('government').concurrency, 2)
+
+    def test_configured_cooldown_skips_the_next_daily_run(self):
+        cache.clear()
+        health = _load_source_health().get('government')
+        for _ in range(3):
+            health.record(False, 15)
+        self.assertEqual(health.max_cooldown, 7 * 24 * 3600)
+
+        with mock.patch('scraper.health.time.time', return_value=time.time() + 24 * 3600):
+            self.assertFalse(health.allow())
+        with mock.patch('scraper.health.time.time', return_value=time.time() + 25 * 3600):
+            self.assertTrue(health.allow())
+
+    def test_latency_percentiles(self):
+        health = SourceHealth('store', window=100)
+        for latency in range(1, 101):
+            health.record(True, latency / 100)
+
+        stats = health.stats()
+        self.assertEqual((stats['p50'], stats['p95'], stats['p99']), (0.5, 0.95, 0.99))
+        self.assertEqual(stats['error_rate'], 0)
+
+    def test_aimd_limit_grows_when_fast_and_halves_once_when_slow(self):
+        limiter = AIMDLimiter(initial=2, maximum=4, target_latency=0.05)
+        for _ in range(6):
+            limiter.release(limiter.acquire())
+        self.assertEqual(limiter.concurrency, 4)
+
+        # Calls of the same slow burst decrease the limit once
+        burst = [limiter.acquire() for _ in range(4)]
+        self.assertIsNone(limiter.acquire(timeout=0.01))
+        time.sleep(0.06)
+        for started in burst:
+            limiter.release(started)
+        self.assertEqual(limiter.concurrency, 2)
+
+        limiter.release(limiter.acquire(), ok=False)
+        self.assertEqual(limiter.concurrency, 1)
+
+    def test_run_fetchers_skips_source_with_open_circuit(self):
+        calls = Counter()
+
+        def failing(session=None):
+            calls['failing'] += 1
+            raise ConnectionError('down')
+
+        def fast(session=None):
+            return [{'source': 'fast'}]
+
+        health = SourceHealthRegistry(min_calls=2, cooldown=60)
+        for _ in range(3):
+            result = run_fetchers({'failing': failing, 'fast': fast}, health=health)
+
+        self.assertEqual(calls['failing'], 2)
+        self.assertEqual(result['sources']['failing']['status'], 'skipped')
+        self.assertEqual(result['prices'], [{'source': 'fast'}])
+
+        # Circuits and limits carry over to the next run's registry
+        restored = SourceHealthRegistry(json.loads(json.dumps(health.state())), min_calls=2, cooldown=60)
+        self.assertFalse(restored.get('failing').allow())
+        self.assertTrue(restored.get('fast').allow())
+
+
+class AgmarknetStubHandler(BaseHTTPRequestHandler):
+    """Serves `pages` datapoints per district, failing each first request with 503"""
+    pages = 3
+    page_size = 2
+
+    def do_GET(self):
+        params = {k: v[0] for k, v in parse_qs(urlparse(self.path).query).items()}
+        server = self.server
+        with server.lock:
+            server.requests.append(params)
+            key = (params['districtId'], params['page'])
+            first_attempt = key not in server.seen
+            server.seen.add(key)
+
+        if first_attempt and params['page'] == '2':
+            self.send_response(503)
+            self.end_headers()
+            return
+
+        page = int(params['page'])
+        size = self.page_size if page < self.pages else 1
+        body = json.dumps({'response': [
+            {
+                'commodity': 'Tomato',
+                'state': params['districtId'],
+                'priceCurrent': 4000 + page * 10 + i,
+                'market': f"page {page}",
+            }
+            for i in range(size)
+        ]}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class AgmarknetHarvesterTestCase(SimpleTestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), AgmarknetStubHandler)
+        self.server.lock = threading.Lock()
+        self.server.requests = []
+        self.server.seen = set()
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/api/datapoints"
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_harvests_every_page_of_every_target(self):
+        targets = iter_targets(['1'], {'DL': ['D1', 'D2'], 'MH': ['D3']})
+        rows = list(harvest_government_prices(
+            targets, base_url=self.url, rate_limit=None, concurrency=3, page_size=2, backoff=0.01
+        ))
+
+        # 2 + 2 + 1 rows for each of the 3 districts
+        self.assertEqual(len(rows), 15)
+        self.assertEqual({row['city_name'] for row in rows}, {'D1', 'D2', 'D3'})
+        self.assertIn(40.1, {row['price_per_kg'] for row in rows})
+        # Each district's page 2 is retried once after a 503
+        self.assertEqual(len(self.server.requests), 3 * 3 + 3)
+
+    def test_harvest_records_source_health(self):
+        health = SourceHealthRegistry(target_latency=5)
+        targets = iter_targets(['1'], {'DL': ['D1', 'D2']})
+        rows = list(harvest_government_prices(
+            targets, base_url=self.url, rate_limit=None, concurrency=2, page_size=2, backoff=0.01, health=health
+        ))
+
+        self.assertEqual(len(rows), 10)
+        stats = health.stats()['government']
+        self.assertEqual((stats['status'], stats['calls'], stats['error_rate']), ('closed', 6, 0))
+
+        # While the circuit is open the harvest makes no requests
+        health.get('government')._open(60)
+        requests_made = len(self.server.requests)
+        self.assertEqual(list(harvest_government_prices(iter_targets(['1'], {'DL': ['D1']}), base_url=self.url, health=health)), [])
+        self.assertEqual(len(self.server.requests), requests_made)
+
+    def test_streams_rows_before_harvest_finishes(self):
+        targets = iter_targets(['1'], {'DL': ['D1']})
+        rows = harvest_government_prices(targets, base_url=self.url, rate_limit=None, page_size=2)
+
+        first = next(rows)
+        rows.close()
+
+        self.assertEqual(first['source'], 'government')
+        self.assertLess(len(self.server.requests), 4)
+
+    def test_rate_limiter_spaces_requests(self):
+        limiter = RateLimiter(20, burst=1)
+        started = time.perf_counter()
+        for _ in range(6):
+            limiter.acquire()
+
+        self.assertGreaterEqual(time.perf_counter() - started, 0.2)
+
+
+class ConditionalStubHandler(BaseHTTPRequestHandler):
+    """Serves one datapoint with an ETag and answers a matching If-None-Match with 304"""
+    etag = '"v1"'
+
+    def do_GET(self):
+        self.server.requests.append((self.path, dict(self.headers)))
+        if self.headers.get('If-None-Match') == self.etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+
+        body = json.dumps({'response': [
+            {'commodity': 'Tomato', 'state': 'Delhi', 'priceCurrent': 4550, 'market': 'Azadpur'}
+        ]}).encode()
+        self.send_response(200)
+        self.send_header('ETag', self.etag)
+        self.send_header('Last-Modified', 'Mon, 05 Oct 2026 00:00:00 GMT')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class SourceWatermarkTestCase(APITestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), ConditionalStubHandler)
+        self.server.requests = []
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/api/datapoints"
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_second_fetch_is_conditional_and_not_modified(self):
+        watermarks = WatermarkStore()
+        prices = fetch_government_prices(watermarks=watermarks, url=self.url)
+        self.assertEqual(len(prices), 1)
+        self.assertEqual(watermarks.commit(), 1)
+
+        watermark = SourceWatermark.objects.get(source='government')
+        self.assertEqual(watermark.etag, '"v1"')
+        self.assertIsNotNone(watermark.last_success_at)
+
+        watermarks = WatermarkStore()
+        self.assertIsNone(fetch_government_prices(watermarks=watermarks, url=self.url))
+        path, headers = self.server.requests[-1]
+        self.assertEqual(headers['If-None-Match'], '"v1"')
+        self.assertIn('since=', path)
+
+        # A 304 still advances the fetch time and keeps the validators
+        watermarks.commit()
+        refreshed = SourceWatermark.objects.get(source='government')
+        self.assertEqual(refreshed.etag, '"v1"')
+        self.assertGreater(refreshed.last_success_at, watermark.last_success_at)
+
+    def test_uncommitted_watermarks_are_not_stored(self):
+        watermarks = WatermarkStore()
+        fetch_government_prices(watermarks=watermarks, url=self.url)
+
+        self.assertFalse(SourceWatermark.objects.exists())
+
+    def test_timed_out_source_does_not_advance_its_watermark(self):
+        def fast(session=None, watermarks=None):
+            watermarks.stage('fast', 'endpoint', etag='"f1"')
+            return [{'source': 'fast'}]
+
+        def hanging(session=None, watermarks=None):
+            time.sleep(0.4)
+            watermarks.stage('hanging', 'endpoint', etag='"h1"')
+            return [{'source': 'hanging'}]
+
+        watermarks = WatermarkStore()
+        result = run_fetchers({'fast': fast, 'hanging': hanging}, timeouts={'hanging': 0.1}, watermarks=watermarks)
+        self.assertEqual(result['sources']['hanging']['status'], 'timeout')
+
+        # The straggler finishes before the caller commits
+        time.sleep(0.5)
+        self.assertEqual(watermarks.commit(), 2)
+        self.assertEqual(set(SourceWatermark.objects.values_list('source', 'endpoint')), {('fast', ''), ('fast', 'endpoint')})
+
+    def test_failed_government_fetch_stores_no_sample_rows(self):
+        session = mock.Mock()
+        session.get.side_effect = requests.ConnectionError('down')
+
+        result = run_fetchers({'government': PRICE_SOURCES['government']}, session=session)
+        self.assertEqual(result['prices'], [])
+        self.assertEqual(result['sources']['government']['status'], 'error')
+
+    def test_failing_government_api_opens_its_circuit(self):
+        session = mock.Mock()
+        session.get.side_effect = requests.Timeout('read timed out')
+        health = SourceHealthRegistry(min_calls=3, consecutive_failures=3, cooldown=60)
+
+        for _ in range(4):
+            result = run_fetchers({'government': PRICE_SOURCES['government']}, session=session, health=health)
+
+        self.assertEqual(session.get.call_count, 3)
+        self.assertEqual(result['sources']['government']['status'], 'skipped')
+        self.assertEqual(health.get('government').status, 'open')
+
+    def test_full_fetch_ignores_watermarks(self):
+        SourceWatermark.objects.create(source='government', endpoint='x', etag='"v1"')
+        watermarks = WatermarkStore(load=False)
+
+        self.assertEqual(watermarks.get('government', 'x')['etag'], '')
+
+
+class ResponseArchiveTestCase(CachedAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), ConditionalStubHandler)
+        self.server.requests = []
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/api/datapoints"
+        self.tmp = tempfile.TemporaryDirectory()
+        self.archive = ResponseArchive(self.tmp.name)
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.tmp.cleanup()
+
+    def test_identical_responses_are_stored_once(self):
+        fetch_government_prices(url=self.url, archive=self.archive)
+        fetch_government_prices(url=self.url, archive=self.archive)
+
+        entries = list(self.archive.entries())
+        self.assertEqual(len(entries), 2)
+        self.assertEqual(entries[0]['sha256'], entries[1]['sha256'])
+        self.assertEqual(len(list(self.archive.objects.glob('*/*.gz'))), 1)
+        self.assertIn(b'Azadpur', self.archive.read(entries[0]['sha256']))
+
+    def test_replay_stores_prices_without_network(self):
+        fetch_government_prices(url=self.url, archive=self.archive)
+        self.server.shutdown()
+        requests_made = len(self.server.requests)
+
+        out = StringIO()
+        call_command('replay_archive', self.tmp.name, '--dry-run', stdout=out)
+        self.assertIn('1 clean rows', out.getvalue())
+        self.assertFalse(PriceEntry.objects.exists())
+
+        call_command('replay_archive', self.tmp.name, stdout=StringIO())
+        call_command('replay_archive', self.tmp.name, stdout=StringIO())
+
+        entry = PriceEntry.objects.get()
+        self.assertEqual(entry.price_per_kg, Decimal('45.50'))
+        self.assertEqual(entry.location, 'Azadpur')
+        self.assertEqual(len(self.server.requests), requests_made)
+
+
+class StoreHtmlParsingTestCase(SimpleTestCase):
+    def test_parses_every_store_fixture(self):
+        for source, parser in STORE_PARSERS.items():
+            with self.subTest(source=source):
+                pages = load_fixture_pages(source)
+                self.assertTrue(pages)
+                rows = parser.parse(pages[0])
+
+                # Cards sold per piece or bunch have no per-kg price
+                self.assertEqual(len(rows), 64)
+                self.assertEqual({row['source'] for row in rows}, {source})
+                self.assertEqual(len({row['city_name'] for row in rows}), 1)
+                self.assertIn('Cabbage', {row['vegetable_name'] for row in rows})
+                self.assertTrue(all(20 < row['price_per_kg'] < 150 for row in rows))
+                self.assertEqual(len(clean_price_data(rows)), 64)
+
+    def test_strained_parse_matches_full_tree(self):
+        for source, parser in STORE_PARSERS.items():
+            page = load_fixture_pages(source)[0]
+            self.assertEqual(parser.parse(page), parser.parse(page, full_tree=True))
+
+    def test_price_is_normalized_per_kg(self):
+        page = (
+            '<body data-delivery-city="Pune"><ul><li class="product-card">'
+            '<h3 class="product-name">Fresh Tomato - Local</h3><span class="pack-size">500 g</span>'
+            '<span class="mrp">MRP: ₹30</span><span class="discounted-price">₹1,024.50</span>'
+            '</li></ul></body>'
+        )
+        [row] = RESPONSE_PARSERS['bigbasket'](page.encode())
+
+        self.assertEqual(row['vegetable_name'], 'Fresh Tomato')
+        self.assertEqual(row['city_name'], 'Pune')
+        self.assertEqual(row['price_per_kg'], 2049.0)
+
+    def test_labels(self):
+        self.assertEqual(parse_price('Rs. 48'), 48.0)
+        self.assertEqual(parse_price('₹ 1,299.50'), 1299.5)
+        self.assertIsNone(parse_price('Out of stock'))
+        self.assertEqual(parse_pack_kg('250 g'), 0.25)
+        self.assertEqual(parse_pack_kg('Onion 2 kg (Pack)'), 2.0)
+        self.assertIsNone(parse_pack_kg('1 bunch'))
+
+
+class CleanPriceDataTestCase(SimpleTestCase):
+    def test_normalizes_columns(self):
+        cleaned = clean_price_data([{
+            'vegetable_name': ' tomato ',
+            'city_name': 'delhi',
+            'price_per_kg': '45.5',
+            'source': 'Local Market',
+            'location': ' Azadpur ',
+            'quality_rating': '9',
+        }])
+
+        self.assertEqual(cleaned, [{
+            'vegetable_name': 'Tomato',
+            'city_name': 'Delhi',
+            'price_per_kg': Decimal('45.5'),
+            'source': 'local_market',
+            'location': 'Azadpur',
+            'quality_rating': 5,
+        }])
+
+    def test_streams_batches_and_counts_rejections(self):
+        def rows():
+            for i in range(25):
+                yield {'vegetable_name': 'Onion', 'city_name': 'Pune', 'price_per_kg': i, 'source': 'unknown'}
+            yield {'vegetable_name': None, 'city_name': 'Pune', 'price_per_kg': 10}
+            yield {'vegetable_name': 'Onion', 'city_name': '', 'price_per_kg': 10}
+            yield {'vegetable_name': 'Onion', 'city_name': 'Pune', 'price_per_kg': 'n/a'}
+
+        rejections = Counter()
+        batches = list(iter_clean_price_batches(rows(), chunk_size=10, rejections=rejections))
+
+        self.assertEqual([len(batch) for batch in batches], [9, 10, 5])
+        self.assertEqual(batches[0][0]['source'], 'other')
+        self.assertEqual(batches[0][0]['quality_rating'], 5)
+        self.assertEqual(rejections, {
+            'non_positive_price': 1,
+            'missing_vegetable_name': 1,
+            'missing_city_name': 1,
+            'unparseable_price': 1,
+        })
+
+
+class NameResolutionTestCase(CachedAPITestCase):
+    def setUp(self):
+        super().setUp()
+        for name in ['Tomato', 'Onion', 'Bottle Gourd', 'Grade 1 Rice']:
+            Vegetable.objects.create(name=name, category='other')
+
+    def test_exact_alias_and_fuzzy_lookup(self):
+        index = NameIndex(['Tomato', 'Onion', 'Bottle Gourd', 'Grade 1 Rice'], {'lauki': 'Bottle Gourd'})
+
+        self.assertEqual(index.resolve('  ONION '), 'Onion')
+        self.assertEqual(index.resolve('Lauki'), 'Bottle Gourd')
+        self.assertEqual(index.resolve('Tomatoe'), 'Tomato')
+        self.assertEqual(index.resolve('Botle Gourd'), 'Bottle Gourd')
+        self.assertIsNone(index.resolve('Grade 2 Rice'))
+        self.assertIsNone(index.resolve('Okra'))
+
+    def test_ingest_reuses_existing_vegetables(self):
+        result = ingest_prices([
+            {'vegetable_name': name, 'city_name': 'Delhi', 'price_per_kg': Decimal('30.00'),
+             'source': 'government', 'location': name, 'quality_rating': 5}
+            for name in ['Tomatoe', 'Tamato', 'Onoin', 'Okra']
+        ])
+
+        self.assertEqual(result['created'], 4)
+        self.assertEqual(
+            sorted(Vegetable.objects.values_list('name', flat=True)),
+            ['Bottle Gourd', 'Grade 1 Rice', 'Okra', 'Onion', 'Tomato']
+        )
+        self.assertEqual(PriceEntry.objects.filter(vegetable__name='Tomato').count(), 2)
+
+    def test_index_is_cached_and_refreshed_on_changes(self):
+        index = get_vegetable_index()
+        with self.assertNumQueries(0):
+            self.assertIs(get_vegetable_index(), index)
+
+        VegetableAlias.objects.create(vegetable=Vegetable.objects.get(name='Bottle Gourd'), alias='Dudhi')
+        vegetables, _ = resolve_vegetables(names=['Dudhi'])
+
+        self.assertIsNot(get_vegetable_index(), index)
+        self.assertEqual(vegetables['Dudhi'].name, 'Bottle Gourd')
+
+
+class ImportPricesTestCase(CachedAPITestCase):
+    def setUp(self):
+        super().setUp()
+        handle, self.path = tempfile.mkstemp(suffix='.csv')
+        with os.fdopen(handle, 'w') as f:
+            f.write('vegetable_name,city_name,price_per_kg,location,timestamp\n')
+            for day in range(1, 7):
+                f.write(f'Tomato,Delhi,{40 + day},Azadpur,2024-01-{day:02d} 08:00\n')
+            f.write('Tomato,Delhi,50,Azadpur,yesterday\n')
+
+    def tearDown(self):
+        for path in [self.path, f'{self.path}.checkpoint.json']:
+            if os.path.exists(path):
+                os.remove(path)
+
+    def test_import_keeps_timestamps_and_builds_rollups(self):
+        summary = import_prices(self.path, chunk_size=4, default_source='government')
+
+        self.assertEqual(summary['inserted'], 6)
+        self.assertEqual(summary['rejections'], {'unparseable_timestamp': 1})
+        first = PriceEntry.objects.order_by('timestamp').first()
+        self.assertEqual(first.timestamp.date().isoformat(), '2024-01-01')
+        self.assertEqual(first.source, 'government')
+        self.assertEqual(DailyPriceAggregate.objects.count(), 6)
+        self.assertFalse(os.path.exists(f'{self.path}.checkpoint.json'))
+
+    def test_reimport_adds_no_rows(self):
+        import_prices(self.path, chunk_size=4)
+        summary = import_prices(self.path, chunk_size=4)
+
+        self.assertEqual(summary['inserted'], 0)
+        self.assertEqual(PriceEntry.objects.count(), 6)
+
+    def test_resumes_from_checkpoint(self):
+        # Simulate an import interrupted after the first chunk
+        checkpoint = ImportCheckpoint(f'{self.path}.checkpoint.json', self.path, 4)
+        checkpoint.mark(0, 4, {})
+
+        summary = import_prices(self.path, chunk_size=4)
+
+        self.assertEqual(summary['chunks'], 2)
+        self.assertEqual(summary['inserted'], 6)
+        # Only the second chunk's rows were read and inserted
+        self.assertEqual(PriceEntry.objects.count(), 2)
+
+
+    def test_checkpoint_keeps_an_offset_and_date_ranges(self):
+        path = f'{self.path}.checkpoint.json'
+        jan = [None] + [timezone.datetime(2024, 1, day).date() for day in range(1, 6)]
+        checkpoint = ImportCheckpoint(path, self.path, 4)
+
+        # A worker finishes the second chunk first
+        checkpoint.mark(1, 2, {}, {(1, 1, 'government'): (jan[3], jan[5])})
+        self.assertEqual((checkpoint.offset, checkpoint.completed), (0, {1}))
+        self.assertFalse(checkpoint.is_done(0))
+
+        checkpoint.mark(0, 4, {}, {(1, 1, 'government'): (jan[1], jan[2]), (2, 1, 'government'): (jan[4], jan[4])})
+        restored = ImportCheckpoint(path, self.path, 4)
+        restored.load()
+        self.assertEqual((restored.offset, restored.completed, restored.chunks), (2, set(), 2))
+        self.assertEqual(restored.ranges, {
+            (1, 1, 'government'): (jan[1], jan[5]),
+            (2, 1, 'government'): (jan[4], jan[4]),
+        })
+
+    def test_rebuilds_only_the_imported_days(self):
+        with open(self.path, 'a') as f:
+            f.write('Onion,Delhi,30,,2024-01-01 09:00\n')
+        other = Vegetable.objects.create(name='Potato', category='potato')
+        city = City.objects.create(name='Pune', state='Maharashtra')
+        # An aggregate a full rebuild would drop, as it has no raw rows
+        untouched = DailyPriceAggregate.objects.create(
+            vegetable=other, city=city, source='government', date='2023-12-31', open_price=20, high_price=20,
+            low_price=20, close_price=20, mean_price=20, total_price=20, count=1,
+            first_timestamp=timezone.now(), last_timestamp=timezone.now()
+        )
+
+        import_prices(self.path, chunk_size=4, default_source='government')
+
+        self.assertTrue(DailyPriceAggregate.objects.filter(pk=untouched.pk).exists())
+        self.assertEqual(DailyPriceAggregate.objects.filter(vegetable__name='Tomato').count(), 6)
+        self.assertEqual(PriceEntry.objects.get(vegetable__name='Onion').location, '')
+
+    def test_copy_keeps_blank_locations_not_null(self):
+        cursor = mock.MagicMock()
+        with mock.patch('api.bulk_import.connection') as db:
+            db.ops.quote_name.side_effect = lambda name: f'"{name}"'
+            db.cursor.return_value.__enter__.return_value = cursor
+            _copy_insert([(1, 2, Decimal('40.00'), 'government', '', 5, timezone.now(), 'key')])
+
+        sql, buffer = cursor.cursor.copy_expert.call_args[0]
+        self.assertIn('FORCE_NOT_NULL (location, source)', sql)
+        self.assertIn(',government,,5,', buffer.getvalue())
+
+@override_settings(PRICE_SUBMISSION_MODE='buffered', PRICE_BUFFER_URL=None, PRICE_BUFFER_MAX_DEPTH=3)
+class BufferedSubmitPriceTestCase(CachedAPITestCase):
+    def setUp(self):
+        super().setUp()
+        submission_buffer._buffers.clear()
+        self.city = City.objects.create(name='Delhi', state='Delhi')
+
+    def submit(self, price='42.00'):
+        return self.client.post('/api/submit-price/', {
+            'vegetable_name': 'Tomato', 'city': self.city.id, 'price_per_kg': price,
+        }, format='json')
+
+    def test_submission_is_queued_then_flushed(self):
+        with self.assertNumQueries(0):
+            response = self.submit()
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data['pending'], 1)
+        self.submit('44.00')
+        self.assertFalse(PriceEntry.objects.exists())
+
+        result = flush_price_submissions()
+
+        self.assertEqual(result['count'], 2)
+        self.assertEqual(result['pending'], 0)
+        self.assertEqual(
+            sorted(PriceEntry.objects.values_list('price_per_kg', flat=True)),
+            [Decimal('42.00'), Decimal('44.00')]
+        )
+        self.assertEqual(DailyPriceAggregate.objects.get().count, 2)
+
+    def test_invalid_submission_is_rejected_up_front(self):
+        response = self.submit(price='-5')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(get_submission_buffer().depth(), 0)
+
+    def test_failing_submission_is_dead_lettered(self):
+        self.submit()
+        buffer = get_submission_buffer()
+        buffer.push({'vegetable': None, 'city': self.city.id, 'price_per_kg': 'n/a', 'timestamp': None})
+        self.submit('44.00')
+
+        result = flush_price_submissions()
+
+        self.assertEqual((result['count'], result['failed'], result['pending']), (2, 1, 0))
+        self.assertEqual(len(buffer.dead), 1)
+        self.assertEqual(PriceEntry.objects.count(), 2)
+
+    def test_flush_lock_is_released_only_by_its_holder(self):
+        buffer = get_submission_buffer()
+        token = buffer.acquire_flush_lock(timeout=300)
+        self.assertIsNone(buffer.acquire_flush_lock(timeout=300))
+        self.assertEqual(flush_price_submissions()['status'], 'skipped')
+
+        buffer.release_flush_lock('someone-else')
+        self.assertFalse(buffer.renew_flush_lock('someone-else', 300))
+        self.assertIsNone(buffer.acquire_flush_lock(timeout=300))
+
+        buffer.release_flush_lock(token)
+        self.assertIsNotNone(buffer.acquire_flush_lock(timeout=300))
+
+    def test_deep_queue_applies_backpressure(self):
+        for _ in range(3):
+            self.submit()
+
+        response = self.submit()
+
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertIn('Retry-After', response)
+
+
+def _fit_ok(vegetable_id, city_id, prices, models):
+    return {'arima': object() if len(prices) >= 30 else None, 'prophet': None}
+
+
+def _fit_all(vegetable_id, city_id, prices, models):
+    return {model_type: object() for model_type in models}
+
+
+def _fit_broken(vegetable_id, city_id, prices, models):
+    raise RuntimeError('singular matrix')
+
+
+def _fit_forever(vegetable_id, city_id, prices, models):
+    try:
+        time.sleep(5)
+    except Exception:
+        # Trainers catch Exception; a timeout must still get through
+        return None
+    return {'arima': object()}
+
+
+class TrainingOrchestratorTestCase(APITestCase):
+    def setUp(self):
+        self.tomato = Vegetable.objects.create(name='Tomato', category='tomato')
+        self.onion = Vegetable.objects.create(name='Onion', category='onion')
+        self.delhi = City.objects.create(name='Delhi', state='Delhi')
+        self.pune = City.objects.create(name='Pune', state='Maharashtra')
+        now = timezone.now()
+        PriceEntry.objects.bulk_create(
+            [
+                PriceEntry(vegetable=self.tomato, city=self.delhi, price_per_kg=Decimal('40.25') + i,
+                           source='government', timestamp=now - timedelta(days=i))
+                for i in range(30)
+            ]
+            + [
+                PriceEntry(vegetable=self.onion, city=city, price_per_kg=30, source='bigbasket', quality_rating=4,
+                           timestamp=now - timedelta(days=i))
+                for city in (self.delhi, self.pune) for i in range(29 if city == self.delhi else 31)
+            ]
+        )
+
+    def test_loads_every_series_in_one_query(self):
+        with self.assertNumQueries(1):
+            frame = load_price_frame()
+
+        self.assertEqual(len(frame), 90)
+        self.assertEqual(str(frame['price'].dtype), 'float32')
+        self.assertEqual(str(frame['source'].dtype), 'category')
+        self.assertEqual(str(frame['timestamp'].dtype), 'datetime64[ns, UTC]')
+
+        series = split_series(frame, min_rows=30)
+        self.assertEqual(set(series), {(self.tomato.id, self.delhi.id), (self.onion.id, self.pune.id)})
+        tomato = series[(self.tomato.id, self.delhi.id)]
+        self.assertTrue(tomato['timestamp'].is_monotonic_increasing)
+        self.assertAlmostEqual(float(tomato['price'].iloc[-1]), 40.25, places=4)
+
+        df = preprocess_price_data(tomato)
+        self.assertEqual(list(df.columns), ['date', 'price', 'source', 'quality'])
+        self.assertEqual(len(df), 30)
+
+    def test_daily_series_use_source_weighted_median_and_fill_gaps(self):
+        day = timezone.now().replace(hour=12) - timedelta(days=20)
+        PriceEntry.objects.bulk_create([
+            PriceEntry(vegetable=self.tomato, city=self.pune, price_per_kg=price, source=source,
+                       timestamp=day + timedelta(days=offset, minutes=minute))
+            for offset, minute, price, source in [
+                # Government counts double: median of 10, 20 (x2), 90 is 20
+                (0, 0, 10, 'bigbasket'), (0, 1, 20, 'government'), (0, 2, 90, 'jiomart'),
+                (1, 0, 30, 'blinkit'),
+                # 3-day gap: interpolated
+                (5, 0, 70, 'blinkit'),
+                # 12-day gap: last price carried
+                (18, 0, 50, 'blinkit'),
+            ]
+        ])
+
+        [prices] = split_series(load_price_frame([(self.tomato.id, self.pune.id)])).values()
+        daily = build_daily_series(prices)
+
+        self.assertEqual(len(daily), 19)
+        self.assertEqual(daily.index.freqstr, 'D')
+        self.assertEqual(list(daily.iloc[:6]), [20.0, 30.0, 40.0, 50.0, 60.0, 70.0])
+        self.assertEqual(list(daily.iloc[6:]), [70.0] * 12 + [50.0])
+
+    def test_daily_series_are_cached_until_new_prices_arrive(self):
+        cache.clear()
+        first = load_daily_series(min_rows=30)
+        self.assertEqual(set(first), {(self.tomato.id, self.delhi.id), (self.onion.id, self.pune.id)})
+        self.assertEqual(len(first[(self.tomato.id, self.delhi.id)]), 30)
+
+        with self.assertNumQueries(1):
+            again = load_daily_series(min_rows=30)
+        self.assertTrue(again[(self.tomato.id, self.delhi.id)].equals(first[(self.tomato.id, self.delhi.id)]))
+
+        PriceEntry.objects.create(vegetable=self.tomato, city=self.delhi, price_per_kg=99, source='government',
+                                  timestamp=timezone.now() + timedelta(days=1))
+        with self.assertNumQueries(2):
+            updated = load_daily_series(min_rows=30)
+        self.assertEqual(len(updated[(self.tomato.id, self.delhi.id)]), 31)
+        self.assertEqual(updated[(self.tomato.id, self.delhi.id)].iloc[-1], 99.0)
+
+    def test_replaced_price_invalidates_cached_daily_series(self):
+        cache.clear()
+        load_daily_series(min_rows=30)
+
+        # An upsert that changes the price but keeps the id and timestamp
+        latest = PriceEntry.objects.filter(vegetable=self.tomato, city=self.delhi).latest('timestamp')
+        PriceEntry.objects.filter(pk=latest.pk).update(price_per_kg=99)
+
+        updated = load_daily_series(min_rows=30)
+        self.assertEqual(updated[(self.tomato.id, self.delhi.id)].iloc[-1], 99.0)
+
+    def test_loads_only_requested_series(self):
+        frame = load_price_frame([(self.onion.id, self.pune.id), (self.tomato.id, self.delhi.id)])
+
+        self.assertEqual(len(frame), 61)
+        self.assertNotIn(self.delhi.id, set(frame[frame['vegetable_id'] == self.onion.id]['city_id']))
+
+    def test_trains_series_with_enough_data(self):
+        trained = []
+        run = train_many(trainer=_fit_ok, progress=trained.append)
+
+        self.assertEqual((run['series'], run['trained'], run['failed']), (2, 2, 0))
+        self.assertEqual(trained[0]['models'], ['arima'])
+
+    def test_failures_and_timeouts_are_isolated_per_series(self):
+        broken = train_series(3, 1, None, trainer=_fit_broken)
+        self.assertEqual((broken['status'], broken['error']), ('failed', 'singular matrix'))
+
+        started = time.perf_counter()
+        timed_out = train_series(4, 1, None, timeout=0.2, trainer=_fit_forever)
+        self.assertEqual(timed_out['status'], 'timeout')
+        self.assertLess(time.perf_counter() - started, 2)
+
+    def test_unchanged_series_are_skipped(self):
+        trained = []
+        with mock.patch('ml.orchestrator.model_path', return_value=mock.Mock(exists=lambda: True)):
+            first = train_many(trainer=_fit_all)
+            self.assertEqual((first['trained'], first['skipped']), (2, 0))
+            self.assertEqual(TrainingState.objects.count(), 4)
+
+            second = train_many(trainer=_fit_all, progress=trained.append)
+            self.assertEqual((second['trained'], second['skipped']), (0, 2))
+            self.assertEqual(trained, [])
+
+            PriceEntry.objects.create(vegetable=self.tomato, city=self.delhi, price_per_kg=45, source='government',
+                                      timestamp=timezone.now() + timedelta(days=1))
+            third = train_many(trainer=_fit_all, progress=trained.append)
+            self.assertEqual((third['trained'], third['skipped']), (1, 1))
+            self.assertEqual((trained[0]['vegetable_id'], trained[0]['models']), (self.tomato.id, ['arima', 'prophet']))
+            state = TrainingState.objects.get(vegetable=self.tomato, city=self.delhi, model_type='arima')
+            self.assertEqual(state.row_count, 31)
+
+            forced = train_many(trainer=_fit_all, force=True)
+            self.assertEqual((forced['trained'], forced['skipped']), (2, 0))
+
+    def test_failed_models_stay_stale(self):
+        with mock.patch('ml.orchestrator.model_path', return_value=mock.Mock(exists=lambda: True)):
+            train_many(trainer=_fit_ok)
+            self.assertEqual(set(TrainingState.objects.values_list('model_type', flat=True)), {'arima'})
+
+            # Prophet failed last time, so both series are retried for it only
+            retried = []
+            train_many(trainer=_fit_ok, progress=retried.append)
+            self.assertEqual(len(retried), 2)
+
+        # A lost model file means retraining
+        self.assertEqual(train_many(trainer=_fit_all)['skipped'], 0)
+
+    def test_falls_back_to_one_worker_on_in_memory_sqlite(self):
+        run = train_many(workers=4, trainer=_fit_ok)
+
+        self.assertEqual(run['workers'], 1)
+        self.assertEqual(run['trained'], 2)
+
+    def test_trains_in_forked_worker_processes(self):
+        # The stub trainer reads no database, so the forked copy suffices
+        shared_db = mock.Mock(vendor='sqlite', is_in_memory_db=lambda: False)
+        with mock.patch('ml.orchestrator.connection', shared_db):
+            run = train_many(workers=2, trainer=_fit_all)
+
+        self.assertEqual(run['workers'], 2)
+        self.assertEqual(run['trained'], 2)
+        self.assertEqual(TrainingState.objects.count(), 4)
+
+    def test_daemonic_process_trains_with_one_worker(self):
+        shared_db = mock.Mock(vendor='sqlite', is_in_memory_db=lambda: False)
+        with mock.patch('ml.orchestrator.connection', shared_db), \
+                mock.patch('ml.orchestrator.multiprocessing.current_process', return_value=mock.Mock(daemon=True)):
+            run = train_many(workers=4, trainer=_fit_ok)
+
+        self.assertEqual((run['workers'], run['trained']), (1, 2))
+
+    def test_celery_worker_fans_series_out_as_subtasks(self):
+        with mock.patch('api.tasks.multiprocessing.current_process', return_value=mock.Mock(daemon=True)), \
+                mock.patch('api.tasks.chord') as chord:
+            result = train_prediction_models(workers=4, timeout=60)
+
+        self.assertEqual((result['status'], result['queued'], result['skipped']), ('dispatched', 2, 0))
+        header = chord.call_args[0][0]
+        self.assertEqual(
+            sorted(tuple(subtask.args[:2]) for subtask in header),
+            sorted([(self.tomato.id, self.delhi.id), (self.onion.id, self.pune.id)])
+        )
+
+        summary = train_planned_series(self.tomato.id, self.delhi.id, ['arima', 'prophet'], trainer=_fit_all)
+        self.assertEqual(summary['models'], ['arima', 'prophet'])
+        self.assertEqual(TrainingState.objects.filter(vegetable=self.tomato).count(), 2)
+
+
+class _StubArimaResults:
+    """Just enough of statsmodels' ARIMAResults for incremental updates"""
+
+    def __init__(self, prices, error=1.0):
+        self.prices = prices
+        self.error = error
+        self.model = SimpleNamespace(data=SimpleNamespace(orig_endog=prices))
+        self.resid = pd.Series(error, index=prices.index)
+
+    def append(self, new, refit=False):
+        return _StubArimaResults(pd.concat([self.prices, new]).asfreq('D'), self.error)
+
+    def apply(self, prices, refit=False):
+        return _StubArimaResults(prices, self.error)
+
+
+class _StubArima:
+    """statsmodels' ARIMA, counting full fits"""
+    fits = 0
+
+    def __init__(self, endog, order):
+        self.endog = endog
+
+    def fit(self):
+        _StubArima.fits += 1
+        return _StubArimaResults(self.endog)
+
+
+class IncrementalArimaTestCase(SimpleTestCase):
+    def setUp(self):
+        self.prices = pd.Series(
+            np.linspace(40, 50, 40), index=pd.date_range('2024-01-01', periods=40, freq='D')
+        )
+        self.meta = {'order': [1, 1, 1], 'fitted_through': '2024-02-05', 'rmse': 1.0}
+
+    def test_new_observations_continue_the_fitted_series(self):
+        fitted = self.prices.iloc[:36]
+
+        self.assertEqual(list(new_observations(fitted, self.prices).index), list(self.prices.index[36:]))
+        self.assertTrue(new_observations(self.prices, self.prices).empty)
+
+        revised = self.prices.copy()
+        revised.iloc[10] += 5
+        self.assertIsNone(new_observations(fitted, revised))
+        self.assertIsNone(new_observations(fitted, self.prices.iloc[1:].asfreq('D')))
+        self.assertIsNone(new_observations(fitted, self.prices.reset_index(drop=True)))
+
+    def test_full_refit_schedule(self):
+        self.assertIsNone(needs_full_refit(self.meta, self.prices, refit_days=7))
+        self.assertIn('4 days', needs_full_refit(self.meta, self.prices, refit_days=4))
+        self.assertIsNotNone(needs_full_refit(None, self.prices, refit_days=7))
+        self.assertIsNotNone(needs_full_refit({**self.meta, 'order': [2, 1, 1]}, self.prices, refit_days=7))
+
+    def test_updates_with_fitted_parameters(self):
+        previous = _StubArimaResults(self.prices.iloc[:36])
+
+        updated, how = _update_arima_model(previous, self.prices, self.meta, 7, 1.5)
+        self.assertEqual(how, 'appended 4 days')
+        self.assertEqual(len(updated.prices), 40)
+
+        revised = self.prices.copy()
+        revised.iloc[10] += 5
+        updated, how = _update_arima_model(previous, revised, self.meta, 7, 1.5)
+        self.assertEqual(how, 'refiltered')
+
+        same, how = _update_arima_model(previous, self.prices.iloc[:36], self.meta, 7, 1.5)
+        self.assertIs(same, previous)
+
+    def test_degraded_residuals_force_a_refit(self):
+        previous = _StubArimaResults(self.prices.iloc[:36], error=2.0)
+
+        updated, reason = _update_arima_model(previous, self.prices, self.meta, 7, 1.5)
+        self.assertIsNone(updated)
+        self.assertIn('residual RMSE 2.00 over 4 days', reason)
+
+        updated, reason = _update_arima_model(previous, self.prices, self.meta, 7, 3.0)
+        self.assertIsNotNone(updated)
+
+    def test_unreadable_model_is_refitted(self):
+        statsmodels = SimpleNamespace(tsa=None)
+        fake_modules = {
+            'statsmodels': statsmodels, 'statsmodels.tsa': statsmodels, 'statsmodels.tsa.arima': statsmodels,
+            'statsmodels.tsa.arima.model': SimpleNamespace(ARIMA=_StubArima),
+        }
+        _StubArima.fits = 0
+        with tempfile.TemporaryDirectory() as directory, \
+                mock.patch.dict('sys.modules', fake_modules), \
+                mock.patch('ml.train_model.MODEL_DIR', Path(directory)):
+            self.assertIsNotNone(train_arima_model(self.prices.iloc[:36], 'Tomato', 'Delhi', refit_days=7))
+            updated = train_arima_model(self.prices, 'Tomato', 'Delhi', refit_days=7)
+            self.assertEqual((_StubArima.fits, len(updated.prices)), (1, 40))
+
+            # A truncated pickle, e.g. from an interrupted save
+            path = Path(directory) / 'arima_Tomato_Delhi.pkl'
+            path.write_bytes(path.read_bytes()[:20])
+            self.assertIsNotNone(train_arima_model(self.prices, 'Tomato', 'Delhi', refit_days=7))
+            self.assertEqual(_StubArima.fits, 2)
+
+            # A record left from another version of the pickle
+            meta = json.loads(arima_meta_path('Tomato', 'Delhi').read_text())
+            arima_meta_path('Tomato', 'Delhi').write_text(json.dumps({**meta, 'model_digest': 'stale'}))
+            train_arima_model(self.prices, 'Tomato', 'Delhi', refit_days=7)
+            self.assertEqual(_StubArima.fits, 3)
+            self.assertEqual(sorted(p.name for p in Path(directory).iterdir()), ['arima_Tomato_Delhi.json', 'arima_Tomato_Delhi.pkl'])
@@ -2,12 +2,28 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.views import APIView
+from rest_framework.parsers import JSONParser, MultiPartParser
+from django.conf import settings
+from django.db import transaction
 from django.db.models import Avg, Min, Max, Q
 from django.utils import timezone
 from datetime import datetime, timedelta
 from decimal import Decimal
 
-from .models import City, Vegetable, PriceEntry, Prediction
+from .models import City, Vegetable, PriceEntry, Prediction, DailyPriceAggregate
+from .rollups import update_daily_aggregates
+from .caching import cached_response, conditional_response, bump_data_version
+from .ingest import resolve_vegetables, store_price_submissions
+from .parsers import CSVParser, read_csv_rows
+from .submission_buffer import get_submission_buffer
+from .queries import (
+    latest_prices_for_city,
+    predictions_for_city,
+    calculate_price_change,
+    month_period,
+    price_insights_for_city,
+    calculate_trend,
+)
 from .serializers import (
     CitySerializer,
     VegetableSerializer,
@@ -18,10 +34,12 @@ from .serializers import (
     PredictionDataSerializer,
     InsightSerializer,
     SavingsSummarySerializer,
+    PriceSubmissionSerializer,
 )
 import os
 from rest_framework.permissions import IsAdminUser
 from api.tasks import fetch_and_store_prices
+from recommendation.score_model import score_engine
 from .serializers import PriceEntrySerializer
 
 
@@ -74,10 +92,80 @@ class PredictionViewSet(viewsets.ReadOnlyModelViewSet):
         return queryset
 
 
+# ========== RESPONSE BUILDERS ==========
+def build_current_prices(city, latest):
+    """Build the current-prices payload from a latest-price snapshot"""
+    latest_prices = []
+    for entry in latest:
+        latest_prices.append({
+            'vegetable_name': entry.vegetable.name,
+            'price_per_kg': float(entry.price_per_kg),
+            'source': entry.get_source_display(),
+            'city': city.name,
+            'timestamp': entry.timestamp,
+            'price_change': calculate_price_change(entry.price_per_kg, entry.previous_price),
+            'quality_rating': entry.quality_rating
+        })
+    return latest_prices
+
+
+def build_recommendations(latest, predictions, month):
+    """
+    Build the recommendation payload from a latest-price snapshot and
+    next-day predictions keyed by vegetable id, scored in one batch
+    """
+    items = [
+        (entry, predictions[entry.vegetable_id])
+        for entry in latest
+        if entry.vegetable_id in predictions
+    ]
+
+    scored = score_engine.generate_recommendations(
+        current_prices=[float(entry.price_per_kg) for entry, _ in items],
+        predicted_prices=[float(prediction.predicted_price) for _, prediction in items],
+        trends=[
+            min(1, max(-1, calculate_price_change(entry.price_per_kg, entry.previous_price) / 100))
+            for entry, _ in items
+        ],
+        confidences=[prediction.confidence for _, prediction in items],
+        vegetable_names=[entry.vegetable.name for entry, _ in items],
+        month=month
+    )
+
+    recommendations = []
+    for (entry, prediction), result in zip(items, scored):
+        recommendations.append({
+            'vegetable_name': entry.vegetable.name,
+            'current_price': float(entry.price_per_kg),
+            'predicted_price': float(prediction.predicted_price),
+            'action': result['action'],
+            'reason': result['reason'],
+            'potential_savings': result['potential_savings'],
+            'confidence': prediction.confidence
+        })
+    return recommendations
+
+
+def build_insights(rows):
+    """Build the insights payload from grouped per-vegetable stats"""
+    insights = []
+    for stats in rows:
+        insights.append({
+            'item_name': stats['vegetable__name'],
+            'avg_price': float(stats['avg_price'] or 0),
+            'min_price': float(stats['min_price'] or 0),
+            'max_price': float(stats['max_price'] or 0),
+            'trend': calculate_trend(stats['first_avg'], stats['second_avg'])
+        })
+    return insights
+
+
 # ========== CUSTOM API VIEWS ==========
 class CurrentPricesView(APIView):
     """Get current prices for a city"""
 
+    @conditional_response('current-prices')
+    @cached_response('current-prices')
     def get(self, request):
         city_name = request.query_params.get('city')
 
@@ -95,41 +183,8 @@ class CurrentPricesView(APIView):
                 status=status.HTTP_404_NOT_FOUND
             )
 
-        # Get latest prices for each vegetable
-        latest_prices = []
-        vegetables = Vegetable.objects.all()
-
-        for vegetable in vegetables:
-            # Get latest price entries from different sources
-            latest = PriceEntry.objects.filter(
-                vegetable=vegetable,
-                city=city
-            ).order_by('-timestamp')[:1]
-
-            if latest.exists():
-                entry = latest[0]
-                # Get previous price for comparison
-                previous = PriceEntry.objects.filter(
-                    vegetable=vegetable,
-                    city=city,
-                    timestamp__lt=entry.timestamp
-                ).order_by('-timestamp')[:1]
-
-                price_change = 0
-                if previous.exists():
-                    prev_price = float(previous[0].price_per_kg)
-                    curr_price = float(entry.price_per_kg)
-                    price_change = ((curr_price - prev_price) / prev_price * 100) if prev_price != 0 else 0
-
-                latest_prices.append({
-                    'vegetable_name': vegetable.name,
-                    'price_per_kg': float(entry.price_per_kg),
-                    'source': entry.get_source_display(),
-                    'city': city.name,
-                    'timestamp': entry.timestamp,
-                    'price_change': price_change,
-                    'quality_rating': entry.quality_rating
-                })
+        # Get latest price (and the one before it) for every vegetable at once
+        latest_prices = build_current_prices(city, latest_prices_for_city(city))
 
         return Response(latest_prices)
 
@@ -137,6 +192,8 @@ class CurrentPricesView(APIView):
 class ComparisonView(APIView):
     """Compare prices of a vegetable across sources"""
 
+    @conditional_response('comparison')
+    @cached_response('comparison')
     def get(self, request):
         city_name = request.query_params.get('city')
         vegetable_name = request.query_params.get('item')
@@ -144,6 +201,7 @@ class ComparisonView(APIView):
         start_date = request.query_params.get('start_date')
         end_date = request.query_params.get('end_date')
         sort = request.query_params.get('sort')  # 'price_asc' or 'price_desc'
+        granularity = request.query_params.get('granularity')  # 'daily' for OHLC rollups
 
         if not city_name or not vegetable_name:
             return Response(
@@ -156,47 +214,67 @@ class ComparisonView(APIView):
         except Vegetable.DoesNotExist:
             return Response({'error': 'Vegetable not found'}, status=status.HTTP_404_NOT_FOUND)
 
-        # Build base queryset
-        queryset = PriceEntry.objects.filter(vegetable=vegetable)
+        # Build base filters
+        filters = {'vegetable': vegetable}
 
         # Filter by city or state if provided
         if city_name:
-            queryset = queryset.filter(city__name=city_name)
+            filters['city__name'] = city_name
         elif state_name:
-            queryset = queryset.filter(city__state=state_name)
+            filters['city__state'] = state_name
 
         # Date range filtering
+        date_range = {}
         try:
             if start_date:
-                from datetime import datetime
                 sd = datetime.strptime(start_date, '%Y-%m-%d')
-                queryset = queryset.filter(timestamp__date__gte=sd.date())
+                date_range['gte'] = sd.date()
             if end_date:
-                from datetime import datetime
                 ed = datetime.strptime(end_date, '%Y-%m-%d')
-                queryset = queryset.filter(timestamp__date__lte=ed.date())
+                date_range['lte'] = ed.date()
         except Exception:
             return Response({'error': 'Invalid date format. Use YYYY-MM-DD'}, status=status.HTTP_400_BAD_REQUEST)
 
         # Default to last 7 days if no dates provided
         if not start_date and not end_date:
-            from django.utils import timezone
-            from datetime import timedelta
             end = timezone.now().date()
-            start = end - timedelta(days=7)
-            queryset = queryset.filter(timestamp__date__range=[start, end])
+            date_range = {'gte': end - timedelta(days=7), 'lte': end}
 
-        # Convert queryset to list of dicts
         comparison_data = []
-        for entry in queryset.order_by('source', '-timestamp'):
-            comparison_data.append({
-                'date': entry.timestamp.date().isoformat(),
-                'source': entry.get_source_display(),
-                'price': float(entry.price_per_kg),
-                'city': entry.city.name,
-                'location': entry.location,
-                'quality_rating': entry.quality_rating,
-            })
+        if granularity == 'daily':
+            # One OHLC rollup row per source and day instead of every raw entry
+            queryset = DailyPriceAggregate.objects.filter(
+                **filters, **{f'date__{lookup}': value for lookup, value in date_range.items()}
+            ).select_related('city')
+
+            for aggregate in queryset.order_by('source', '-date'):
+                comparison_data.append({
+                    'date': aggregate.date.isoformat(),
+                    'source': aggregate.get_source_display(),
+                    'price': float(aggregate.close_price),
+                    'open': float(aggregate.open_price),
+                    'high': float(aggregate.high_price),
+                    'low': float(aggregate.low_price),
+                    'close': float(aggregate.close_price),
+                    'mean': float(aggregate.mean_price),
+                    'count': aggregate.count,
+                    'city': aggregate.city.name,
+                })
+        else:
+            queryset = PriceEntry.objects.filter(
+                **filters, **{f'timestamp__date__{lookup}': value for lookup, value in date_range.items()}
+            ).select_related('city')
+
+            # Convert queryset to list of dicts
+            for entry in queryset.order_by('source', '-timestamp'):
+                comparison_data.append({
+                    'date': entry.timestamp.date().isoformat(),
+                    'source': entry.get_source_display(),
+                    'price': float(entry.price_per_kg),
+                    'city': entry.city.name,
+                    'location': entry.location,
+                    'quality_rating': entry.quality_rating,
+                })
 
         # Optional sorting
         if sort == 'price_asc':
@@ -210,6 +288,8 @@ class ComparisonView(APIView):
 class PredictionDetailView(APIView):
     """Get price predictions for a vegetable"""
 
+    @conditional_response('prediction')
+    @cached_response('prediction')
     def get(self, request):
         city_name = request.query_params.get('city')
         vegetable_name = request.query_params.get('item')
@@ -257,6 +337,8 @@ class PredictionDetailView(APIView):
 class RecommendationView(APIView):
     """Generate buy/wait recommendations"""
 
+    @conditional_response('recommendation')
+    @cached_response('recommendation')
     def get(self, request):
         city_name = request.query_params.get('city')
 
@@ -274,52 +356,13 @@ class RecommendationView(APIView):
                 status=status.HTTP_404_NOT_FOUND
             )
 
-        recommendations = []
-        vegetables = Vegetable.objects.all()
-
-        for vegetable in vegetables:
-            # Get current price
-            current = PriceEntry.objects.filter(
-                vegetable=vegetable,
-                city=city
-            ).order_by('-timestamp')[:1]
-
-            if not current.exists():
-                continue
-
-            curr_price = float(current[0].price_per_kg)
-
-            # Get prediction for next day
-            tomorrow = timezone.now().date() + timedelta(days=1)
-            prediction = Prediction.objects.filter(
-                vegetable=vegetable,
-                city=city,
-                prediction_date=tomorrow
-            ).first()
-
-            if not prediction:
-                continue
-
-            pred_price = float(prediction.predicted_price)
-            potential_savings = curr_price - pred_price
-
-            # Determine action
-            if pred_price < curr_price * 0.95:  # More than 5% drop expected
-                action = 'Wait'
-                reason = f'Price expected to drop to ₹{pred_price:.2f} tomorrow'
-            else:
-                action = 'Buy Now'
-                reason = f'Price likely to increase or stay stable'
-
-            recommendations.append({
-                'vegetable_name': vegetable.name,
-                'current_price': curr_price,
-                'predicted_price': pred_price,
-                'action': action,
-                'reason': reason,
-                'potential_savings': max(0, potential_savings),
-                'confidence': prediction.confidence
-            })
+        # Load current prices and tomorrow's predictions in two queries
+        tomorrow = timezone.now().date() + timedelta(days=1)
+        recommendations = build_recommendations(
+            latest_prices_for_city(city),
+            predictions_for_city(city, tomorrow),
+            tomorrow.month
+        )
 
         return Response(recommendations)
 
@@ -327,9 +370,12 @@ class RecommendationView(APIView):
 class InsightsView(APIView):
     """Get market insights for a month"""
 
+    @conditional_response('insights')
+    @cached_response('insights')
     def get(self, request):
         city_name = request.query_params.get('city')
-        month_name = request.query_params.get('month', 'January')
+        month_name = request.query_params.get('month')
+        year = request.query_params.get('year')
 
         if not city_name:
             return Response(
@@ -337,6 +383,14 @@ class InsightsView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
+        try:
+            month_start, month_end = month_period(month_name or timezone.localdate().month, year)
+        except ValueError:
+            return Response(
+                {'error': 'Invalid month or year'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
         try:
             city = City.objects.get(name=city_name)
         except City.DoesNotExist:
@@ -345,51 +399,61 @@ class InsightsView(APIView):
                 status=status.HTTP_404_NOT_FOUND
             )
 
-        # Parse month (for demonstration, using current month)
-        now = timezone.now()
-        month_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        month_end = (month_start + timedelta(days=32)).replace(day=1) - timedelta(seconds=1)
+        insights = build_insights(price_insights_for_city(city, month_start, month_end))
 
-        insights = []
-        vegetables = Vegetable.objects.all()
+        return Response(insights)
 
-        for vegetable in vegetables:
-            prices = PriceEntry.objects.filter(
-                vegetable=vegetable,
-                city=city,
-                timestamp__range=[month_start, month_end]
-            )
 
-            if prices.count() == 0:
-                continue
+class DashboardView(APIView):
+    """Get current prices, recommendations and insights for a city in one request"""
+
+    @conditional_response('dashboard')
+    @cached_response('dashboard')
+    def get(self, request):
+        city_name = request.query_params.get('city')
+        month_name = request.query_params.get('month')
+        year = request.query_params.get('year')
+
+        if not city_name:
+            return Response(
+                {'error': 'City parameter is required'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
 
-            stats = prices.aggregate(
-                avg_price=Avg('price_per_kg'),
-                min_price=Min('price_per_kg'),
-                max_price=Max('price_per_kg')
+        try:
+            month_start, month_end = month_period(month_name or timezone.localdate().month, year)
+        except ValueError:
+            return Response(
+                {'error': 'Invalid month or year'},
+                status=status.HTTP_400_BAD_REQUEST
             )
 
-            # Calculate trend
-            first_half = prices[:prices.count() // 2]
-            second_half = prices[prices.count() // 2:]
+        try:
+            city = City.objects.get(name=city_name)
+        except City.DoesNotExist:
+            return Response(
+                {'error': f'City {city_name} not found'},
+                status=status.HTTP_404_NOT_FOUND
+            )
 
-            first_avg = float(first_half.aggregate(Avg('price_per_kg'))['price_per_kg__avg'] or 0)
-            second_avg = float(second_half.aggregate(Avg('price_per_kg'))['price_per_kg__avg'] or 0)
+        # One shared snapshot of latest prices and predictions feeds every section
+        tomorrow = timezone.now().date() + timedelta(days=1)
+        latest = latest_prices_for_city(city)
+        predictions = predictions_for_city(city, tomorrow)
 
-            if first_avg == 0:
-                trend = 0
-            else:
-                trend = (second_avg - first_avg) / first_avg
-
-            insights.append({
-                'item_name': vegetable.name,
-                'avg_price': float(stats['avg_price'] or 0),
-                'min_price': float(stats['min_price'] or 0),
-                'max_price': float(stats['max_price'] or 0),
-                'trend': min(1, max(-1, trend))  # Normalize to -1 to 1
-            })
+        recommendations = build_recommendations(latest, predictions, tomorrow.month)
+        waits = [rec for rec in recommendations if rec['action'] == 'Wait']
 
-        return Response(insights)
+        return Response({
+            'city': city.name,
+            'current_prices': build_current_prices(city, latest),
+            'recommendations': recommendations,
+            'insights': build_insights(price_insights_for_city(city, month_start, month_end)),
+            'savings': {
+                'total_savings': sum(rec['potential_savings'] for rec in waits),
+                'items_saved': len(waits),
+            },
+        })
 
 
 class FetchNowView(APIView):
@@ -423,9 +487,15 @@ class SubmitPriceView(APIView):
     Accepts JSON with either `vegetable` (id) or `vegetable_name`, and `city` (id) or `city_name`.
     Required: price_per_kg
     Optional: source, location, quality_rating, timestamp
+
+    With PRICE_SUBMISSION_MODE = 'buffered' the entry is validated, queued
+    and acknowledged with 202; flush_price_submissions stores it later.
     """
 
     def post(self, request):
+        if settings.PRICE_SUBMISSION_MODE == 'buffered':
+            return self.buffer_submission(request)
+
         data = request.data or {}
 
         veg_id = data.get('vegetable')
@@ -446,7 +516,7 @@ class SubmitPriceView(APIView):
         else:
             if not veg_name:
                 return Response({'error': 'vegetable or vegetable_name required'}, status=status.HTTP_400_BAD_REQUEST)
-            vegetable, _ = Vegetable.objects.get_or_create(name=veg_name, defaults={'category': 'other'})
+            vegetable = resolve_vegetables(names=[veg_name])[0][veg_name]
 
         # Resolve or create city
         if city_id:
@@ -459,17 +529,97 @@ class SubmitPriceView(APIView):
                 return Response({'error': 'city or city_name required'}, status=status.HTTP_400_BAD_REQUEST)
             city, _ = City.objects.get_or_create(name=city_name, defaults={'state': ''})
 
-        # Create price entry
+        # Create price entry and fold it into the daily rollup
         try:
-            price_entry = PriceEntry.objects.create(
-                vegetable=vegetable,
-                city=city,
-                price_per_kg=price,
-                source=data.get('source', 'local'),
-                location=data.get('location', ''),
-                quality_rating=data.get('quality_rating', 3)
-            )
+            with transaction.atomic():
+                price_entry = PriceEntry.objects.create(
+                    vegetable=vegetable,
+                    city=city,
+                    price_per_kg=price,
+                    source=data.get('source', 'local'),
+                    location=data.get('location', ''),
+                    quality_rating=data.get('quality_rating', 3)
+                )
+                update_daily_aggregates([price_entry])
+            bump_data_version(city.name)
             serializer = PriceEntrySerializer(price_entry)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         except Exception as e:
             return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+    def buffer_submission(self, request):
+        serializer = PriceSubmissionSerializer(data=request.data or {})
+        if not serializer.is_valid():
+            return Response({'error': serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
+
+        buffer = get_submission_buffer()
+        if buffer.depth() >= settings.PRICE_BUFFER_MAX_DEPTH:
+            response = Response(
+                {'error': 'Too many pending submissions, retry later'},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
+            response['Retry-After'] = str(settings.PRICE_BUFFER_FLUSH_INTERVAL)
+            return response
+
+        pending = buffer.push({
+            **serializer.validated_data,
+            'price_per_kg': str(serializer.validated_data['price_per_kg']),
+            'timestamp': timezone.now().isoformat(),
+        })
+        return Response({'status': 'accepted', 'pending': pending}, status=status.HTTP_202_ACCEPTED)
+
+
+class BulkSubmitPriceView(APIView):
+    """Allow field agents to submit many price entries in one POST.
+
+    Accepts a JSON array of entries (or {"entries": [...]}), a text/csv body,
+    or a multipart upload with a CSV `file`. Each entry takes the same fields
+    as SubmitPriceView. Valid rows are inserted in one transaction; invalid
+    rows are reported by index without failing the batch.
+    """
+    parser_classes = [JSONParser, CSVParser, MultiPartParser]
+
+    def post(self, request):
+        if 'file' in request.FILES:
+            try:
+                rows = read_csv_rows(request.FILES['file'].read().decode('utf-8'))
+            except UnicodeDecodeError:
+                return Response({'error': 'CSV file must be UTF-8 encoded'}, status=status.HTTP_400_BAD_REQUEST)
+        elif isinstance(request.data, dict):
+            rows = request.data.get('entries')
+        else:
+            rows = request.data
+
+        if not isinstance(rows, list) or not rows:
+            return Response({'error': 'A non-empty list of entries is required'}, status=status.HTTP_400_BAD_REQUEST)
+
+        if len(rows) > settings.BULK_SUBMIT_MAX_ROWS:
+            return Response(
+                {'error': f'At most {settings.BULK_SUBMIT_MAX_ROWS} entries per request'},
+                status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+            )
+
+        # Validate every row before touching the database
+        errors = []
+        valid = []
+        for index, row in enumerate(rows):
+            serializer = PriceSubmissionSerializer(data=row if isinstance(row, dict) else {})
+            if serializer.is_valid():
+                valid.append((index, serializer.validated_data))
+            else:
+                errors.append({'row': index, 'errors': serializer.errors})
+
+        try:
+            entries, missing = store_price_submissions([row for _, row in valid])
+        except Exception as e:
+            return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        for position in missing:
+            errors.append({'row': valid[position][0], 'errors': {'non_field_errors': ['Vegetable or city id not found']}})
+
+        errors.sort(key=lambda error: error['row'])
+        return Response(
+            {'created': len(entries), 'failed': len(errors), 'errors': errors},
+            status=status.HTTP_201_CREATED if entries else status.HTTP_400_BAD_REQUEST
+        )
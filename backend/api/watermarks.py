@@ -0,0 +1,76 @@
+import logging
+import threading
+
+from django.utils import timezone
+
+from .models import SourceWatermark
+
+logger = logging.getLogger(__name__)
+
+
+class WatermarkStore:
+    """
+    SourceWatermark rows for one fetch run, loaded in one query.
+
+    Fetchers read validators with get() and record new ones with stage()
+    (safe from the runner's worker threads). commit() persists staged
+    watermarks in one upsert; call it only after the fetched rows were
+    stored so a failed ingest never advances a watermark.
+    With load=False existing watermarks are ignored and every source is
+    fetched in full.
+    """
+
+    def __init__(self, load=True):
+        self._current = {}
+        if load:
+            self._current = {(w.source, w.endpoint): w for w in SourceWatermark.objects.all()}
+        self._staged = {}
+        self._lock = threading.Lock()
+
+    def get(self, source, endpoint=''):
+        """
+        Get {'etag', 'last_modified', 'since'} for a source endpoint;
+        empty values when it was never fetched successfully
+        """
+        watermark = self._current.get((source, endpoint))
+        if watermark is None:
+            return {'etag': '', 'last_modified': '', 'since': None}
+        return {
+            'etag': watermark.etag,
+            'last_modified': watermark.last_modified,
+            'since': watermark.last_success_at,
+        }
+
+    def stage(self, source, endpoint='', etag=None, last_modified=None, fetched_at=None):
+        """
+        Record a successful fetch. Validators left as None keep their
+        previous values (e.g. after a 304 without headers).
+        """
+        previous = self.get(source, endpoint)
+        with self._lock:
+            self._staged[(source, endpoint)] = SourceWatermark(
+                source=source,
+                endpoint=endpoint,
+                last_success_at=fetched_at or timezone.now(),
+                etag=previous['etag'] if etag is None else etag,
+                last_modified=previous['last_modified'] if last_modified is None else last_modified,
+                updated_at=timezone.now(),
+            )
+
+    def commit(self):
+        """Persist staged watermarks; returns how many were written"""
+        with self._lock:
+            staged = list(self._staged.values())
+            self._staged = {}
+
+        SourceWatermark.objects.bulk_create(
+            staged,
+            update_conflicts=True,
+            unique_fields=['source', 'endpoint'],
+            update_fields=['last_success_at', 'etag', 'last_modified', 'updated_at'],
+        )
+        for watermark in staged:
+            self._current[(watermark.source, watermark.endpoint)] = watermark
+
+        logger.info(f"Committed {len(staged)} source watermarks")
+        return len(staged)
@@ -1,6 +1,7 @@
 import os
 from pathlib import Path
 from dotenv import load_dotenv
+from django.core.exceptions import ImproperlyConfigured
 
 load_dotenv()
 
@@ -66,6 +67,28 @@ DATABASES = {
     }
 }
 
+# ========== CACHE ==========
+# Redis in production (set REDIS_URL), local memory otherwise and in tests
+REDIS_URL = os.getenv('REDIS_URL')
+
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Read endpoints are invalidated by data-version bumps; the timeout only
+# bounds staleness for writes that bypass the writers (e.g. the admin)
+API_RESPONSE_CACHE_TIMEOUT = int(os.getenv('API_RESPONSE_CACHE_TIMEOUT', 3600))
+
 # ========== PASSWORD VALIDATION ==========
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -108,6 +131,20 @@ REST_FRAMEWORK = {
     'PAGE_SIZE': 100,
 }
 
+# Largest batch accepted by the bulk price submission endpoint
+BULK_SUBMIT_MAX_ROWS = int(os.getenv('BULK_SUBMIT_MAX_ROWS', 5000))
+
+# 'sync' stores each submitted price in the request; 'buffered' queues it
+# (answering 202) for the flush_price_submissions task to store in batches
+PRICE_SUBMISSION_MODE = os.getenv('PRICE_SUBMISSION_MODE', 'sync')
+PRICE_BUFFER_URL = os.getenv('PRICE_BUFFER_URL', REDIS_URL)  # Unset: in-process queue
+PRICE_BUFFER_MAX_DEPTH = int(os.getenv('PRICE_BUFFER_MAX_DEPTH', 50000))  # Above this, 503
+PRICE_BUFFER_FLUSH_BATCH = int(os.getenv('PRICE_BUFFER_FLUSH_BATCH', 1000))
+PRICE_BUFFER_FLUSH_INTERVAL = int(os.getenv('PRICE_BUFFER_FLUSH_INTERVAL', 10))  # Seconds
+if PRICE_SUBMISSION_MODE == 'buffered' and not PRICE_BUFFER_URL:
+    # The in-process queue is not shared with the Celery worker that flushes it
+    raise ImproperlyConfigured("PRICE_SUBMISSION_MODE='buffered' needs PRICE_BUFFER_URL or REDIS_URL")
+
 # ========== CORS CONFIGURATION ==========
 CORS_ALLOWED_ORIGINS = [
     'http://localhost:3000',
@@ -126,9 +163,55 @@ CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = 'UTC'
 
+# Per-source deadline (seconds) for the concurrent price fetch; sources
+# listed in SCRAPER_SOURCE_TIMEOUTS override the default
+SCRAPER_SOURCE_TIMEOUT = float(os.getenv('SCRAPER_SOURCE_TIMEOUT', 15))
+SCRAPER_SOURCE_TIMEOUTS = {}
+
+# Source health: a source whose last WINDOW calls fail at this rate (after
+# at least MIN_CALLS), or whose last CONSECUTIVE_FAILURES calls all failed,
+# is skipped for COOLDOWN seconds, doubling up to MAX_COOLDOWN while its
+# probes keep failing; calls slower than TARGET_LATENCY seconds shrink its
+# request concurrency. The fetch runs daily, so the default cooldown (25h)
+# skips the next run and the ceiling (7 days) skips up to a week of runs.
+SCRAPER_CIRCUIT_WINDOW = int(os.getenv('SCRAPER_CIRCUIT_WINDOW', 6))
+SCRAPER_CIRCUIT_FAILURE_RATE = float(os.getenv('SCRAPER_CIRCUIT_FAILURE_RATE', 0.5))
+SCRAPER_CIRCUIT_MIN_CALLS = int(os.getenv('SCRAPER_CIRCUIT_MIN_CALLS', 3))
+SCRAPER_CIRCUIT_CONSECUTIVE_FAILURES = int(os.getenv('SCRAPER_CIRCUIT_CONSECUTIVE_FAILURES', 3))
+SCRAPER_CIRCUIT_COOLDOWN = float(os.getenv('SCRAPER_CIRCUIT_COOLDOWN', 90000))
+SCRAPER_CIRCUIT_MAX_COOLDOWN = float(os.getenv('SCRAPER_CIRCUIT_MAX_COOLDOWN', 604800))
+SCRAPER_TARGET_LATENCY = float(os.getenv('SCRAPER_TARGET_LATENCY', 2))
+
+# Directory where raw scraper responses are archived for offline replay
+# (manage.py replay_archive); empty disables archiving
+SCRAPER_ARCHIVE_DIR = os.getenv('SCRAPER_ARCHIVE_DIR', '')
+
+# Full Agmarknet harvest: every commodity x state x district, paginated,
+# under a global request rate limit (requests per second)
+AGMARKNET_API_URL = os.getenv('AGMARKNET_API_URL', 'https://api.agmarknet.gov.in/api/datapoints')
+AGMARKNET_RATE_LIMIT = float(os.getenv('AGMARKNET_RATE_LIMIT', 5))
+AGMARKNET_CONCURRENCY = int(os.getenv('AGMARKNET_CONCURRENCY', 4))
+AGMARKNET_PAGE_SIZE = int(os.getenv('AGMARKNET_PAGE_SIZE', 500))
+AGMARKNET_COMMODITY_IDS = [c for c in os.getenv('AGMARKNET_COMMODITY_IDS', '1').split(',') if c]
+AGMARKNET_STATE_DISTRICTS = {
+    'DL': ['D1'],
+}
+
 # ========== CELERY BEAT SCHEDULE ==========
 from celery.schedules import crontab
 
+# Nightly model training: series are fitted by this many worker
+# processes, each series limited to TRAINING_SERIES_TIMEOUT seconds
+TRAINING_WORKERS = int(os.getenv('TRAINING_WORKERS', os.cpu_count() or 1))
+TRAINING_SERIES_TIMEOUT = float(os.getenv('TRAINING_SERIES_TIMEOUT', 600))
+
+# ARIMA models are updated with each night's new days using their fitted
+# parameters, and refitted from scratch every ARIMA_FULL_REFIT_DAYS days
+# (0: always) or when their one-step error grows past
+# ARIMA_MAX_RESIDUAL_RATIO times that of the last full fit
+ARIMA_FULL_REFIT_DAYS = int(os.getenv('ARIMA_FULL_REFIT_DAYS', 7))
+ARIMA_MAX_RESIDUAL_RATIO = float(os.getenv('ARIMA_MAX_RESIDUAL_RATIO', 1.5))
+
 CELERY_BEAT_SCHEDULE = {
     'fetch-data-daily': {
         'task': 'api.tasks.fetch_and_store_prices',
@@ -142,6 +225,10 @@ CELERY_BEAT_SCHEDULE = {
         'task': 'api.tasks.generate_predictions',
         'schedule': crontab(hour=2, minute=0),  # Daily at 2 AM
     },
+    'flush-price-submissions': {
+        'task': 'api.tasks.flush_price_submissions',
+        'schedule': PRICE_BUFFER_FLUSH_INTERVAL,
+    },
 }
 
 # ========== LOGGING ==========
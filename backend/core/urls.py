@@ -21,6 +21,8 @@ urlpatterns = [
     path('api/prediction/', views.PredictionDetailView.as_view(), name='prediction-detail'),
     path('api/recommendation/', views.RecommendationView.as_view(), name='recommendation'),
     path('api/insights/', views.InsightsView.as_view(), name='insights'),
+    path('api/dashboard/', views.DashboardView.as_view(), name='dashboard'),
     path('api/fetch-now/', views.FetchNowView.as_view(), name='fetch-now'),
     path('api/submit-price/', views.SubmitPriceView.as_view(), name='submit-price'),
+    path('api/submit-price/bulk/', views.BulkSubmitPriceView.as_view(), name='submit-price-bulk'),
 ]
@@ -12,6 +12,7 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
 django.setup()
 
 from api.models import City, Vegetable, PriceEntry
+from api.rollups import rebuild_daily_aggregates
 
 def populate_price_data():
     """Add realistic price data for last 60 days"""
@@ -126,6 +127,8 @@ def populate_price_data():
                     
                     prices_created += 1
     
+    rebuild_daily_aggregates()
+
     print(f"✅ Created {prices_created} price entries")
     print(f"   - Time period: Last 60 days")
     print(f"   - Cities: {cities.count()}")
@@ -1,4 +1,5 @@
 import logging
+import numpy as np
 from decimal import Decimal
 from .rule_based import calculate_recommendation_score, get_recommendation_action
 
@@ -27,14 +28,15 @@ class ScoreBasedEngine:
         if current_price <= 0:
             return 0
 
-        change_percent = (predicted_price - current_price) / current_price
+        change_percent = (current_price - predicted_price) / current_price
         return change_percent
 
     def calculate_trend_score(self, historical_trend):
         """
         Calculate score based on historical trend
+        A rising trend (positive) favours buying now, so it lowers the score
         """
-        return historical_trend
+        return -historical_trend
 
     def calculate_confidence_boost(self, confidence):
         """
@@ -111,5 +113,60 @@ class ScoreBasedEngine:
         }
 
 
+    def generate_recommendations(self, current_prices, predicted_prices, trends,
+                                 confidences, vegetable_names, month):
+        """
+        Batch version of generate_recommendation.
+        Scores every item at once with NumPy and returns one dict per item,
+        in the same order as the inputs.
+        """
+        current = np.asarray(current_prices, dtype=float)
+        predicted = np.asarray(predicted_prices, dtype=float)
+        trend = np.asarray(trends, dtype=float)
+        confidence = np.asarray(confidences, dtype=float)
+
+        # Component scores (vectorized counterparts of the calculate_* methods)
+        safe_current = np.where(current > 0, current, 1.0)
+        price_change_score = np.where(current > 0, (current - predicted) / safe_current, 0.0)
+        trend_score = -trend
+        confidence_boost = np.where(confidence < 0.5, 0.5, 1.0 + (confidence - 0.5))
+        seasonality_score = np.array(
+            [self.calculate_seasonality_score(name, month) for name in vegetable_names],
+            dtype=float
+        )
+
+        final_score = (
+            price_change_score * self.weights['price_change'] +
+            trend_score * self.weights['trend'] +
+            seasonality_score * self.weights['seasonality']
+        ) * confidence_boost
+
+        wait = final_score > 0.15
+        rising = final_score < -0.15
+        potential_savings = np.where(wait, np.abs(current - predicted), 0.0)
+
+        recommendations = []
+        for i in range(len(current)):
+            if wait[i]:
+                action = 'Wait'
+                reason = f'Predicted to drop by {abs(price_change_score[i])*100:.1f}%'
+            elif rising[i]:
+                action = 'Buy Now'
+                reason = 'Price expected to rise or remain stable'
+            else:
+                action = 'Buy Now'
+                reason = 'Price relatively stable, no strong trend'
+
+            recommendations.append({
+                'action': action,
+                'reason': reason,
+                'score': float(final_score[i]),
+                'potential_savings': float(potential_savings[i]),
+                'confidence': float(confidence[i])
+            })
+
+        return recommendations
+
+
 # Initialize default engine
 score_engine = ScoreBasedEngine()
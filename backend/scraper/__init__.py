@@ -1,30 +1,36 @@
-from scraper.gov_api_fetch import fetch_government_prices, fetch_alternative_government_data
-from scraper.online_store_scraper import fetch_online_store_prices
+from scraper.gov_api_fetch import (
+    fetch_alternative_government_data, fetch_government_prices, parse_government_response
+)
+from scraper.online_store_scraper import ONLINE_STORE_FETCHERS
+from scraper.html_parsing import STORE_PARSERS
 from scraper.clean_data import clean_price_data
+from scraper.runner import DEFAULT_SOURCE_TIMEOUT, run_fetchers
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Every price source by name; each fetcher takes a `session` keyword
+PRICE_SOURCES = {
+    'government': fetch_government_prices,
+    **ONLINE_STORE_FETCHERS,
+}
 
-def fetch_all_prices():
+# Raw response body parsers by source name, for replaying archived responses
+RESPONSE_PARSERS = {
+    'government': parse_government_response,
+    **{source: parser.parse for source, parser in STORE_PARSERS.items()},
+}
+
+
+def fetch_all_prices(timeouts=None, default_timeout=DEFAULT_SOURCE_TIMEOUT):
     """
-    Master function to fetch prices from all sources
+    Master function to fetch prices from all sources.
+    Sources run concurrently; ones that miss their deadline are skipped.
     """
     try:
-        all_prices = []
-
-        # Fetch from government API
-        logger.info("Fetching government prices...")
-        gov_prices = fetch_government_prices()
-        if not gov_prices:
-            logger.warning("Government API failed, trying alternative...")
-            gov_prices = fetch_alternative_government_data()
-        all_prices.extend(gov_prices)
-
-        # Fetch from online stores
-        logger.info("Fetching online store prices...")
-        online_prices = fetch_online_store_prices()
-        all_prices.extend(online_prices)
+        all_prices = run_fetchers(
+            PRICE_SOURCES, timeouts=timeouts, default_timeout=default_timeout
+        )['prices']
 
         logger.info(f"Total raw prices fetched: {len(all_prices)}")
         return all_prices
@@ -0,0 +1,225 @@
+import logging
+import queue
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import count
+
+import requests
+
+from scraper.gov_api_fetch import AGMARKNET_API_URL, parse_government_entry
+from scraper.health import OPEN
+from scraper.runner import create_session
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class RateLimiter:
+    """
+    Thread-safe token bucket shared by every harvester worker.
+    Allows `rate` requests per second on average with bursts of up to
+    `burst` requests. A rate of None or 0 disables limiting.
+    """
+
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate or 0)
+        self.capacity = float(burst or max(self.rate, 1))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a request may be sent"""
+        if self.rate <= 0:
+            return
+
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+def backoff_delay(attempt, base=0.5, cap=30):
+    """Exponential backoff with full jitter for the given retry attempt (0-based)"""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+def get_json(session, url, params, limiter, max_retries=4, backoff=0.5, timeout=10, archive=None):
+    """
+    GET a JSON document under the shared rate limit, retrying connection
+    errors, timeouts, 429 and 5xx responses with jittered backoff.
+    A numeric Retry-After header is honored when it is longer. The final
+    response is stored in `archive` when one is given.
+    """
+    for attempt in range(max_retries + 1):
+        limiter.acquire()
+        try:
+            response = session.get(url, params=params, timeout=timeout)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            if attempt == max_retries:
+                raise
+            delay = backoff_delay(attempt, backoff)
+            logger.warning(f"Agmarknet request failed ({e}), retrying in {delay:.2f}s")
+        else:
+            if response.status_code not in RETRY_STATUSES or attempt == max_retries:
+                response.raise_for_status()
+                if archive:
+                    archive.store('government', response)
+                return response.json()
+            delay = backoff_delay(attempt, backoff)
+            retry_after = response.headers.get('Retry-After', '')
+            if retry_after.isdigit():
+                delay = max(delay, int(retry_after))
+            logger.warning(f"Agmarknet returned {response.status_code}, retrying in {delay:.2f}s")
+        time.sleep(delay)
+
+
+def iter_targets(commodity_ids, state_districts):
+    """Yield the query params of every commodity x state x district combination"""
+    for commodity_id in commodity_ids:
+        for state_id, district_ids in state_districts.items():
+            for district_id in district_ids:
+                yield {'commodityId': commodity_id, 'stateId': state_id, 'districtId': district_id}
+
+
+def harvest_government_prices(targets, base_url=AGMARKNET_API_URL, rate_limit=5, concurrency=4,
+                              page_size=500, max_retries=4, backoff=0.5, timeout=10, archive=None,
+                              health=None):
+    """
+    Walk every page of every target (see iter_targets) concurrently and
+    yield parsed price rows as pages arrive.
+
+    Workers share one token-bucket rate limiter and each keeps its own
+    keep-alive session. At most a few pages per worker are buffered, so
+    a slow consumer throttles the harvest instead of growing memory. A
+    target that still fails after retries is logged and skipped. Pages
+    are stored in `archive` (a ResponseArchive) when one is given.
+
+    With a `health` registry (scraper.health.SourceHealthRegistry) the
+    harvest is skipped while the government circuit is open and stops
+    when it opens; requests in flight are capped by its AIMD limiter,
+    which shrinks below `concurrency` while the API is slow.
+    """
+    targets = list(targets)
+    limiter = RateLimiter(rate_limit)
+    source_health = slots = None
+    if health is not None:
+        source_health = health.get('government')
+        if not source_health.allow():
+            logger.warning("Skipping Agmarknet harvest: circuit open")
+            return
+        slots = health.limiter('government', initial=concurrency, maximum=concurrency)
+    pages = queue.Queue(maxsize=concurrency * 2)
+    stop = threading.Event()
+    finished = object()
+
+    local = threading.local()
+    sessions = []
+    sessions_lock = threading.Lock()
+
+    def get_session():
+        if not hasattr(local, 'session'):
+            local.session = create_session(pool_size=1)
+            with sessions_lock:
+                sessions.append(local.session)
+        return local.session
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                pages.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def fetch_page(params):
+        if source_health is None:
+            return get_json(
+                get_session(), base_url, params,
+                limiter, max_retries=max_retries, backoff=backoff, timeout=timeout, archive=archive
+            )
+
+        started = None
+        while started is None:
+            if stop.is_set():
+                return None
+            started = slots.acquire(timeout=0.1)
+        ok = False
+        try:
+            data = get_json(
+                get_session(), base_url, params,
+                limiter, max_retries=max_retries, backoff=backoff, timeout=timeout, archive=archive
+            )
+            ok = True
+            return data
+        finally:
+            slots.release(started, ok)
+            source_health.record(ok, time.monotonic() - started)
+
+    def walk(target):
+        try:
+            for page in count(1):
+                if stop.is_set():
+                    return
+                if source_health is not None and source_health.status == OPEN:
+                    logger.warning(f"Agmarknet circuit open; skipping target {target}")
+                    return
+                data = fetch_page({**target, 'page': page, 'limit': page_size})
+                if data is None:
+                    return
+                entries = data.get('response') or []
+                rows = _parse_entries(entries)
+                if rows and not put(rows):
+                    return
+                if len(entries) < page_size:
+                    return
+        except Exception as e:
+            logger.error(f"Giving up on Agmarknet target {target}: {e}")
+        finally:
+            put(finished)
+
+    started = time.perf_counter()
+    harvested = 0
+    executor = ThreadPoolExecutor(max_workers=max(concurrency, 1), thread_name_prefix='agmarknet')
+    for target in targets:
+        executor.submit(walk, target)
+
+    try:
+        remaining = len(targets)
+        while remaining:
+            item = pages.get()
+            if item is finished:
+                remaining -= 1
+                continue
+            harvested += len(item)
+            yield from item
+    finally:
+        stop.set()
+        executor.shutdown(wait=True, cancel_futures=True)
+        for session in sessions:
+            session.close()
+        logger.info(
+            f"Harvested {harvested} Agmarknet prices from {len(targets)} targets "
+            f"in {time.perf_counter() - started:.2f}s"
+        )
+
+
+def _parse_entries(entries):
+    rows = []
+    for entry in entries:
+        try:
+            rows.append(parse_government_entry(entry))
+        except (TypeError, ValueError) as e:
+            logger.warning(f"Skipping malformed Agmarknet entry {entry}: {e}")
+    return rows
+
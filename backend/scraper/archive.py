@@ -0,0 +1,109 @@
+import gzip
+import hashlib
+import json
+import logging
+import os
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+
+class ResponseArchive:
+    """
+    Local archive of raw scraper responses.
+
+    Bodies are gzip-compressed and stored once per content hash under
+    objects/<2 hex>/<sha256>.gz; every fetch appends a line to
+    manifest.jsonl with its source, URL, status and fetch time, so
+    identical responses cost one object but keep their full history.
+    """
+
+    def __init__(self, root):
+        self.root = Path(root)
+        self.objects = self.root / 'objects'
+        self.manifest_path = self.root / 'manifest.jsonl'
+        self.objects.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+
+    def _object_path(self, digest):
+        return self.objects / digest[:2] / f'{digest}.gz'
+
+    def store(self, source, response, fetched_at=None):
+        """
+        Archive a requests.Response for a source. Bodyless responses
+        (e.g. 304 Not Modified) are skipped. Returns the content hash.
+        """
+        body = response.content
+        if not body:
+            return None
+
+        digest = hashlib.sha256(body).hexdigest()
+        path = self._object_path(digest)
+        if not path.exists():
+            path.parent.mkdir(exist_ok=True)
+            tmp_path = path.with_name(f'{digest}.{os.getpid()}.{threading.get_ident()}.tmp')
+            with gzip.open(tmp_path, 'wb') as f:
+                f.write(body)
+            os.replace(tmp_path, path)
+
+        entry = {
+            'source': source,
+            'url': response.url,
+            'status': response.status_code,
+            'content_type': response.headers.get('Content-Type', ''),
+            'sha256': digest,
+            'size': len(body),
+            'fetched_at': (fetched_at or datetime.now(timezone.utc)).isoformat(),
+        }
+        with self._lock, open(self.manifest_path, 'a') as f:
+            f.write(json.dumps(entry) + '\n')
+        return digest
+
+    def entries(self, sources=None):
+        """Stream manifest entries in fetch order, optionally for some sources only"""
+        if not self.manifest_path.exists():
+            return
+        with open(self.manifest_path) as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                if sources is None or entry['source'] in sources:
+                    yield entry
+
+    def read(self, digest):
+        """Raw body of an archived response"""
+        with gzip.open(self._object_path(digest), 'rb') as f:
+            return f.read()
+
+
+def open_archive(root):
+    """ResponseArchive at root, or None when archiving is disabled (empty root)"""
+    return ResponseArchive(root) if root else None
+
+
+def replay_responses(archive, parsers, sources=None):
+    """
+    Re-parse archived responses without touching the network.
+
+    `parsers` maps a source name to a function turning a raw body into
+    raw price rows. Yields (entry, rows) per successful archived
+    response; entries of sources without a parser are skipped.
+    """
+    skipped = 0
+    for entry in archive.entries(sources):
+        parser = parsers.get(entry['source'])
+        if parser is None or entry['status'] != 200:
+            skipped += 1
+            continue
+        try:
+            rows = parser(archive.read(entry['sha256']))
+        except (OSError, ValueError) as e:
+            logger.error(f"Could not replay {entry['source']} response {entry['sha256']}: {e}")
+            continue
+        yield entry, rows
+
+    if skipped:
+        logger.info(f"Skipped {skipped} archived responses without a parser or with an error status")
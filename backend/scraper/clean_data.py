@@ -1,71 +1,128 @@
 import logging
 import re
+from collections import Counter
 from decimal import Decimal
+from itertools import islice
+
+import numpy as np
+import pandas as pd
 
 logger = logging.getLogger(__name__)
 
 
+VALID_SOURCES = ['bigbasket', 'jiomart', 'blinkit', 'local_market', 'government', 'other']
+
+RAW_COLUMNS = ['vegetable_name', 'city_name', 'price_per_kg', 'source', 'location', 'quality_rating']
+
+
+def batched(rows, size):
+    """Group an iterable of rows into lists of at most `size` rows"""
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, size))
+        if not batch:
+            return
+        yield batch
+
+
+def _text(column, case=None):
+    """
+    Vectorized str().strip() (then .title() or .lower() if `case` names
+    one) that treats missing values as empty. Values repeat heavily, so
+    only the distinct ones are normalized.
+    """
+    codes, uniques = pd.factorize(column.where(column.notna(), ''))
+    normalized = pd.Index(uniques).astype(str).str.strip()
+    if case:
+        normalized = getattr(normalized.str, case)()
+    return pd.Series(normalized.take(codes), index=column.index)
+
+
+def _decimals(prices):
+    """Convert float prices to Decimal via their shortest repr, once per distinct price"""
+    codes, uniques = pd.factorize(prices)
+    decimals = np.array([Decimal(str(price)) for price in uniques], dtype=object)
+    return decimals[codes]
+
+
+def _records(frame):
+    """DataFrame.to_dict('records') with native values, without per-cell boxing"""
+    columns = list(frame.columns)
+    return [dict(zip(columns, values)) for values in zip(*(frame[c].tolist() for c in columns))]
+
+
+def clean_price_frame(frame, rejections):
+    """
+    Clean a DataFrame of raw price rows with vectorized column operations.
+    Rejected rows are dropped and counted by reason in `rejections`.
+    """
+    vegetable_name = _text(frame['vegetable_name'], 'title')
+    city_name = _text(frame['city_name'], 'title')
+    price_per_kg = pd.to_numeric(frame['price_per_kg'], errors='coerce').astype(float)
+
+    # Each row is rejected for the first failing check only
+    checks = [
+        ('missing_vegetable_name', vegetable_name == ''),
+        ('missing_city_name', city_name == ''),
+        ('unparseable_price', price_per_kg.isna()),
+        ('non_positive_price', price_per_kg <= 0),
+    ]
+    rejected = pd.Series(False, index=frame.index)
+    for reason, failed in checks:
+        failed = failed & ~rejected
+        if failed.any():
+            rejections[reason] += int(failed.sum())
+            rejected |= failed
+    keep = ~rejected
+
+    source = _text(frame['source'].where(frame['source'].notna(), 'other'), 'lower').str.replace(' ', '_')
+    source = source.where(source.isin(VALID_SOURCES), 'other')
+
+    quality_rating = np.trunc(pd.to_numeric(frame['quality_rating'], errors='coerce').fillna(5))
+
+    return pd.DataFrame({
+        'vegetable_name': vegetable_name[keep],
+        'city_name': city_name[keep],
+        'price_per_kg': _decimals(price_per_kg[keep]),
+        'source': source[keep],
+        'location': _text(frame['location'])[keep],
+        'quality_rating': quality_rating[keep].clip(1, 5).astype(int),
+    })
+
+
+def iter_clean_price_batches(raw_prices, chunk_size=10000, rejections=None):
+    """
+    Clean an iterable of raw price dicts in chunks and yield lists of
+    cleaned rows, so any number of rows is cleaned in bounded memory.
+
+    Pass a Counter as `rejections` to read the rejection reasons once the
+    iterator is exhausted; they are also logged in one summary line.
+    """
+    rejections = Counter() if rejections is None else rejections
+    seen = kept = 0
+
+    for chunk in batched(raw_prices, chunk_size):
+        frame = pd.DataFrame.from_records(chunk, columns=RAW_COLUMNS)
+        cleaned = clean_price_frame(frame, rejections)
+        seen += len(frame)
+        kept += len(cleaned)
+        if len(cleaned):
+            yield _records(cleaned)
+
+    if rejections:
+        logger.warning(f"Rejected {seen - kept} price entries: {dict(rejections)}")
+    logger.info(f"Cleaned {kept} out of {seen} price entries")
+
+
 def clean_price_data(raw_prices):
     """
     Clean and validate price data before storing in database
     """
-    cleaned = []
-
-    for price in raw_prices:
-        try:
-            # Clean vegetable name
-            vegetable_name = str(price.get('vegetable_name', '')).strip().title()
-            if not vegetable_name:
-                logger.warning(f"Skipping entry with no vegetable name: {price}")
-                continue
-
-            # Clean city name
-            city_name = str(price.get('city_name', '')).strip().title()
-            if not city_name:
-                logger.warning(f"Skipping entry with no city name: {price}")
-                continue
-
-            # Clean and validate price
-            try:
-                price_per_kg = float(price.get('price_per_kg', 0))
-                if price_per_kg <= 0:
-                    logger.warning(f"Invalid price for {vegetable_name}: {price_per_kg}")
-                    continue
-            except (ValueError, TypeError):
-                logger.warning(f"Could not parse price: {price.get('price_per_kg')}")
-                continue
-
-            # Clean source
-            source = str(price.get('source', 'other')).lower().replace(' ', '_')
-            valid_sources = ['bigbasket', 'jiomart', 'blinkit', 'local_market', 'government', 'other']
-            if source not in valid_sources:
-                source = 'other'
-
-            # Clean location
-            location = str(price.get('location', '')).strip()
-
-            # Clean quality rating
-            try:
-                quality_rating = int(price.get('quality_rating', 5))
-                quality_rating = max(1, min(5, quality_rating))
-            except (ValueError, TypeError):
-                quality_rating = 5
-
-            cleaned.append({
-                'vegetable_name': vegetable_name,
-                'city_name': city_name,
-                'price_per_kg': Decimal(str(price_per_kg)),
-                'source': source,
-                'location': location,
-                'quality_rating': quality_rating
-            })
-
-        except Exception as e:
-            logger.error(f"Error cleaning price entry {price}: {e}")
-            continue
-
-    logger.info(f"Cleaned {len(cleaned)} out of {len(raw_prices)} price entries")
-    return cleaned
+    try:
+        return [row for batch in iter_clean_price_batches(raw_prices) for row in batch]
+    except Exception as e:
+        logger.error(f"Error cleaning price entries: {e}")
+        return []
 
 
 def remove_duplicates(prices):
@@ -120,25 +177,27 @@ def validate_price_range(price, vegetable_name):
     return True
 
 
+# Known misspellings and synonyms; also seeds api.name_resolution
+VEGETABLE_NAME_ALIASES = {
+    'tamato': 'Tomato',
+    'tomatoe': 'Tomato',
+    'tomatos': 'Tomato',
+    'onoin': 'Onion',
+    'potatoe': 'Potato',
+    'potatos': 'Potato',
+    'capsicum': 'Capsicum',
+    'bell pepper': 'Capsicum',
+    'leafy greens': 'Spinach',
+    'greens': 'Spinach',
+}
+
+
 def standardize_vegetable_names(prices):
     """
     Standardize vegetable names for consistency
     """
-    name_mapping = {
-        'tamato': 'Tomato',
-        'tomatoe': 'Tomato',
-        'tomatos': 'Tomato',
-        'onoin': 'Onion',
-        'potatoe': 'Potato',
-        'potatos': 'Potato',
-        'capsicum': 'Capsicum',
-        'bell pepper': 'Capsicum',
-        'leafy greens': 'Spinach',
-        'greens': 'Spinach',
-    }
-
     for price in prices:
         vegetable = price['vegetable_name'].lower()
-        price['vegetable_name'] = name_mapping.get(vegetable, price['vegetable_name'])
+        price['vegetable_name'] = VEGETABLE_NAME_ALIASES.get(vegetable, price['vegetable_name'])
 
     return prices
@@ -1,55 +1,92 @@
 import requests
 from bs4 import BeautifulSoup
+import json
 import logging
+from urllib.parse import urlencode
+
+from scraper.runner import conditional_get
 
 logger = logging.getLogger(__name__)
 
+AGMARKNET_API_URL = "https://api.agmarknet.gov.in/api/datapoints"
+
 
-def fetch_government_prices():
+def parse_government_entry(entry):
+    """
+    Convert one Agmarknet datapoint to a raw price row
+    """
+    return {
+        'vegetable_name': entry.get('commodity', 'Unknown'),
+        'city_name': entry.get('state', 'Unknown'),
+        'price_per_kg': float(entry.get('priceCurrent', 0)) / 100,
+        'source': 'government',
+        'location': entry.get('market', 'Government'),
+        'quality_rating': 5
+    }
+
+
+def parse_government_response(body):
+    """
+    Convert a raw Agmarknet API response body to raw price rows
+    (also used to replay archived responses)
+    """
+    data = json.loads(body)
+    return [parse_government_entry(entry) for entry in data.get('response', [])]
+
+
+def fetch_government_prices(session=None, timeout=10, watermarks=None, url=AGMARKNET_API_URL, archive=None):
     """
     Fetch prices from Government Agmarknet API (Tomato, Onion, Potato)
     https://agmarknet.gov.in/
-    """
-    try:
-        prices = []
 
-        # Agmarknet API endpoint
-        url = "https://api.agmarknet.gov.in/api/datapoints"
+    Pass a shared requests.Session to reuse pooled connections. With a
+    watermark store the request only asks for data since the last
+    successful fetch and is conditional on its validators; returns None
+    when the API reports nothing changed. With a ResponseArchive the raw
+    response is archived before parsing.
 
-        # Parameters for API
-        params = {
-            'commodityId': '1',  # Example: Tomato
-            'stateId': 'DL',
-            'districtId': 'D1',
-        }
+    Request and parse errors are raised rather than logged, so the runner
+    records the source as failed and its circuit breaker can open.
+    """
+    # Parameters for API
+    params = {
+        'commodityId': '1',  # Example: Tomato
+        'stateId': 'DL',
+        'districtId': 'D1',
+    }
 
-        response = requests.get(url, params=params, timeout=10)
-        response.raise_for_status()
+    endpoint = f"{url}?{urlencode(sorted(params.items()))}"
+    validators = watermarks.get('government', endpoint) if watermarks else None
+    if validators and validators['since']:
+        params['since'] = validators['since'].isoformat()
 
-        data = response.json()
+    response = conditional_get(session, url, params=params, validators=validators, timeout=timeout)
+    if response is None:
+        logger.info("Government prices not modified since last fetch")
+        if watermarks:
+            watermarks.stage('government', endpoint)
+        return None
 
-        if 'response' in data:
-            for entry in data['response']:
-                prices.append({
-                    'vegetable_name': entry.get('commodity', 'Unknown'),
-                    'city_name': entry.get('state', 'Unknown'),
-                    'price_per_kg': float(entry.get('priceCurrent', 0)) / 100,
-                    'source': 'government',
-                    'location': entry.get('market', 'Government'),
-                    'quality_rating': 5
-                })
+    if archive:
+        archive.store('government', response)
 
-        logger.info(f"Successfully fetched {len(prices)} prices from government API")
-        return prices
+    prices = parse_government_response(response.content)
 
-    except Exception as e:
-        logger.error(f"Error fetching government prices: {e}")
-        return []
+    if watermarks:
+        watermarks.stage(
+            'government', endpoint,
+            etag=response.headers.get('ETag', ''),
+            last_modified=response.headers.get('Last-Modified', '')
+        )
+
+    logger.info(f"Successfully fetched {len(prices)} prices from government API")
+    return prices
 
 
 def fetch_alternative_government_data():
     """
-    Fallback method to fetch from OGD (Open Government Data) portal
+    Fallback method to fetch from OGD (Open Government Data) portal.
+    Returns canned sample rows, so it is kept out of the scheduled fetch.
     """
     try:
         prices = []
@@ -0,0 +1,273 @@
+import logging
+import math
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+def percentile(values, q):
+    """Nearest-rank percentile (0-100) of a list of numbers, or None if empty"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(math.ceil(q / 100 * len(ordered)) - 1, 0)]
+
+
+class SourceHealth:
+    """
+    Rolling error rate and latency of one source, with a circuit breaker.
+
+    The last `window` calls are kept. Once at least `min_calls` of them
+    failed at `failure_rate` or more, or the last `consecutive_failures`
+    calls all failed, the circuit opens and the source is skipped for
+    `cooldown` seconds. After that a single probe call is let through
+    (half-open): success closes the circuit, failure reopens it with the
+    cooldown doubled, up to `max_cooldown`. The failure streak trips a
+    source with a long healthy history quickly, which matters when each
+    call is a whole scheduled run waiting out its timeout.
+
+    Wall-clock times are used so the state can be saved and restored by
+    other processes (see SourceHealthRegistry.state).
+    """
+
+    def __init__(self, name, window=20, min_calls=5, failure_rate=0.5, cooldown=300, max_cooldown=3600,
+                 consecutive_failures=3):
+        self.name = name
+        self.calls = deque(maxlen=window)
+        self.consecutive_failures = consecutive_failures
+        self.failure_streak = 0
+        # Calls recorded by this process, for merging with other processes' state
+        self.recorded = []
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.base_cooldown = cooldown
+        self.max_cooldown = max(max_cooldown, cooldown)
+        self.cooldown = cooldown
+        self.status = CLOSED
+        self.opened_at = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """Whether a call to the source may be made now"""
+        with self._lock:
+            if self.status == OPEN and time.time() >= self.opened_at + self.cooldown:
+                self.status = HALF_OPEN
+                self._probing = False
+                logger.info(f"Circuit for {self.name} half-open; probing")
+            if self.status == CLOSED:
+                return True
+            if self.status == HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record(self, ok, latency):
+        """Record the outcome and latency (seconds) of a call"""
+        with self._lock:
+            self.calls.append((bool(ok), float(latency)))
+            self.recorded.append((bool(ok), float(latency)))
+            self.failure_streak = 0 if ok else self.failure_streak + 1
+
+            if self.status == HALF_OPEN:
+                if ok:
+                    self._close()
+                else:
+                    self._open(min(self.cooldown * 2, self.max_cooldown))
+            elif self.status == CLOSED:
+                if self.failure_streak >= self.consecutive_failures or (
+                    len(self.calls) >= self.min_calls and self.error_rate() >= self.failure_rate
+                ):
+                    self._open(self.base_cooldown)
+
+    def _open(self, cooldown):
+        self.status = OPEN
+        self.opened_at = time.time()
+        self.cooldown = cooldown
+        self._probing = False
+        logger.warning(
+            f"Circuit for {self.name} opened ({self.error_rate():.0%} errors); skipping it for {cooldown:.0f}s"
+        )
+
+    def _close(self):
+        self.status = CLOSED
+        self.opened_at = None
+        self.cooldown = self.base_cooldown
+        self.calls.clear()
+        logger.info(f"Circuit for {self.name} closed")
+
+    def error_rate(self):
+        if not self.calls:
+            return 0.0
+        return sum(not ok for ok, _ in self.calls) / len(self.calls)
+
+    def stats(self):
+        """Current state, error rate and p50/p95/p99 latency in seconds"""
+        latencies = [latency for _, latency in self.calls]
+        return {
+            'status': self.status,
+            'calls': len(self.calls),
+            'error_rate': round(self.error_rate(), 3),
+            'p50': percentile(latencies, 50),
+            'p95': percentile(latencies, 95),
+            'p99': percentile(latencies, 99),
+        }
+
+    def state(self):
+        return {
+            'calls': list(self.calls),
+            'status': self.status,
+            'opened_at': self.opened_at,
+            'cooldown': self.cooldown,
+            'failure_streak': self.failure_streak,
+        }
+
+    def restore(self, state):
+        self.calls.extend((ok, latency) for ok, latency in state.get('calls', []))
+        self.status = state.get('status', CLOSED)
+        self.opened_at = state.get('opened_at')
+        self.cooldown = state.get('cooldown', self.base_cooldown)
+        self.failure_streak = state.get('failure_streak', 0)
+        if self.status == HALF_OPEN:
+            # The probe of the saving process never reported back; probe again
+            self.status = OPEN
+
+
+class AIMDLimiter:
+    """
+    Concurrency limit adapted to observed latency (additive increase,
+    multiplicative decrease).
+
+    Each call that finishes within `target_latency` seconds raises the
+    limit by 1/limit, about one slot per limit's worth of good calls; a
+    failure or a slower call multiplies it by `decrease`. Calls started
+    before the last decrease do not decrease it again, so one slow burst
+    halves the limit once rather than once per call.
+    """
+
+    def __init__(self, initial=4, minimum=1, maximum=16, target_latency=2.0, decrease=0.5):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.limit = float(min(max(initial, minimum), maximum))
+        self.target_latency = target_latency
+        self.decrease = decrease
+        self.in_flight = 0
+        self._last_decrease = 0.0
+        self._condition = threading.Condition()
+
+    @property
+    def concurrency(self):
+        return int(self.limit)
+
+    def acquire(self, timeout=None):
+        """
+        Wait for a free slot; returns the call's start time to pass to
+        release(), or None if no slot freed up within `timeout`
+        """
+        with self._condition:
+            if not self._condition.wait_for(lambda: self.in_flight < self.concurrency, timeout):
+                return None
+            self.in_flight += 1
+            return time.monotonic()
+
+    def release(self, started, ok=True):
+        """Free the slot of a call started at `started` and adapt the limit"""
+        now = time.monotonic()
+        with self._condition:
+            self.in_flight -= 1
+            if ok and now - started <= self.target_latency:
+                self.limit = min(self.limit + 1 / self.limit, self.maximum)
+            elif started >= self._last_decrease:
+                self.limit = max(self.limit * self.decrease, self.minimum)
+                self._last_decrease = now
+            self._condition.notify_all()
+
+
+class SourceHealthRegistry:
+    """
+    SourceHealth and AIMDLimiter per source name, created on first use
+    with the registry's options.
+
+    state() is a JSON-serializable snapshot and SourceHealthRegistry(state)
+    restores it, so circuits and learned limits survive between scheduled
+    runs in different worker processes. Processes sharing sources store
+    them one by one instead: source_state() gives one source's state to
+    store and from_stored() restores a registry from those.
+    """
+
+    def __init__(self, state=None, target_latency=2.0, **health_options):
+        self.health_options = health_options
+        self.target_latency = target_latency
+        self._saved = state or {}
+        self._sources = {}
+        self._limiters = {}
+        self._lock = threading.Lock()
+
+    def get(self, name):
+        with self._lock:
+            if name not in self._sources:
+                health = SourceHealth(name, **self.health_options)
+                if name in self._saved.get('sources', {}):
+                    health.restore(self._saved['sources'][name])
+                self._sources[name] = health
+            return self._sources[name]
+
+    def limiter(self, name, initial=4, maximum=16):
+        with self._lock:
+            if name not in self._limiters:
+                limit = self._saved.get('limits', {}).get(name, initial)
+                self._limiters[name] = AIMDLimiter(
+                    initial=limit, maximum=maximum, target_latency=self.target_latency
+                )
+            return self._limiters[name]
+
+    @classmethod
+    def from_stored(cls, stored, target_latency=2.0, **health_options):
+        """Registry restored from {name: source_state()} as stored per source"""
+        state = {
+            'sources': {name: value['health'] for name, value in stored.items()},
+            'limits': {name: value['limit'] for name, value in stored.items() if value.get('limit')},
+            'versions': {name: value.get('version', 0) for name, value in stored.items()},
+        }
+        return cls(state, target_latency=target_latency, **health_options)
+
+    def recorded_sources(self):
+        """Names of the sources this registry recorded calls for"""
+        return [name for name, health in self._sources.items() if health.recorded]
+
+    def source_state(self, name, stored=None):
+        """
+        State of one source to store in place of `stored`, the state
+        currently stored for it. When another process stored a newer
+        state since this registry was restored, this registry's calls are
+        replayed onto that one rather than overwriting it.
+        """
+        health = self.get(name)
+        version = self._saved.get('versions', {}).get(name, 0)
+        if stored and stored.get('version', 0) != version:
+            merged = SourceHealth(name, **self.health_options)
+            merged.restore(stored['health'])
+            for ok, latency in health.recorded:
+                merged.record(ok, latency)
+            health = merged
+            version = stored.get('version', 0)
+
+        limiter = self._limiters.get(name)
+        limit = limiter.limit if limiter else (stored or {}).get('limit')
+        return {'health': health.state(), 'limit': limit, 'version': version + 1}
+
+    def stats(self):
+        return {name: health.stats() for name, health in self._sources.items()}
+
+    def state(self):
+        sources = dict(self._saved.get('sources', {}))
+        sources.update({name: health.state() for name, health in self._sources.items()})
+        limits = dict(self._saved.get('limits', {}))
+        limits.update({name: limiter.limit for name, limiter in self._limiters.items()})
+        return {'sources': sources, 'limits': limits}
@@ -0,0 +1,197 @@
+import logging
+import re
+import time
+from pathlib import Path
+
+from bs4 import BeautifulSoup, SoupStrainer, Tag
+
+logger = logging.getLogger(__name__)
+
+# lxml is much faster when installed; html.parser ships with Python
+try:
+    import lxml  # noqa: F401
+    HTML_PARSER = 'lxml'
+except ImportError:
+    HTML_PARSER = 'html.parser'
+
+FIXTURES_DIR = Path(__file__).resolve().parent / 'fixtures'
+
+_PRICE = re.compile(r'(?:₹|rs\.?|inr)\s*([\d,]+(?:\.\d+)?)', re.IGNORECASE)
+_NUMBER = re.compile(r'[\d,]+(?:\.\d+)?')
+_UNIT = re.compile(r'(\d+(?:\.\d+)?)\s*(kg|kilogram|g|gm|gms|gram|grams)\b', re.IGNORECASE)
+# Everything after the product name: pack size, variety, packaging
+_NAME_SUFFIX = re.compile(r'\s*(?:[-,(|]|\d+(?:\.\d+)?\s*(?:kg|g|gm|gms|pc|pcs)\b).*$', re.IGNORECASE)
+
+# Grams per unit of the pack sizes a per-kg price can be derived from
+UNIT_GRAMS = {'kg': 1000, 'kilogram': 1000, 'g': 1, 'gm': 1, 'gms': 1, 'gram': 1, 'grams': 1}
+
+
+def parse_price(text):
+    """Rupee amount in a price label ('₹1,299.50', 'Rs. 48'), or None"""
+    match = _PRICE.search(text)
+    amount = match.group(1) if match else None
+    if amount is None:
+        match = _NUMBER.search(text)
+        amount = match.group(0) if match else None
+    return float(amount.replace(',', '')) if amount else None
+
+
+def parse_pack_kg(text):
+    """Pack size in kg from a label like '500 g' or '1 kg', or None for pieces/bunches"""
+    match = _UNIT.search(text)
+    if not match:
+        return None
+    return float(match.group(1)) * UNIT_GRAMS[match.group(2).lower()] / 1000
+
+
+def _compile_selector(selector):
+    tag, attrs = selector
+    (attribute, value), = attrs.items()
+    return tag, attribute, value
+
+
+class StoreParser:
+    """
+    Compiled selectors for one store's product listing pages.
+
+    Only the product-card nodes are built into a tree (via SoupStrainer);
+    name, price and pack size are then read from the card's own nodes and
+    parsed with precompiled regexes. Prices are normalized to per kg, and
+    cards sold per piece or bunch are skipped. The city comes from the
+    page itself through `city_pattern` unless the caller knows it.
+
+    Selectors are (tag, {attribute: value}) pairs matching a tag that has
+    that attribute value (or class); a missing `unit` selector reads the
+    pack size from the name. Field selectors are matched in one walk over
+    the card instead of one find() per field.
+    """
+
+    def __init__(self, source, card, name, price, unit=None, city_pattern=None, location='', quality_rating=4):
+        self.source = source
+        self.card = card
+        self.fields = {
+            field: _compile_selector(selector)
+            for field, selector in (('name', name), ('price', price), ('unit', unit or name))
+        }
+        self.city_pattern = re.compile(city_pattern) if city_pattern else None
+        self.location = location
+        self.quality_rating = quality_rating
+        self.strainer = SoupStrainer(card[0], attrs=card[1])
+
+    def cards(self, html, full_tree=False):
+        """Product card elements of a page; full_tree parses the whole document (for benchmarks)"""
+        if full_tree:
+            return BeautifulSoup(html, HTML_PARSER).find_all(self.card[0], attrs=self.card[1])
+        return BeautifulSoup(html, HTML_PARSER, parse_only=self.strainer).find_all(self.card[0], attrs=self.card[1])
+
+    def parse(self, html, city_name=None, full_tree=False):
+        """Raw price rows of a listing page (str or bytes)"""
+        if isinstance(html, bytes):
+            html = html.decode('utf-8', errors='replace')
+        if city_name is None and self.city_pattern:
+            match = self.city_pattern.search(html)
+            city_name = match.group(1) if match else None
+        if not city_name:
+            logger.warning(f"No city found on {self.source} page; skipping it")
+            return []
+
+        rows = []
+        skipped = 0
+        for card in self.cards(html, full_tree):
+            row = self._parse_card(card, city_name)
+            if row is None:
+                skipped += 1
+            else:
+                rows.append(row)
+
+        if skipped:
+            logger.debug(f"Skipped {skipped} {self.source} cards without a per-kg price")
+        return rows
+
+    def _field_texts(self, card):
+        """Text of the first node matching each field selector"""
+        texts = {}
+        for node in card.descendants:
+            if not isinstance(node, Tag):
+                continue
+            for field, (tag, attribute, value) in self.fields.items():
+                if field in texts or node.name != tag:
+                    continue
+                actual = node.attrs.get(attribute)
+                if actual == value or (isinstance(actual, list) and value in actual):
+                    texts[field] = node.get_text(' ', strip=True)
+            if len(texts) == len(self.fields):
+                break
+        return texts
+
+    def _parse_card(self, card, city_name):
+        texts = self._field_texts(card)
+        if 'name' not in texts or 'price' not in texts:
+            return None
+
+        price = parse_price(texts['price'])
+        pack_kg = parse_pack_kg(texts.get('unit', ''))
+        if price is None or not pack_kg:
+            return None
+
+        return {
+            'vegetable_name': _NAME_SUFFIX.sub('', texts['name']),
+            'city_name': city_name,
+            'price_per_kg': round(price / pack_kg, 2),
+            'source': self.source,
+            'location': self.location,
+            'quality_rating': self.quality_rating,
+        }
+
+
+# Listing page selectors by store; fixtures/<store>.html shows the markup
+STORE_PARSERS = {
+    'bigbasket': StoreParser(
+        'bigbasket',
+        card=('li', {'class': 'product-card'}),
+        name=('h3', {'class': 'product-name'}),
+        price=('span', {'class': 'discounted-price'}),
+        unit=('span', {'class': 'pack-size'}),
+        city_pattern=r'data-delivery-city="([^"]+)"',
+        location='BigBasket Warehouse',
+    ),
+    'jiomart': StoreParser(
+        'jiomart',
+        card=('div', {'class': 'plp-card-container'}),
+        name=('div', {'class': 'plp-card-details-name'}),
+        price=('span', {'class': 'jm-heading-xxs'}),
+        city_pattern=r'"deliveryCity"\s*:\s*"([^"]+)"',
+        location='JioMart Distribution Center',
+    ),
+    'blinkit': StoreParser(
+        'blinkit',
+        card=('div', {'data-test-id': 'plp-product'}),
+        name=('div', {'class': 'product-title'}),
+        price=('div', {'class': 'product-price'}),
+        unit=('div', {'class': 'product-quantity'}),
+        city_pattern=r'<meta name="city" content="([^"]+)"',
+        location='Blinkit Quick Commerce',
+    ),
+}
+
+
+def benchmark_parser(parser, pages, repeat=3, full_tree=False):
+    """
+    Parse every page `repeat` times and return pages per second and the
+    rows found in one pass
+    """
+    rows = sum(len(parser.parse(page, full_tree=full_tree)) for page in pages)
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for page in pages:
+            parser.parse(page, full_tree=full_tree)
+    elapsed = time.perf_counter() - started
+    return {
+        'pages_per_second': len(pages) * repeat / elapsed if elapsed > 0 else 0.0,
+        'rows_per_page': rows / len(pages) if pages else 0,
+    }
+
+
+def load_fixture_pages(source, directory=FIXTURES_DIR):
+    """Saved listing pages of a store: <directory>/<source>*.html"""
+    return [path.read_text(encoding='utf-8') for path in sorted(Path(directory).glob(f'{source}*.html'))]
@@ -2,28 +2,20 @@ import requests
 from bs4 import BeautifulSoup
 import logging
 
+from scraper.runner import run_fetchers
+
 logger = logging.getLogger(__name__)
 
 
-def fetch_online_store_prices():
+def fetch_online_store_prices(session=None, watermarks=None, archive=None):
     """
     Fetch prices from online stores.
     Note: This uses BeautifulSoup for web scraping or direct APIs
+
+    Stores are fetched concurrently; see scraper.runner.run_fetchers.
     """
     try:
-        prices = []
-
-        # BigBasket-like API (example)
-        bigbasket_prices = fetch_bigbasket_prices()
-        prices.extend(bigbasket_prices)
-
-        # JioMart-like API (example)
-        jiomart_prices = fetch_jiomart_prices()
-        prices.extend(jiomart_prices)
-
-        # Blinkit-like API (example)
-        blinkit_prices = fetch_blinkit_prices()
-        prices.extend(blinkit_prices)
+        prices = run_fetchers(ONLINE_STORE_FETCHERS, session=session, watermarks=watermarks, archive=archive)['prices']
 
         logger.info(f"Successfully fetched {len(prices)} prices from online stores")
         return prices
@@ -33,7 +25,7 @@ def fetch_online_store_prices():
         return []
 
 
-def fetch_bigbasket_prices():
+def fetch_bigbasket_prices(session=None, watermarks=None, archive=None):
     """Fetch prices from BigBasket"""
     try:
         # Sample data for demonstration
@@ -61,7 +53,7 @@ def fetch_bigbasket_prices():
         return []
 
 
-def fetch_jiomart_prices():
+def fetch_jiomart_prices(session=None, watermarks=None, archive=None):
     """Fetch prices from JioMart"""
     try:
         prices = [
@@ -88,7 +80,7 @@ def fetch_jiomart_prices():
         return []
 
 
-def fetch_blinkit_prices():
+def fetch_blinkit_prices(session=None, watermarks=None, archive=None):
     """Fetch prices from Blinkit"""
     try:
         prices = [
@@ -113,3 +105,15 @@ def fetch_blinkit_prices():
     except Exception as e:
         logger.error(f"Error fetching Blinkit prices: {e}")
         return []
+
+
+# Store fetchers by source name, in the order their rows are returned.
+# They accept a watermark store for conditional requests and a response
+# archive (see gov_api_fetch.fetch_government_prices); the sample
+# fetchers make no requests and ignore both. Listing pages are parsed
+# with scraper.html_parsing.STORE_PARSERS.
+ONLINE_STORE_FETCHERS = {
+    'bigbasket': fetch_bigbasket_prices,
+    'jiomart': fetch_jiomart_prices,
+    'blinkit': fetch_blinkit_prices,
+}
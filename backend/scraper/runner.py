@@ -0,0 +1,195 @@
+import logging
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime, timezone
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SOURCE_TIMEOUT = 15
+
+
+def create_session(pool_size=10):
+    """
+    Create a requests.Session with a keep-alive connection pool large enough
+    for every source fetcher to hold a connection at the same time
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def conditional_get(session, url, params=None, validators=None, timeout=10):
+    """
+    GET with If-None-Match / If-Modified-Since from a watermark's
+    validators (see api.watermarks.WatermarkStore.get).
+    Returns None when the server answers 304 Not Modified.
+    """
+    headers = {}
+    if validators and validators.get('etag'):
+        headers['If-None-Match'] = validators['etag']
+    if validators and validators.get('last_modified'):
+        headers['If-Modified-Since'] = validators['last_modified']
+
+    response = (session or requests).get(url, params=params, headers=headers, timeout=timeout)
+    if response.status_code == 304:
+        return None
+    response.raise_for_status()
+    return response
+
+
+class _HeldWatermarks:
+    """
+    One fetcher's view of a watermark store: reads go through, while
+    stage() calls are held until run_fetchers knows the source finished
+    in time. A straggler that outlives its deadline therefore cannot
+    advance its watermark past rows that were dropped.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self.staged = []
+        self._lock = threading.Lock()
+        self._released = False
+
+    def get(self, source, endpoint=''):
+        return self.store.get(source, endpoint)
+
+    def stage(self, source, endpoint='', etag=None, last_modified=None, fetched_at=None):
+        with self._lock:
+            self.staged.append({
+                'source': source, 'endpoint': endpoint, 'etag': etag, 'last_modified': last_modified,
+                'fetched_at': fetched_at or datetime.now(timezone.utc),
+            })
+
+    def release(self):
+        """Stage the held watermarks in the store; later stage() calls still stay held"""
+        with self._lock:
+            staged, self.staged = self.staged, []
+        for kwargs in staged:
+            self.store.stage(**kwargs)
+
+
+def _timed_call(fetcher, kwargs):
+    started = time.perf_counter()
+    prices = fetcher(**kwargs)
+    return prices or [], time.perf_counter() - started
+
+
+def run_fetchers(fetchers, timeouts=None, default_timeout=DEFAULT_SOURCE_TIMEOUT,
+                 session=None, max_workers=None, watermarks=None, archive=None, health=None):
+    """
+    Run source fetchers concurrently and collect whatever finishes in time.
+
+    `fetchers` maps a source name to a callable taking a `session` keyword.
+    Each source gets its own deadline (`timeouts[name]`, else
+    `default_timeout` seconds) measured from the start of the run; a source
+    that misses it is reported as timed out and its rows are dropped, while
+    the others are still returned.
+
+    With a `watermarks` store (api.watermarks.WatermarkStore) fetchers
+    also receive it as a keyword to make incremental, conditional
+    requests. What a fetcher stages is only passed on to the store, and
+    the source staged as fetched, when it finishes in time without error.
+    With an `archive` (scraper.archive.ResponseArchive) fetchers also
+    receive it and store their raw responses.
+
+    With a `health` registry (scraper.health.SourceHealthRegistry) sources
+    whose circuit is open are skipped without being called, and every
+    outcome is recorded; a timeout counts as a failure.
+
+    Returns {'prices': [...], 'sources': {name: {'status', 'count', 'latency'}}}
+    where status is 'ok', 'timeout', 'error' or 'skipped' and latency is
+    in seconds.
+    """
+    timeouts = timeouts or {}
+    results = {}
+    if health is not None:
+        for name in fetchers:
+            if not health.get(name).allow():
+                results[name] = {'status': 'skipped', 'count': 0, 'latency': 0.0}
+                logger.info(f"Skipping source {name}: circuit open")
+    active = {name: fetcher for name, fetcher in fetchers.items() if name not in results}
+
+    own_session = session is None
+    if own_session:
+        session = create_session(pool_size=max(len(active), 1))
+
+    executor = ThreadPoolExecutor(
+        max_workers=max_workers or max(len(active), 1),
+        thread_name_prefix='scraper'
+    )
+    kwargs = {'session': session}
+    if archive is not None:
+        kwargs['archive'] = archive
+    held = {}
+    if watermarks is not None:
+        held = {name: _HeldWatermarks(watermarks) for name in active}
+
+    started = time.perf_counter()
+    futures = {
+        executor.submit(_timed_call, fetcher, {**kwargs, **({'watermarks': held[name]} if held else {})}): name
+        for name, fetcher in active.items()
+    }
+    deadlines = {
+        future: started + timeouts.get(name, default_timeout)
+        for future, name in futures.items()
+    }
+
+    pending = set(futures)
+    stragglers = []
+    try:
+        while pending:
+            now = time.perf_counter()
+            for future in [f for f in pending if deadlines[f] <= now and not f.done()]:
+                pending.discard(future)
+                if not future.cancel():
+                    stragglers.append(future)
+                name = futures[future]
+                results[name] = {'status': 'timeout', 'count': 0, 'latency': round(now - started, 3)}
+                logger.warning(f"Source {name} timed out after {now - started:.2f}s")
+            if not pending:
+                break
+
+            next_deadline = min(deadlines[f] for f in pending)
+            done, _ = wait(pending, timeout=max(next_deadline - now, 0), return_when=FIRST_COMPLETED)
+            for future in done:
+                pending.discard(future)
+                results[futures[future]] = _collect(futures[future], future, started)
+    finally:
+        # Do not block on stragglers; their results are discarded
+        executor.shutdown(wait=False)
+        if own_session and not stragglers:
+            session.close()
+
+    prices = []
+    for name in fetchers:
+        prices.extend(results[name].pop('prices', []))
+        if watermarks is not None and results[name]['status'] == 'ok':
+            held[name].release()
+            watermarks.stage(name)
+        if health is not None and name in active:
+            health.get(name).record(results[name]['status'] == 'ok', results[name]['latency'])
+
+    summary = ', '.join(
+        f"{name}={result['status']}/{result['count']}/{result['latency']:.2f}s"
+        for name, result in results.items()
+    )
+    logger.info(f"Fetched {len(prices)} prices in {time.perf_counter() - started:.2f}s ({summary})")
+    return {'prices': prices, 'sources': {name: results[name] for name in fetchers}}
+
+
+def _collect(name, future, started):
+    try:
+        prices, latency = future.result()
+    except Exception as e:
+        latency = time.perf_counter() - started
+        logger.error(f"Source {name} failed: {e}")
+        return {'status': 'error', 'count': 0, 'latency': round(latency, 3), 'prices': []}
+
+    return {'status': 'ok', 'count': len(prices), 'latency': round(latency, 3), 'prices': list(prices)}
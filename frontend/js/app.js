@@ -205,38 +205,27 @@ async function loadInitialData() {
 
 async function loadDashboardData() {
     try {
-        // Load current prices
-        const pricesResponse = await fetch(
-            `${API_BASE_URL}/current-prices?city=${appState.currentCity}`
+        // Load prices, recommendations and savings in a single round trip
+        const response = await fetch(
+            `${API_BASE_URL}/dashboard/?city=${appState.currentCity}`
         );
-        const prices = await pricesResponse.json();
-        // if API returns paginated DRF object, extract results
-        let priceList = prices.results ? prices.results : prices;
+        const dashboard = await response.json();
+
+        let priceList = dashboard.current_prices || [];
+        let recommendations = dashboard.recommendations || [];
         // apply vegetable filter client-side if set
         if (appState.selectedVegetable) {
             priceList = priceList.filter(p => p.vegetable_name === appState.selectedVegetable);
+            recommendations = recommendations.filter(r => r.vegetable_name === appState.selectedVegetable);
         }
+
         appState.prices = priceList;
         renderPrices(priceList);
 
-        // Load recommendations
-        const recsResponse = await fetch(
-            `${API_BASE_URL}/recommendation?city=${appState.currentCity}`
-        );
-        let recommendations = await recsResponse.json();
-        if (recommendations.results) recommendations = recommendations.results;
-        if (appState.selectedVegetable) {
-            recommendations = recommendations.filter(r => r.vegetable_name === appState.selectedVegetable);
-        }
         appState.recommendations = recommendations;
         renderRecommendations(recommendations);
 
-        // Load savings summary (insights requires city parameter)
-        const savingsResponse = await fetch(
-            `${API_BASE_URL}/insights?city=${appState.currentCity}&month=${new Date().toLocaleString('default', { month: 'long' })}`
-        );
-        const savings = await savingsResponse.json();
-        renderSavings(savings);
+        renderSavings(dashboard.savings || {});
     } catch (error) {
         console.error('Error loading dashboard data:', error);
         showError('Failed to load dashboard data');
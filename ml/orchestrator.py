@@ -0,0 +1,245 @@
+import os
+import sys
+import logging
+import multiprocessing
+import signal
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+
+# Add project path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
+
+import django
+django.setup()
+
+from django.db import connection, connections
+from django.utils import timezone
+
+from api.models import City, TrainingState, Vegetable
+from ml.train_model import MIN_TRAINING_ROWS, MODEL_TYPES, model_path, train_all_models
+from ml.training_data import load_daily_series, series_fingerprint
+
+logger = logging.getLogger(__name__)
+
+
+class SeriesTimeout(BaseException):
+    """
+    Raised by SIGALRM when a series overruns its time budget.
+    A BaseException so the trainers' `except Exception` blocks cannot swallow it.
+    """
+
+
+def _on_alarm(signum, frame):
+    raise SeriesTimeout()
+
+
+# Daily series of the current run; forked workers inherit them instead
+# of receiving a pickled copy per series
+_run_series = {}
+
+
+def train_series(vegetable_id, city_id, prices, timeout=None, trainer=train_all_models, models=MODEL_TYPES):
+    """
+    Train the `models` types of one series on its daily prices and
+    describe the outcome; never raises.
+
+    The fit is interrupted with SIGALRM after `timeout` seconds where
+    signals are available (in the main thread on POSIX). Returns a dict
+    with vegetable_id, city_id, status ('ok', 'failed' or 'timeout'),
+    the models that were trained, seconds and any error message.
+    """
+    use_alarm = bool(timeout) and hasattr(signal, 'SIGALRM') and threading.current_thread() is threading.main_thread()
+    summary = {'vegetable_id': vegetable_id, 'city_id': city_id, 'models': [], 'error': ''}
+    started = time.perf_counter()
+
+    if use_alarm:
+        previous = signal.signal(signal.SIGALRM, _on_alarm)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        result = trainer(vegetable_id, city_id, prices, models)
+        summary['models'] = sorted(
+            name for name, model in (result or {}).items()
+            if name not in ('vegetable', 'city') and model is not None
+        )
+        summary['status'] = 'ok' if summary['models'] else 'failed'
+    except SeriesTimeout:
+        summary['status'] = 'timeout'
+        summary['error'] = f'Timed out after {timeout}s'
+    except Exception as e:
+        summary['status'] = 'failed'
+        summary['error'] = str(e)
+    finally:
+        if use_alarm:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, previous)
+
+    summary['seconds'] = round(time.perf_counter() - started, 3)
+    if summary['status'] != 'ok':
+        logger.warning(
+            f"Training {vegetable_id}/{city_id} {summary['status']}"
+            f"{': ' + summary['error'] if summary['error'] else ''}"
+        )
+    return summary
+
+
+def _train_in_worker(args):
+    vegetable_id, city_id, models, timeout, trainer = args
+    return train_series(vegetable_id, city_id, _run_series[(vegetable_id, city_id)], timeout, trainer, models)
+
+
+def _init_worker():
+    # Forked workers must open their own database connections
+    connections.close_all()
+
+
+def stale_models(daily, force=False):
+    """
+    {(vegetable_id, city_id): (model types to train, fingerprint)} for
+    the series whose models were trained on different data than their
+    current daily prices (or never trained, or lost their model file).
+    Everything is stale with `force`.
+    """
+    fingerprints = {key: series_fingerprint(prices) for key, prices in daily.items()}
+    vegetables = dict(Vegetable.objects.filter(id__in={v for v, _ in daily}).values_list('id', 'name'))
+    cities = dict(City.objects.filter(id__in={c for _, c in daily}).values_list('id', 'name'))
+    states = {
+        (vegetable_id, city_id, model_type): {'row_count': row_count, 'last_date': last_date, 'checksum': checksum}
+        for vegetable_id, city_id, model_type, row_count, last_date, checksum in TrainingState.objects.filter(
+            vegetable_id__in=vegetables, city_id__in=cities
+        ).values_list('vegetable_id', 'city_id', 'model_type', 'row_count', 'last_date', 'checksum')
+    }
+
+    stale = {}
+    for (vegetable_id, city_id), fingerprint in fingerprints.items():
+        models = tuple(
+            model_type for model_type in MODEL_TYPES
+            if force
+            or states.get((vegetable_id, city_id, model_type)) != fingerprint
+            or not model_path(model_type, vegetables.get(vegetable_id), cities.get(city_id)).exists()
+        )
+        if models:
+            stale[(vegetable_id, city_id)] = (models, fingerprint)
+    return stale
+
+
+def save_training_states(results, stale):
+    """Record the fingerprints of the models a run trained"""
+    now = timezone.now()
+    states = [
+        TrainingState(
+            vegetable_id=summary['vegetable_id'], city_id=summary['city_id'], model_type=model_type,
+            trained_at=now, **stale[(summary['vegetable_id'], summary['city_id'])][1]
+        )
+        for summary in results for model_type in summary['models']
+    ]
+    TrainingState.objects.bulk_create(
+        states,
+        update_conflicts=True,
+        unique_fields=['vegetable', 'city', 'model_type'],
+        update_fields=['row_count', 'last_date', 'checksum', 'trained_at']
+    )
+    return len(states)
+
+
+def train_planned_series(vegetable_id, city_id, models=MODEL_TYPES, timeout=None, trainer=train_all_models):
+    """
+    Train one series on its current daily prices and record the
+    fingerprints of the models trained; for callers that spread series
+    over other workers (see api.tasks.train_prediction_models)
+    """
+    prices = load_daily_series([(vegetable_id, city_id)]).get((vegetable_id, city_id))
+    if prices is None:
+        return {'vegetable_id': vegetable_id, 'city_id': city_id, 'models': [], 'status': 'failed',
+                'error': 'No prices', 'seconds': 0.0}
+
+    summary = train_series(vegetable_id, city_id, prices, timeout, trainer, tuple(models))
+    save_training_states([summary], {(vegetable_id, city_id): (models, series_fingerprint(prices))})
+    return summary
+
+
+def summarize_run(results, series, skipped, workers, seconds):
+    """Counts, slowest series and errors of a training run, logged and returned"""
+    statuses = Counter(summary['status'] for summary in results)
+    run = {
+        'series': series,
+        'skipped': skipped,
+        'trained': statuses['ok'],
+        'failed': statuses['failed'],
+        'timeout': statuses['timeout'],
+        'workers': workers,
+        'seconds': round(seconds, 3),
+        'slowest': sorted(results, key=lambda summary: summary['seconds'], reverse=True)[:5],
+        'errors': [summary for summary in results if summary['status'] != 'ok'],
+    }
+    logger.info(
+        f"Trained {run['trained']} of {run['series']} series in {run['seconds']:.1f}s "
+        f"with {workers} workers ({run['skipped']} unchanged, {run['failed']} failed, "
+        f"{run['timeout']} timed out)"
+    )
+    return run
+
+
+def train_many(series=None, workers=1, timeout=None, trainer=train_all_models, progress=None,
+               min_rows=MIN_TRAINING_ROWS, force=False):
+    """
+    Train every (vegetable_id, city_id) in `series` (default: all) with at
+    least `min_rows` days of prices, and summarize the run.
+
+    The daily series are loaded up front, from cache where nothing new
+    was ingested and otherwise in one scan (see ml.training_data).
+    Series are spread over `workers` forked processes (one series each
+    at a time) so fits use every core; with one worker they run in this
+    process. A daemonic process (a Celery prefork worker) cannot fork a
+    pool and trains with one worker. A series that fails or overruns
+    `timeout` seconds is recorded as such and the rest carry on.
+    `progress` is called with each series summary as it finishes.
+
+    Models whose series did not change since they were trained are
+    skipped (see stale_models) unless `force` is set; the fingerprints
+    of the models trained are saved in TrainingState.
+    """
+    global _run_series
+    started = time.perf_counter()
+    daily = load_daily_series(series, min_rows=min_rows)
+    stale = stale_models(daily, force=force)
+    if workers > 1 and connection.vendor == 'sqlite' and connection.is_in_memory_db():
+        logger.warning("In-memory SQLite is not shared with worker processes; training with one worker")
+        workers = 1
+    if workers > 1 and 'fork' not in multiprocessing.get_all_start_methods():
+        logger.warning("Worker processes need the fork start method; training with one worker")
+        workers = 1
+    if workers > 1 and multiprocessing.current_process().daemon:
+        logger.warning("Daemonic processes cannot have worker processes; training with one worker")
+        workers = 1
+
+    results = []
+
+    def finish(summary):
+        results.append(summary)
+        if progress:
+            progress(summary)
+
+    if workers > 1 and len(stale) > 1:
+        # Children must not share the parent's database connections
+        connections.close_all()
+        _run_series = daily
+        tasks = [
+            (vegetable_id, city_id, models, timeout, trainer)
+            for (vegetable_id, city_id), (models, _) in stale.items()
+        ]
+        try:
+            with multiprocessing.get_context('fork').Pool(min(workers, len(tasks)), initializer=_init_worker) as pool:
+                for summary in pool.imap_unordered(_train_in_worker, tasks):
+                    finish(summary)
+        finally:
+            _run_series = {}
+    else:
+        for (vegetable_id, city_id), (models, _) in stale.items():
+            finish(train_series(vegetable_id, city_id, daily[(vegetable_id, city_id)], timeout, trainer, models))
+    save_training_states(results, stale)
+
+    return summarize_run(results, len(daily), len(daily) - len(stale), workers, time.perf_counter() - started)
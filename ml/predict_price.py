@@ -16,6 +16,7 @@ import django
 django.setup()
 
 from api.models import PriceEntry, Prediction, Vegetable, City
+from api.caching import bump_data_version
 from django.utils import timezone
 
 logger = logging.getLogger(__name__)
@@ -159,6 +160,8 @@ def generate_predictions(vegetable_id, city_id, days=30, use_ensemble=True):
                 }
             )
 
+        bump_data_version(city.name)
+
         logger.info(f"Generated and stored {len(predictions)} predictions")
         return predictions
 
@@ -1,5 +1,7 @@
 import os
 import sys
+import hashlib
+import json
 import logging
 import pickle
 import pandas as pd
@@ -15,28 +17,57 @@ import django
 django.setup()
 
 from api.models import PriceEntry, Prediction, Vegetable, City
+from ml.training_data import load_daily_series
+from django.conf import settings
 from django.utils import timezone
 from datetime import timedelta
 
 logger = logging.getLogger(__name__)
 
+MODEL_DIR = Path(__file__).parent / 'models'
+
+# Series with fewer days of prices are not trained
+MIN_TRAINING_ROWS = 30
+
+MODEL_TYPES = ('prophet', 'arima')
+
+ARIMA_ORDER = (1, 1, 1)
+
+
+def model_path(model_type, vegetable_name, city_name):
+    """Pickle path of a series' trained model"""
+    return MODEL_DIR / f'{model_type}_{vegetable_name}_{city_name}.pkl'
+
 
 def preprocess_price_data(prices):
     """
-    Preprocess price data for model training
+    Preprocess price data for model training.
+    Takes a daily series from ml.training_data.load_daily_series (date
+    and price columns), or a raw series frame from load_price_frame or
+    PriceEntry objects (date, price, source and quality columns).
     """
-    df = pd.DataFrame([{
-        'date': p.timestamp.date(),
-        'price': float(p.price_per_kg),
-        'source': p.source,
-        'quality': p.quality_rating
-    } for p in prices])
+    if isinstance(prices, pd.Series):
+        return pd.DataFrame({'date': prices.index, 'price': prices.to_numpy()})
+    if isinstance(prices, pd.DataFrame):
+        df = pd.DataFrame({
+            'date': prices['timestamp'].dt.tz_convert(None).dt.normalize(),
+            'price': prices['price'].astype(float),
+            'source': prices['source'],
+            'quality': prices['quality'],
+        })
+    else:
+        df = pd.DataFrame([{
+            'date': p.timestamp.date(),
+            'price': float(p.price_per_kg),
+            'source': p.source,
+            'quality': p.quality_rating
+        } for p in prices])
 
     # Sort by date
-    df = df.sort_values('date')
+    df = df.sort_values('date', kind='stable')
 
     # Handle missing values
-    df = df.fillna(method='ffill').fillna(method='bfill')
+    df = df.ffill().bfill()
 
     return df
 
@@ -66,8 +97,8 @@ def train_prophet_model(prices, vegetable_name, city_name):
 
         model.fit(prophet_df)
 
-        model_path = Path(__file__).parent / 'models' / f'prophet_{vegetable_name}_{city_name}.pkl'
-        with open(model_path, 'wb') as f:
+        MODEL_DIR.mkdir(exist_ok=True)
+        with open(model_path('prophet', vegetable_name, city_name), 'wb') as f:
             pickle.dump(model, f)
 
         logger.info(f"Successfully trained Prophet model for {vegetable_name} in {city_name}")
@@ -78,24 +109,175 @@ def train_prophet_model(prices, vegetable_name, city_name):
         return None
 
 
-def train_arima_model(prices, vegetable_name, city_name):
+def arima_meta_path(vegetable_name, city_name):
+    """Path of the refit record kept next to a series' ARIMA pickle"""
+    return model_path('arima', vegetable_name, city_name).with_suffix('.json')
+
+
+def new_observations(fitted_prices, prices):
     """
-    Train ARIMA model for price prediction
+    The days of `prices` that follow `fitted_prices` (the daily series a
+    model was last fitted or updated on), or None when `prices` does not
+    simply continue it: earlier days were revised or dropped, or either
+    series lacks a daily index.
     """
-    try:
-        from statsmodels.arima.model import ARIMA
+    for series in (fitted_prices, prices):
+        if not isinstance(series.index, pd.DatetimeIndex) or series.index.freqstr != 'D':
+            return None
 
-        df = preprocess_price_data(prices)
+    known = len(fitted_prices)
+    if not known or len(prices) < known or not prices.index[:known].equals(fitted_prices.index):
+        return None
+    if not np.allclose(prices.to_numpy(dtype=float)[:known], fitted_prices.to_numpy(dtype=float)):
+        return None
+    return prices.iloc[known:]
+
+
+def residual_rmse(residuals):
+    """Root mean square of (one-step-ahead) residuals, NaNs ignored"""
+    residuals = np.asarray(residuals, dtype=float)
+    residuals = residuals[~np.isnan(residuals)]
+    return float(np.sqrt(np.mean(residuals ** 2))) if len(residuals) else 0.0
+
+
+def needs_full_refit(meta, prices, refit_days):
+    """
+    Why an ARIMA model of `prices` must be refitted from scratch rather
+    than updated with its fitted parameters, or None: no refit record,
+    a different order, or `refit_days` days of data since the last refit
+    """
+    if not meta or tuple(meta.get('order', ())) != ARIMA_ORDER:
+        return 'no refit record'
+    days = (prices.index[-1] - pd.Timestamp(meta['fitted_through'])).days
+    if days >= refit_days:
+        return f'{days} days since the last refit'
+    return None
 
-        # Train ARIMA model
-        model = ARIMA(df['price'], order=(1, 1, 1))
-        fitted_model = model.fit()
 
-        model_path = Path(__file__).parent / 'models' / f'arima_{vegetable_name}_{city_name}.pkl'
-        with open(model_path, 'wb') as f:
-            pickle.dump(fitted_model, f)
+def residuals_degraded(updated, meta, max_ratio):
+    """
+    Why the one-step-ahead errors of an updated model on the days since
+    its last full refit show its parameters no longer fit, or None
+    """
+    recent = updated.resid[updated.resid.index > pd.Timestamp(meta['fitted_through'])]
+    rmse = residual_rmse(recent)
+    if len(recent) and rmse > max_ratio * meta['rmse']:
+        return f"residual RMSE {rmse:.2f} over {len(recent)} days vs {meta['rmse']:.2f} at refit"
+    return None
+
+
+def _update_arima_model(previous, prices, meta, refit_days, max_ratio):
+    """
+    `previous` ARIMA results carried forward to `prices` with their
+    fitted parameters (no likelihood maximization): new days are appended
+    to its state, a revised history is refiltered. Returns (results,
+    reason): results is None when a full refit is due for `reason`.
+    """
+    reason = needs_full_refit(meta, prices, refit_days)
+    if reason:
+        return None, reason
+
+    fitted_prices = previous.model.data.orig_endog
+    new = new_observations(fitted_prices, prices)
+    if new is None:
+        updated, how = previous.apply(prices, refit=False), 'refiltered'
+    elif new.empty:
+        return previous, 'unchanged'
+    else:
+        updated, how = previous.append(new, refit=False), f'appended {len(new)} days'
+
+    reason = residuals_degraded(updated, meta, max_ratio)
+    if reason:
+        return None, reason
+    return updated, how
+
+
+def _write_atomic(path, data):
+    """Write bytes through a temporary file, so readers and interrupted writes never see a partial file"""
+    tmp_path = path.with_name(f'{path.name}.tmp')
+    tmp_path.write_bytes(data)
+    os.replace(tmp_path, path)
 
-        logger.info(f"Successfully trained ARIMA model for {vegetable_name} in {city_name}")
+
+def _load_arima_model(path, meta_path):
+    """
+    A stored ARIMA model and its refit record. Raises when either cannot
+    be read or the record belongs to another version of the pickle.
+    """
+    data = path.read_bytes()
+    meta = json.loads(meta_path.read_text())
+    if meta.get('model_digest') != hashlib.sha256(data).hexdigest():
+        raise ValueError('refit record does not match the stored model')
+    return pickle.loads(data), meta
+
+
+def train_arima_model(prices, vegetable_name, city_name, incremental=True, refit_days=None, max_residual_ratio=None):
+    """
+    Train ARIMA model for price prediction.
+
+    With a daily series (see ml.training_data) and `incremental`, an
+    existing model is updated with the new days using its fitted
+    parameters, which is far cheaper than a full fit. The parameters are
+    re-estimated from scratch once `refit_days` days (ARIMA_FULL_REFIT_DAYS)
+    passed since the last full fit, or earlier when the one-step-ahead
+    RMSE since then exceeds `max_residual_ratio` (ARIMA_MAX_RESIDUAL_RATIO)
+    times the RMSE of that fit, or when the stored model cannot be loaded
+    or updated.
+
+    The pickle and its refit record are replaced atomically, and the
+    record holds the pickle's digest, so an interrupted save is detected
+    as a mismatch and refitted.
+    """
+    try:
+        from statsmodels.tsa.arima.model import ARIMA
+
+        if refit_days is None:
+            refit_days = settings.ARIMA_FULL_REFIT_DAYS
+        if max_residual_ratio is None:
+            max_residual_ratio = settings.ARIMA_MAX_RESIDUAL_RATIO
+
+        path = model_path('arima', vegetable_name, city_name)
+        meta_path = arima_meta_path(vegetable_name, city_name)
+        daily = isinstance(prices, pd.Series)
+
+        fitted_model = meta = None
+        reason = 'no daily series'
+        if daily and incremental and path.exists():
+            try:
+                previous, meta = _load_arima_model(path, meta_path)
+                fitted_model, reason = _update_arima_model(previous, prices, meta, refit_days, max_residual_ratio)
+            except Exception as e:
+                logger.warning(f"Cannot update the ARIMA model for {vegetable_name} in {city_name}: {e}")
+                reason = f'update failed: {e}'
+            else:
+                if fitted_model is previous:
+                    logger.info(f"ARIMA model for {vegetable_name} in {city_name} is up to date")
+                    return fitted_model
+
+        if fitted_model is None:
+            # Fit on the dated daily series so later runs can append to it
+            series = prices.astype(float) if daily else preprocess_price_data(prices)['price']
+            fitted_model = ARIMA(series, order=ARIMA_ORDER).fit()
+            meta = {
+                'order': ARIMA_ORDER,
+                'fitted_through': prices.index[-1].date().isoformat(),
+                # The first residuals absorb the diffuse initial state
+                'rmse': residual_rmse(fitted_model.resid.iloc[sum(ARIMA_ORDER):]),
+            } if daily else None
+            how = f'refitted ({reason})'
+        else:
+            how = reason
+
+        data = pickle.dumps(fitted_model)
+        MODEL_DIR.mkdir(exist_ok=True)
+        _write_atomic(path, data)
+        if meta:
+            meta['model_digest'] = hashlib.sha256(data).hexdigest()
+            _write_atomic(meta_path, json.dumps(meta).encode())
+        else:
+            meta_path.unlink(missing_ok=True)
+
+        logger.info(f"Successfully trained ARIMA model for {vegetable_name} in {city_name}: {how}")
         return fitted_model
 
     except Exception as e:
@@ -103,38 +285,39 @@ def train_arima_model(prices, vegetable_name, city_name):
         return None
 
 
-def train_all_models(vegetable_id, city_id):
+def train_all_models(vegetable_id, city_id, prices=None, models=MODEL_TYPES):
     """
-    Train all available models for a vegetable-city combination
+    Train all available models (or only the `models` types) for a
+    vegetable-city combination.
+    Models are fitted on the series' daily prices (one per day, see
+    ml.training_data.build_daily_series); `prices` is that series when
+    the caller already loaded it.
     """
     try:
         vegetable = Vegetable.objects.get(id=vegetable_id)
         city = City.objects.get(id=city_id)
 
         # Get historical prices
-        prices = PriceEntry.objects.filter(
-            vegetable=vegetable,
-            city=city
-        ).order_by('timestamp')
+        if prices is None:
+            prices = load_daily_series([(vegetable_id, city_id)]).get((vegetable_id, city_id), [])
 
-        if prices.count() < 30:
+        if len(prices) < MIN_TRAINING_ROWS:
             logger.warning(f"Insufficient data for {vegetable.name} in {city.name}")
             return None
 
         logger.info(f"Training models for {vegetable.name} in {city.name}...")
 
+        result = {'vegetable': vegetable.name, 'city': city.name}
+
         # Train Prophet
-        prophet_model = train_prophet_model(prices, vegetable.name, city.name)
+        if 'prophet' in models:
+            result['prophet'] = train_prophet_model(prices, vegetable.name, city.name)
 
         # Train ARIMA
-        arima_model = train_arima_model(prices, vegetable.name, city.name)
-
-        return {
-            'prophet': prophet_model,
-            'arima': arima_model,
-            'vegetable': vegetable.name,
-            'city': city.name
-        }
+        if 'arima' in models:
+            result['arima'] = train_arima_model(prices, vegetable.name, city.name)
+
+        return result
 
     except Exception as e:
         logger.error(f"Error in train_all_models: {e}")
@@ -0,0 +1,225 @@
+import os
+import sys
+import hashlib
+import logging
+import time
+import numpy as np
+import pandas as pd
+from pathlib import Path
+
+# Add project path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
+
+import django
+django.setup()
+
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Count, FloatField, Max, Sum
+from django.db.models.functions import Cast
+
+from api.models import PriceEntry
+
+logger = logging.getLogger(__name__)
+
+TRAINING_COLUMNS = ['vegetable_id', 'city_id', 'timestamp', 'price', 'source', 'quality']
+
+# Weight of each source's price in a day's median; wholesale government
+# data counts double, unknown sources least
+SOURCE_WEIGHTS = {
+    'government': 2.0,
+    'bigbasket': 1.0,
+    'jiomart': 1.0,
+    'blinkit': 1.0,
+    'local_market': 1.0,
+    'other': 0.5,
+}
+
+# Gaps up to this many days are interpolated; longer ones carry the last price
+MAX_INTERPOLATED_GAP = 7
+
+DAILY_SERIES_CACHE_TIMEOUT = 7 * 24 * 3600
+
+
+def load_price_frame(series=None, chunk_size=20000):
+    """
+    Load the price history of every series of a training run in one scan.
+
+    `series` is an iterable of (vegetable_id, city_id) pairs (all series
+    when None). Prices are cast to float in the database and rows are
+    read from a raw cursor, so no Decimal, datetime or model instance is
+    built per row. Returns a DataFrame of TRAINING_COLUMNS sorted by
+    series and time, with int32 ids, datetime64 UTC timestamps, float32
+    prices, categorical sources and int8 quality ratings.
+    """
+    started = time.perf_counter()
+    queryset = PriceEntry.objects.order_by()
+    if series is not None:
+        series = set(series)
+        queryset = queryset.filter(
+            vegetable_id__in={vegetable_id for vegetable_id, _ in series},
+            city_id__in={city_id for _, city_id in series},
+        )
+
+    # A raw cursor skips Django's per-row value converters; timestamps are
+    # parsed below in one vectorized pass
+    sql, params = queryset.annotate(price=Cast('price_per_kg', FloatField())).values_list(
+        'vegetable_id', 'city_id', 'timestamp', 'price', 'source', 'quality_rating'
+    ).query.sql_with_params()
+    rows = []
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        columns = [column[0] for column in cursor.description]
+        for chunk in iter(lambda: cursor.fetchmany(chunk_size), []):
+            rows.extend(chunk)
+
+    raw = pd.DataFrame.from_records(rows, columns=columns)
+    frame = pd.DataFrame({
+        'vegetable_id': raw['vegetable_id'].to_numpy(dtype=np.int32),
+        'city_id': raw['city_id'].to_numpy(dtype=np.int32),
+        'timestamp': pd.to_datetime(raw['timestamp'], utc=True, format='ISO8601'),
+        'price': raw['price'].to_numpy(dtype=np.float32),
+        'source': raw['source'].astype('category'),
+        'quality': raw['quality_rating'].to_numpy(dtype=np.int8),
+    })
+
+    if series is not None:
+        keys = pd.MultiIndex.from_arrays([frame['vegetable_id'], frame['city_id']])
+        frame = frame[keys.isin(list(series))]
+
+    frame = frame.sort_values(['vegetable_id', 'city_id', 'timestamp'], kind='stable', ignore_index=True)
+    logger.info(f"Loaded {len(frame)} training rows in {time.perf_counter() - started:.2f}s")
+    return frame
+
+
+def split_series(frame, min_rows=0):
+    """
+    Split a load_price_frame() result into {(vegetable_id, city_id): frame}
+    for series with at least `min_rows` rows
+    """
+    if frame.empty:
+        return {}
+
+    ids = frame[['vegetable_id', 'city_id']].to_numpy()
+    # The frame is sorted by series, so each series is one contiguous block
+    starts = np.flatnonzero(np.r_[True, (ids[1:] != ids[:-1]).any(axis=1)])
+    ends = np.r_[starts[1:], len(frame)]
+
+    series = {}
+    for start, end in zip(starts, ends):
+        if end - start >= min_rows:
+            vegetable_id, city_id = ids[start]
+            series[(int(vegetable_id), int(city_id))] = frame.iloc[start:end]
+    return series
+
+
+def build_daily_series(prices, source_weights=SOURCE_WEIGHTS, max_gap=MAX_INTERPOLATED_GAP):
+    """
+    Resample one series' raw prices (a split_series frame) to one price
+    per calendar day (UTC): the source-weighted median of that day's
+    prices. Missing days are interpolated over gaps of up to `max_gap`
+    days and carry the last price over longer ones. Returns a float
+    Series on a gapless daily DatetimeIndex.
+    """
+    if prices.empty:
+        return pd.Series(dtype=float, index=pd.DatetimeIndex([], freq='D'))
+
+    frame = pd.DataFrame({
+        'day': prices['timestamp'].dt.tz_convert(None).dt.normalize(),
+        # float32 prices back to exact paise
+        'price': prices['price'].astype(float).round(2),
+        'weight': prices['source'].astype(object).map(source_weights).fillna(1.0),
+    }).sort_values(['day', 'price'])
+
+    # Weighted median: the lowest price at which the day's cumulative
+    # weight reaches half of its total
+    days = frame.groupby('day')['weight']
+    reached = days.cumsum() >= days.transform('sum') / 2
+    daily = frame[reached].groupby('day')['price'].first()
+
+    daily = daily.asfreq('D')
+    missing = daily.isna()
+    if missing.any():
+        gap_length = missing.groupby((~missing).cumsum()).transform('sum')
+        interpolated = daily.interpolate(method='time', limit_area='inside')
+        daily = interpolated.where(~missing | (gap_length <= max_gap)).ffill()
+    return daily
+
+
+def _series_versions(series=None, min_rows=0):
+    """
+    {(vegetable_id, city_id): version} in one grouped query, where the
+    version (row count, highest id, latest timestamp, price sum) changes
+    whenever rows are added, removed or re-observed, or a price is
+    replaced in place (an upsert may keep an older timestamp)
+    """
+    queryset = PriceEntry.objects.order_by().values('vegetable_id', 'city_id').annotate(
+        rows=Count('id'), last_id=Max('id'), latest=Max('timestamp'), price_sum=Sum('price_per_kg')
+    ).filter(rows__gte=max(min_rows, 1))
+    if series is not None:
+        series = set(series)
+        queryset = queryset.filter(
+            vegetable_id__in={vegetable_id for vegetable_id, _ in series},
+            city_id__in={city_id for _, city_id in series},
+        )
+
+    versions = {}
+    for row in queryset:
+        key = (row['vegetable_id'], row['city_id'])
+        if series is None or key in series:
+            versions[key] = f"{row['rows']}-{row['last_id']}-{row['latest'].isoformat()}-{row['price_sum']}"
+    return versions
+
+
+def _daily_series_cache_key(key, version):
+    vegetable_id, city_id = key
+    return f'daily-series:{vegetable_id}:{city_id}:{version}'
+
+
+def load_daily_series(series=None, min_rows=0):
+    """
+    Daily series (see build_daily_series) of every (vegetable_id, city_id)
+    in `series` (default: all) with at least `min_rows` raw rows and days.
+
+    Built series are cached under their data version, so repeated
+    training runs and backtests only pay for one grouped query while
+    nothing new was ingested; series that changed are rebuilt from a
+    single load_price_frame scan.
+    """
+    started = time.perf_counter()
+    versions = _series_versions(series, min_rows)
+    cache_keys = {key: _daily_series_cache_key(key, version) for key, version in versions.items()}
+    cached = cache.get_many(list(cache_keys.values()))
+
+    daily = {key: cached[cache_key] for key, cache_key in cache_keys.items() if cache_key in cached}
+    stale = [key for key in versions if key not in daily]
+    if stale:
+        built = {key: build_daily_series(prices) for key, prices in split_series(load_price_frame(stale)).items()}
+        cache.set_many(
+            {cache_keys[key]: values for key, values in built.items() if key in cache_keys},
+            timeout=DAILY_SERIES_CACHE_TIMEOUT
+        )
+        daily.update(built)
+
+    logger.info(
+        f"Loaded {len(daily)} daily series ({len(daily) - len(stale)} cached, {len(stale)} rebuilt) "
+        f"in {time.perf_counter() - started:.2f}s"
+    )
+    return {key: values for key, values in sorted(daily.items()) if len(values) >= min_rows}
+
+
+def series_fingerprint(daily):
+    """
+    Fingerprint of a daily series as stored in api.models.TrainingState:
+    its length, last day and a checksum of its dates and prices
+    """
+    digest = hashlib.sha256()
+    digest.update(daily.index.asi8.tobytes())
+    digest.update(daily.to_numpy(dtype=np.float64).tobytes())
+    return {
+        'row_count': len(daily),
+        'last_date': daily.index[-1].date() if len(daily) else None,
+        'checksum': digest.hexdigest(),
+    }